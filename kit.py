@@ -145,9 +145,19 @@ def cmd_bg(args):
     if args.input:
         cmd.append(args.input)
     if args.output:
-        cmd.append(args.output)
+        cmd += ["--output", args.output]
     if args.model:
         cmd += ["--model", args.model]
+    if args.workers:
+        cmd += ["--workers", str(args.workers)]
+    if args.watch:
+        cmd.append("--watch")
+    if args.force:
+        cmd.append("--force")
+    if args.dedup:
+        cmd.append("--dedup")
+    if args.format:
+        cmd += ["--format", args.format]
     
     # Pass through other flags if user used -- (not fully implemented in this simple wrapper)
     
@@ -455,6 +465,15 @@ For more info: python %(prog)s <command> --help
     bg_parser.add_argument("input", nargs="?", help="Input file or folder")
     bg_parser.add_argument("output", nargs="?", help="Output file or folder")
     bg_parser.add_argument("--model", default="u2net", help="Model type")
+    bg_parser.add_argument("--workers", "-j", type=int, help="Worker processes for folder input")
+    bg_parser.add_argument("--watch", "-w", action="store_true",
+        help="Keep processing images as they are added to the input folder")
+    bg_parser.add_argument("--force", action="store_true",
+        help="Reprocess images that are already up to date")
+    bg_parser.add_argument("--dedup", action="store_true",
+        help="Reuse one mask across near-identical images in a folder")
+    bg_parser.add_argument("--format", choices=["rgba", "mask", "mask-1bit", "rle"],
+        help="Write the cutout (rgba, default) or only the mask")
 
     # Packager
     pack_parser = subparsers.add_parser("pack",
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's batch helpers (tools/bg-remover/core/batch.py)
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from core.batch import collect_inputs, mirror_output_path, mirror_output_paths, plan_threads
+
+
+class TestPlanThreads(unittest.TestCase):
+    """Splitting cores between workers and their model threads"""
+
+    def plan(self, workers, threads, jobs, cores=8):
+        with mock.patch("os.cpu_count", return_value=cores):
+            return plan_threads(workers, threads, jobs)
+
+    def test_defaults_to_one_worker_per_core(self):
+        self.assertEqual(self.plan(None, None, 100), (8, 1))
+
+    def test_threads_only_fits_workers_in_cores(self):
+        self.assertEqual(self.plan(None, 4, 100), (2, 4))
+        self.assertEqual(self.plan(None, 16, 100), (1, 16))
+
+    def test_workers_only_splits_cores(self):
+        self.assertEqual(self.plan(2, None, 100), (2, 4))
+        self.assertEqual(self.plan(3, None, 100), (3, 2))
+
+    def test_never_more_workers_than_jobs(self):
+        self.assertEqual(self.plan(None, None, 3), (3, 2))
+        self.assertEqual(self.plan(8, 1, 2), (2, 1))
+
+    def test_unknown_cpu_count(self):
+        self.assertEqual(self.plan(None, None, 10, cores=None), (1, 1))
+
+
+class TestCollectInputs(unittest.TestCase):
+    """Finding images in a directory tree or glob"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        for name in ["b.jpg", "a.PNG", "notes.txt", "sub/c.webp", "sub/a_nobg.png", "out/x.jpg"]:
+            path = self.root / name
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def relative(self, inputs):
+        return [relative.as_posix() for _, relative in inputs]
+
+    def test_directory_is_searched_recursively_and_sorted(self):
+        inputs = collect_inputs(str(self.root))
+        self.assertEqual(self.relative(inputs), ["a.PNG", "b.jpg", "out/x.jpg", "sub/a_nobg.png", "sub/c.webp"])
+        self.assertEqual(inputs[0][0], self.root / "a.PNG")
+
+    def test_excludes_output_dir_and_previous_outputs(self):
+        inputs = collect_inputs(str(self.root), exclude_dir=self.root / "out", exclude_suffix="_nobg")
+        self.assertEqual(self.relative(inputs), ["a.PNG", "b.jpg", "sub/c.webp"])
+
+    def test_glob_is_relative_to_its_fixed_prefix(self):
+        inputs = collect_inputs(str(self.root / "**" / "*.jpg"))
+        self.assertEqual(self.relative(inputs), ["b.jpg", "out/x.jpg"])
+
+    def test_empty_directory(self):
+        with tempfile.TemporaryDirectory() as empty:
+            self.assertEqual(collect_inputs(empty), [])
+
+
+class TestMirrorOutputPath(unittest.TestCase):
+    """Mapping inputs into the output tree"""
+
+    def test_keeps_subdirectories(self):
+        self.assertEqual(
+            mirror_output_path(Path("sub/dir/photo.jpg"), Path("out")),
+            Path("out/sub/dir/photo_nobg.png")
+        )
+
+    def test_suffix_and_extension(self):
+        self.assertEqual(
+            mirror_output_path(Path("photo.tif"), Path("out"), "_mask", ".json"),
+            Path("out/photo_mask.json")
+        )
+
+
+class TestMirrorOutputPaths(unittest.TestCase):
+    """Naming a batch's outputs without collisions"""
+
+    def test_same_stem_keeps_extension(self):
+        outputs = mirror_output_paths(
+            [Path("img0.jpg"), Path("img0.png"), Path("img1.jpg"), Path("sub/img0.jpg")], Path("out")
+        )
+        self.assertEqual(outputs, [
+            Path("out/img0_jpg_nobg.png"), Path("out/img0_png_nobg.png"),
+            Path("out/img1_nobg.png"), Path("out/sub/img0_nobg.png"),
+        ])
+
+    def test_unresolvable_collision(self):
+        with self.assertRaises(ValueError) as raised:
+            mirror_output_paths([Path("a.jpg"), Path("a.png"), Path("a_jpg.png")], Path("out"))
+        self.assertIn("a_jpg_nobg.png", str(raised.exception))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
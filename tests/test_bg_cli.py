@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's command line (tools/bg-remover/cli_remove_bg.py)
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import textwrap
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+TOOL_DIR = Path(__file__).parent.parent / "tools" / "bg-remover"
+sys.path.insert(0, str(TOOL_DIR))
+
+import cli_remove_bg
+from core.manifest import BATCH_MANIFEST_NAME
+
+
+def write_photo(path, seed=0):
+    """A small picture of a bright square on a darker, noisy background."""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(20, 80, (48, 64, 3), dtype=np.uint8)
+    pixels[12:36, 16:48] = (220, 120, 40)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    Image.fromarray(pixels).save(path)
+
+
+class TestBatchMode(unittest.TestCase):
+    """Batch runs on the heuristic fallback (rembg not installed)"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.input = self.root / "in"
+        self.output = self.root / "out"
+        patcher = mock.patch("processors.rembg_processor.rembg_available", False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_watch(self, *args, arrivals=(), until=None):
+        """
+        Run watch mode until the watcher has been asked for changes three times.
+
+        arrivals: (path, seed) photos written and reported on the first call
+        until: keep watching after that until this returns true (up to a minute)
+        """
+        calls = []
+        deadline = time.monotonic() + 60
+
+        class Watcher:
+            def changes(self, timeout):
+                calls.append(timeout)
+                if len(calls) >= 3:
+                    if until is None or until() or time.monotonic() > deadline:
+                        raise KeyboardInterrupt
+                    time.sleep(timeout)
+                    return []
+                if len(calls) == 1:
+                    for path, seed in arrivals:
+                        write_photo(path, seed)
+                    return [path for path, _ in arrivals]
+                return []
+
+            def close(self):
+                pass
+
+        with mock.patch("cli_remove_bg.create_watcher", return_value=Watcher()):
+            return self.run_cli("--watch", "--settle", "0", *args)
+
+    def run_cli(self, *args):
+        """Run main() in this process with one worker; returns (exit code, stdout)."""
+        argv = ["cli_remove_bg.py", str(self.input), "--output", str(self.output), "-j", "1", "--no-mask-cache"]
+        stdout = io.StringIO()
+        with mock.patch.object(sys, "argv", argv + list(args)), contextlib.redirect_stdout(stdout):
+            with self.assertRaises(SystemExit) as exit_:
+                cli_remove_bg.main()
+        return exit_.exception.code, stdout.getvalue()
+
+    def test_fallback_batch(self):
+        for i, name in enumerate(["a.jpg", "sub/b.png"]):
+            write_photo(self.input / name, seed=i)
+
+        code, stdout = self.run_cli()
+        self.assertEqual(code, 0, stdout)
+        self.assertIn("Completed: 2/2", stdout)
+        self.assertNotIn("Model sessions", stdout)
+        for name in ["a_nobg.png", "sub/b_nobg.png"]:
+            with Image.open(self.output / name) as image:
+                self.assertEqual((image.mode, image.size), ("RGBA", (64, 48)))
+        self.assertTrue((self.output / BATCH_MANIFEST_NAME).exists())
+
+        code, stdout = self.run_cli()
+        self.assertEqual(code, 0, stdout)
+        self.assertIn("2 up to date, 0 to process", stdout)
+
+    def test_batch_and_watch_share_the_manifest(self):
+        write_photo(self.input / "a.jpg")
+        code, stdout = self.run_watch()
+        self.assertEqual(code, 0, stdout)
+        self.assertIn("Processed 1 images", stdout)
+
+        write_photo(self.input / "b.png", seed=1)
+        code, stdout = self.run_cli()
+        self.assertEqual(code, 0, stdout)
+        self.assertIn("1 up to date, 1 to process", stdout)
+
+        # Same content under another name is copied, not processed
+        (self.input / "c.png").write_bytes((self.input / "b.png").read_bytes())
+        code, stdout = self.run_watch()
+        self.assertEqual(code, 0, stdout)
+        self.assertIn("Processed 0 images (0 errors), copied 1 duplicates, 2 already up to date", stdout)
+        self.assertEqual(
+            (self.output / "c_nobg.png").read_bytes(), (self.output / "b_nobg.png").read_bytes()
+        )
+
+    def test_inputs_sharing_a_stem(self):
+        write_photo(self.input / "img0.jpg")
+        write_photo(self.input / "img0.png", seed=1)
+        write_photo(self.input / "img1.png", seed=2)
+
+        code, stdout = self.run_cli()
+        self.assertEqual(code, 0, stdout)
+        self.assertEqual(
+            sorted(p.name for p in self.output.glob("*.png")),
+            ["img0_jpg_nobg.png", "img0_png_nobg.png", "img1_nobg.png"]
+        )
+
+    def test_watch_name_collision_fails_only_that_input(self):
+        write_photo(self.input / "photo.jpg")
+        write_photo(self.input / "photo.png", seed=1)
+
+        # Its name, photo_jpg_nobg.png, is already photo.jpg's
+        dropped = self.input / "photo_jpg.webp"
+        outputs = [self.output / "photo_jpg_nobg.png", self.output / "photo_png_nobg.png"]
+        code, stdout = self.run_watch(arrivals=[(dropped, 2)], until=lambda: all(p.exists() for p in outputs))
+        self.assertEqual(code, 1, stdout)
+        self.assertIn(f"Error: {self.input / 'photo.jpg'} and {dropped} would both be written to", stdout)
+        self.assertIn("Processed 2 images (1 errors)", stdout)
+        self.assertEqual(
+            sorted(p.name for p in self.output.glob("*.png")), ["photo_jpg_nobg.png", "photo_png_nobg.png"]
+        )
+
+    def test_archive_members_sharing_a_stem(self):
+        write_photo(self.input / "img0.jpg")
+        write_photo(self.input / "img0.png", seed=1)
+        archive = self.root / "masks.tar"
+
+        code, stdout = self.run_cli("--format", "mask", "--archive", str(archive))
+        self.assertEqual(code, 0, stdout)
+        with tarfile.open(archive) as tar:
+            self.assertEqual(sorted(tar.getnames()), ["img0_jpg_mask.png", "img0_png_mask.png"])
+
+
+class TestArchiveToStdout(unittest.TestCase):
+    """Worker processes keep off stdout while it carries an archive"""
+
+    def test_worker_prints_go_to_stderr(self):
+        script = textwrap.dedent("""
+            import functools
+            import cli_remove_bg
+            from core.batch import WorkerPool
+
+            def task(processor, job):
+                print("from the worker")
+                return job
+
+            if __name__ == "__main__":
+                factory = functools.partial(cli_remove_bg._create_processor, None, False, None, None, True)
+                with WorkerPool(task, factory, 2, 1) as pool:
+                    print(pool.submit(1).result(), pool.submit(2).result())
+        """)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "workers.py"
+            path.write_text(script)
+            result = subprocess.run(
+                [sys.executable, str(path)], cwd=TOOL_DIR, capture_output=True, text=True, timeout=120,
+                env={**os.environ, "PYTHONPATH": str(TOOL_DIR)}
+            )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "1 2\n")
+        self.assertIn("from the worker", result.stderr)
+
+
+class TestHighRes(unittest.TestCase):
+    """High-res mode's output files"""
+
+    def test_rejects_non_png_output(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            photo = Path(tmp) / "photo.jpg"
+            write_photo(photo)
+            output = Path(tmp) / "out.jpg"
+            with self.assertRaisesRegex(ValueError, "writes PNG"):
+                cli_remove_bg.remove_background(str(photo), str(output), high_res=True)
+            self.assertFalse(output.exists())
+
+
+class TestArguments(unittest.TestCase):
+    """Rejected argument combinations"""
+
+    def assertRejected(self, *args):
+        stderr = io.StringIO()
+        with mock.patch.object(sys, "argv", ["cli_remove_bg.py"] + list(args)), contextlib.redirect_stderr(stderr):
+            with self.assertRaises(SystemExit) as exit_:
+                cli_remove_bg.main()
+        self.assertEqual(exit_.exception.code, 2)
+        return stderr.getvalue()
+
+    def test_alpha_method_needs_alpha(self):
+        self.assertIn("--alpha-method needs --alpha", self.assertRejected("photo.jpg", "--alpha-method", "guided"))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
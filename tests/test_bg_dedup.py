@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's near-duplicate detection (tools/bg-remover/core/dedup.py)
+"""
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from core.dedup import DuplicateIndex, align_mask, find_duplicate_groups
+
+
+def product_shot(height=600, width=800, seed=0):
+    """A smooth textured background with an elliptical subject, and the subject's mask."""
+    rng = np.random.default_rng(seed)
+    coarse = rng.integers(0, 256, (height // 8, width // 8, 3), dtype=np.uint8)
+    image = np.asarray(Image.fromarray(coarse).resize((width, height), Image.Resampling.BICUBIC)).copy()
+    yy, xx = np.mgrid[:height, :width]
+    subject = (yy - height / 2) ** 2 / (height / 4) ** 2 + (xx - width / 2) ** 2 / (width / 4) ** 2 < 1
+    image[subject] = (image[subject] * 0.3 + np.array([200, 60, 40]) * 0.7).astype(np.uint8)
+    return image, (subject * 255).astype(np.uint8)
+
+
+def flip_bits(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+class TestAlignMask(unittest.TestCase):
+    """Mapping a mask onto a near-duplicate"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.scene, cls.scene_mask = product_shot()
+        cls.source = cls.scene[40:560, 40:760]
+        cls.mask = cls.scene_mask[40:560, 40:760]
+
+    def test_shifted_copy_aligns_exactly(self):
+        for dy, dx in [(3, -5), (-7, 2), (-7, -7), (0, 0)]:
+            with self.subTest(shift=(dy, dx)):
+                target = self.scene[40 + dy:560 + dy, 40 + dx:760 + dx]
+                aligned = align_mask(self.mask, self.source, target)
+                self.assertIsNotNone(aligned)
+                self.assertTrue(np.array_equal(aligned, self.scene_mask[40 + dy:560 + dy, 40 + dx:760 + dx]))
+
+    def test_resized_copy_aligns(self):
+        target = np.asarray(Image.fromarray(self.source).resize((360, 260), Image.Resampling.LANCZOS))
+        expected = np.asarray(Image.fromarray(self.mask).resize((360, 260), Image.Resampling.BILINEAR))
+        aligned = align_mask(self.mask, self.source, target)
+        self.assertIsNotNone(aligned)
+        self.assertEqual(aligned.shape, (260, 360))
+        self.assertLess(((aligned > 127) != (expected > 127)).mean(), 0.001)
+
+    def test_unrelated_image_is_rejected(self):
+        other, _ = product_shot(520, 720, seed=1)
+        self.assertIsNone(align_mask(self.mask, self.source, other))
+        noise = np.random.default_rng(2).integers(0, 256, self.source.shape, dtype=np.uint8)
+        self.assertIsNone(align_mask(self.mask, self.source, noise))
+
+
+class TestDuplicateIndex(unittest.TestCase):
+    """Hash lookups within a Hamming distance"""
+
+    def setUp(self):
+        self.phash = int(np.random.default_rng(3).integers(0, 2 ** 63)) | 1 << 63
+        self.index = DuplicateIndex(max_distance=6)
+        self.entry = self.index.add(self.phash, 1.5)
+
+    def test_finds_within_max_distance(self):
+        self.assertEqual(self.index.find(self.phash, 1.5), self.entry)
+        # Spread over the hash, so no single chunk is left intact by luck
+        self.assertEqual(self.index.find(flip_bits(self.phash, [0, 11, 22, 33, 44, 55]), 1.5), self.entry)
+
+    def test_ignores_beyond_max_distance(self):
+        self.assertIsNone(self.index.find(flip_bits(self.phash, [0, 9, 18, 27, 36, 45, 54]), 1.5))
+
+    def test_aspect_tolerance(self):
+        self.assertEqual(self.index.find(self.phash, 1.5 * 1.019), self.entry)
+        self.assertIsNone(self.index.find(self.phash, 1.5 * 1.03))
+        self.assertIsNone(self.index.find(self.phash, 1.0))
+
+    def test_closest_entry_wins(self):
+        near = self.index.add(flip_bits(self.phash, [5]), 1.5)
+        self.assertEqual(self.index.find(flip_bits(self.phash, [5, 40]), 1.5), near)
+        self.assertEqual(len(self.index), 2)
+
+
+class TestFindDuplicateGroups(unittest.TestCase):
+    """Grouping image files"""
+
+    def test_groups_shifted_copies(self):
+        scene, _ = product_shot()
+        other, _ = product_shot(seed=4)
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for name, pixels in [
+                ("a.png", scene[40:560, 40:760]),
+                ("b.png", other[40:560, 40:760]),
+                ("c.jpg", scene[43:563, 35:755]),
+                ("d.png", scene[30:550, 44:764]),
+            ]:
+                paths.append(Path(tmp) / name)
+                Image.fromarray(np.ascontiguousarray(pixels)).save(paths[-1])
+            paths.append(Path(tmp) / "broken.png")
+            paths[-1].write_bytes(b"not an image")
+
+            groups, stats = find_duplicate_groups(paths, workers=1)
+
+        self.assertEqual(groups, [[0, 2, 3], [1], [4]])
+        self.assertEqual(stats["duplicates"], 2)
+        self.assertEqual(stats["groups"], 1)
+        self.assertEqual(stats["unreadable"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
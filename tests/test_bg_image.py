@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's output post-processing (tools/bg-remover/utils/image.py)
+"""
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from utils.image import post_process_cutout
+
+
+def random_cutout(height, width, seed=0):
+    """Random RGBA with fully transparent, fully opaque and partial alpha."""
+    rng = np.random.default_rng(seed)
+    rgba = rng.integers(0, 256, (height, width, 4), dtype=np.uint8)
+    alpha = rgba[..., 3]
+    alpha[alpha < 40] = 0
+    alpha[alpha > 215] = 255
+    return rgba
+
+
+def composite(rgba, color):
+    """Reference: PIL's alpha_composite over an opaque background."""
+    height, width = rgba.shape[:2]
+    background = Image.new("RGBA", (width, height), tuple(color) + (255,))
+    result = Image.alpha_composite(background, Image.fromarray(np.ascontiguousarray(rgba)))
+    return np.asarray(result)[..., :3]
+
+
+def sticker(rgba, width, color, expand_canvas):
+    """Reference sticker: brute-force Euclidean stroke under the blended subject."""
+    if expand_canvas:
+        rgba = np.pad(rgba, ((width, width), (width, width), (0, 0)))
+    height, image_width = rgba.shape[:2]
+    alpha = rgba[..., 3].astype(np.int64)
+    ys, xs = np.nonzero(alpha >= 128)
+    grid_y, grid_x = np.mgrid[:height, :image_width]
+    if ys.size:
+        distance = np.sqrt(
+            (grid_y[..., np.newaxis] - ys) ** 2 + (grid_x[..., np.newaxis] - xs) ** 2
+        ).min(axis=-1)
+    else:
+        distance = np.full((height, image_width), np.inf)
+    stroke = (np.clip(width + 0.5 - distance, 0, 1) * 255 + 0.5).astype(np.int64)
+    rgb = (rgba[..., :3] * alpha[..., np.newaxis] + np.array(color) * (255 - alpha[..., np.newaxis]) + 127) // 255
+    return np.dstack((rgb, np.maximum(alpha, stroke))).astype(np.uint8)
+
+
+class TestPostProcessBackground(unittest.TestCase):
+    """Compositing onto a solid background"""
+
+    def assertMatchesComposite(self, rgba, color):
+        result = post_process_cutout(rgba, bg_color=color)
+        self.assertEqual(result.shape, rgba.shape[:2] + (3,))
+        self.assertEqual(np.abs(result.astype(int) - composite(rgba, color)).max(), 0)
+
+    def test_matches_alpha_composite(self):
+        for height, width in [(64, 64), (37, 53), (129, 1), (1, 77), (200, 131)]:
+            with self.subTest(size=(height, width)):
+                self.assertMatchesComposite(random_cutout(height, width), (12, 200, 99))
+
+    def test_extreme_colors(self):
+        rgba = random_cutout(31, 45, seed=1)
+        for color in [(0, 0, 0), (255, 255, 255), (255, 0, 255)]:
+            with self.subTest(color=color):
+                self.assertMatchesComposite(rgba, color)
+
+    def test_non_contiguous_view(self):
+        rgba = random_cutout(90, 120, seed=2)
+        view = rgba[3:80:2, 5:117:3]
+        self.assertFalse(view.flags.c_contiguous)
+        self.assertMatchesComposite(view, (40, 80, 160))
+
+    def test_pil_input(self):
+        rgba = random_cutout(20, 33, seed=3)
+        result = post_process_cutout(Image.fromarray(rgba), bg_color=(1, 2, 3))
+        self.assertTrue(np.array_equal(result, composite(rgba, (1, 2, 3))))
+
+
+class TestPostProcessCrop(unittest.TestCase):
+    """Cropping to the subject"""
+
+    def test_crop_only(self):
+        rgba = np.zeros((50, 60, 4), dtype=np.uint8)
+        rgba[20:30, 15:25] = 200
+        result = post_process_cutout(rgba, crop_margin=3)
+        self.assertTrue(np.array_equal(result, rgba[17:33, 12:28]))
+
+    def test_crop_margin_is_clipped(self):
+        rgba = np.zeros((50, 60, 4), dtype=np.uint8)
+        rgba[0:5, 55:60] = 200
+        result = post_process_cutout(rgba, crop_margin=10)
+        self.assertTrue(np.array_equal(result, rgba[0:15, 45:60]))
+
+    def test_crop_with_background(self):
+        rgba = random_cutout(40, 40, seed=4)
+        rgba[:10, :, 3] = 0
+        rgba[:, 33:, 3] = 0
+        result = post_process_cutout(rgba, crop_margin=2, bg_color=(9, 9, 9))
+        self.assertTrue(np.array_equal(result, composite(rgba[8:, :35], (9, 9, 9))))
+
+    def test_all_transparent(self):
+        rgba = np.zeros((20, 30, 4), dtype=np.uint8)
+        self.assertTrue(np.array_equal(post_process_cutout(rgba, crop_margin=5), rgba))
+        result = post_process_cutout(rgba, crop_margin=5, outline_width=3, bg_color=(10, 20, 30))
+        self.assertEqual(result.shape, (26, 36, 3))
+        self.assertTrue((result == (10, 20, 30)).all())
+        result = post_process_cutout(rgba, outline_width=3, expand_canvas=False)
+        self.assertEqual(result.shape, rgba.shape)
+        self.assertFalse(result[..., 3].any())
+
+
+class TestPostProcessOutline(unittest.TestCase):
+    """Sticker outlines"""
+
+    def setUp(self):
+        self.rgba = np.zeros((30, 41, 4), dtype=np.uint8)
+        self.rgba[8:20, 10:25] = random_cutout(12, 15, seed=5)
+        self.rgba[8:20, 10:25, 3] = 255
+        self.rgba[14, 24:30, 3] = 180  # soft edge reaching towards the border
+        self.color = (250, 30, 60)
+
+    def assertMatchesSticker(self, width, expand_canvas):
+        result = post_process_cutout(
+            self.rgba, outline_width=width, outline_color=self.color, expand_canvas=expand_canvas
+        )
+        expected = sticker(self.rgba, width, self.color, expand_canvas)
+        self.assertEqual(result.shape, expected.shape)
+        # The stroke's anti-aliased edge may round differently in float32
+        self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 1)
+        # The stroke adds opaque pixels around the subject
+        self.assertTrue((result[..., 3] == 255).sum() > (self.rgba[..., 3] == 255).sum())
+
+    def test_outline_sizes(self):
+        for width in [1, 2, 5, 12]:
+            for expand_canvas in [True, False]:
+                with self.subTest(width=width, expand_canvas=expand_canvas):
+                    self.assertMatchesSticker(width, expand_canvas)
+
+    def test_canvas_growth(self):
+        grown = post_process_cutout(self.rgba, outline_width=4)
+        same = post_process_cutout(self.rgba, outline_width=4, expand_canvas=False)
+        self.assertEqual(grown.shape, (38, 49, 4))
+        self.assertEqual(same.shape, (30, 41, 4))
+
+    def test_outline_with_background(self):
+        result = post_process_cutout(self.rgba, outline_width=3, outline_color=self.color, bg_color=(0, 0, 0))
+        expected = composite(sticker(self.rgba, 3, self.color, True), (0, 0, 0))
+        self.assertLessEqual(np.abs(result.astype(int) - expected).max(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's batch job manifest (tools/bg-remover/core/manifest.py)
+"""
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from core.manifest import JobManifest, input_signature
+
+
+class TestJobManifest(unittest.TestCase):
+    """Recording and reloading batch job outcomes"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        root = Path(self.tmp.name)
+        self.log = root / "batch.jsonl"
+        self.input = root / "photo.jpg"
+        self.input.write_bytes(b"original pixels")
+        self.output = root / "photo_nobg.png"
+        self.output.write_bytes(b"png")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record_done(self, manifest):
+        input_stat, input_hash = input_signature(self.input)
+        manifest.record(self.input, self.output, "s1", seconds=0.5, input_stat=input_stat, input_hash=input_hash)
+
+    def reload(self, manifest):
+        manifest.close()
+        return JobManifest(self.log)
+
+    def touch_input(self, content=None):
+        """Change the input's mtime, and optionally its content."""
+        if content is not None:
+            self.input.write_bytes(content)
+        stat = self.input.stat()
+        os.utime(self.input, ns=(stat.st_atime_ns, stat.st_mtime_ns + 5_000_000_000))
+
+    def test_record_reload_is_done(self):
+        manifest = JobManifest(self.log)
+        self.record_done(manifest)
+        manifest = self.reload(manifest)
+
+        self.assertTrue(manifest.is_done(self.input, self.output, "s1"))
+        self.assertFalse(manifest.is_done(self.input, self.output, "s2"))
+        self.assertFalse(manifest.is_done(self.input, self.output.with_name("other.png"), "s1"))
+        self.output.unlink()
+        self.assertFalse(manifest.is_done(self.input, self.output, "s1"))
+
+    def test_failures_count_consecutive_failures(self):
+        manifest = JobManifest(self.log)
+        self.assertEqual(manifest.failures(self.input, "s1"), 0)
+        manifest.record(self.input, self.output, "s1", error=ValueError("bad"))
+        manifest.record(self.input, self.output, "s1", error=ValueError("bad"))
+        manifest = self.reload(manifest)
+        self.assertEqual(manifest.failures(self.input, "s1"), 2)
+        self.assertEqual(manifest.failures(self.input, "s2"), 0)
+        self.assertFalse(manifest.is_done(self.input, self.output, "s1"))
+
+        self.record_done(manifest)
+        self.assertTrue(manifest.is_done(self.input, self.output, "s1"))
+        manifest.record(self.input, self.output, "s1", error=ValueError("bad"))
+        self.assertEqual(manifest.failures(self.input, "s1"), 1)
+
+    def test_compact_keeps_latest_line_per_input(self):
+        manifest = JobManifest(self.log)
+        others = [self.input.with_name(f"other{i}.jpg") for i in range(3)]
+        for _ in range(400):
+            for other in others:
+                manifest.record(other, self.output, "s1", error=ValueError("bad"))
+        manifest.record(self.input, self.output, "s1", error=ValueError("bad"))
+        self.record_done(manifest)
+        manifest.compact()
+        manifest = self.reload(manifest)
+
+        lines = self.log.read_text(encoding="utf-8").splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(len(manifest), 4)
+        self.assertTrue(manifest.is_done(self.input, self.output, "s1"))
+        self.assertEqual(manifest.failures(others[0], "s1"), 400)
+
+    def test_compact_leaves_small_logs_alone(self):
+        manifest = JobManifest(self.log)
+        manifest.record(self.input, self.output, "s1")
+        manifest.record(self.input, self.output, "s1")
+        manifest.compact()
+        manifest.close()
+        self.assertEqual(len(self.log.read_text(encoding="utf-8").splitlines()), 2)
+
+    def test_changed_stat_same_content_is_done(self):
+        manifest = JobManifest(self.log)
+        self.record_done(manifest)
+        self.touch_input()
+
+        manifest = self.reload(manifest)
+        self.assertTrue(manifest.is_done(self.input, self.output, "s1"))
+        # The new stat was recorded, so the next check needs no hash
+        manifest = self.reload(manifest)
+        record = json.loads(self.log.read_text(encoding="utf-8").splitlines()[-1])
+        stat = self.input.stat()
+        self.assertEqual(record["input_stat"], [stat.st_size, stat.st_mtime_ns])
+        self.assertTrue(manifest.is_done(self.input, self.output, "s1"))
+
+    def test_changed_content_is_not_done(self):
+        manifest = JobManifest(self.log)
+        self.record_done(manifest)
+        # Same size, different pixels
+        self.touch_input(b"modified pixels")
+        self.assertFalse(manifest.is_done(self.input, self.output, "s1"))
+
+    def test_input_changed_while_processing_is_not_done(self):
+        manifest = JobManifest(self.log)
+        input_stat, input_hash = input_signature(self.input)
+        # Replaced after the worker took its signature, before the job was recorded
+        self.touch_input(b"modified pixels")
+        manifest.record(self.input, self.output, "s1", input_stat=input_stat, input_hash=input_hash)
+        self.assertFalse(manifest.is_done(self.input, self.output, "s1"))
+
+    def test_without_signature_is_not_done(self):
+        manifest = JobManifest(self.log)
+        manifest.record(self.input, self.output, "s1")
+        self.assertFalse(manifest.is_done(self.input, self.output, "s1"))
+
+    def test_done_output_by_content(self):
+        manifest = JobManifest(self.log)
+        self.record_done(manifest)
+        _, input_hash = input_signature(self.input)
+        self.assertEqual(manifest.done_output(input_hash, "s1"), Path(os.path.abspath(self.output)))
+        self.assertIsNone(manifest.done_output(input_hash, "s2"))
+        self.assertIsNone(manifest.done_output("other", "s1"))
+        self.output.unlink()
+        self.assertIsNone(manifest.done_output(input_hash, "s1"))
+
+    def test_reload_after_torn_final_line(self):
+        manifest = JobManifest(self.log)
+        manifest.record(self.input, self.output, "s1")
+        manifest.close()
+        with open(self.log, "a", encoding="utf-8") as f:
+            f.write('{"input": "/torn", "sta')
+
+        manifest = JobManifest(self.log)
+        self.assertEqual(len(manifest), 1)
+        other = self.input.with_name("other.jpg")
+        manifest.record(other, self.output, "s1", error=ValueError("bad"))
+        manifest = self.reload(manifest)
+        self.assertEqual(len(manifest), 2)
+        self.assertEqual(manifest.failures(other, "s1"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's mask export (tools/bg-remover/utils/mask_export.py)
+"""
+import io
+import json
+import os
+import sys
+import tarfile
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from utils.mask_export import OutputArchive, coco_rle, encode_mask
+
+
+def decode_rle(rle):
+    """Reference: pycocotools' rleFrString and rleDecode, transcribed."""
+    height, width = rle["size"]
+    counts = []
+    s = rle["counts"].encode("ascii")
+    p = 0
+    while p < len(s):
+        x = k = 0
+        more = True
+        while more:
+            c = s[p] - 48
+            x |= (c & 0x1f) << 5 * k
+            more = bool(c & 0x20)
+            p += 1
+            k += 1
+            if not more and c & 0x10:
+                x |= -1 << 5 * k
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    flat = np.zeros(height * width, dtype=np.uint8)
+    position = 0
+    for i, run in enumerate(counts):
+        flat[position:position + run] = i % 2
+        position += run
+    assert position == flat.size, "runs do not cover the mask"
+    return flat.reshape(width, height).T
+
+
+class TestCocoRle(unittest.TestCase):
+    """COCO compressed RLE"""
+
+    def assertRoundTrips(self, mask):
+        rle = coco_rle(mask)
+        self.assertEqual(rle["size"], list(mask.shape))
+        self.assertTrue(np.array_equal(decode_rle(rle), mask >= 128))
+
+    def test_random_masks(self):
+        rng = np.random.default_rng(0)
+        for height, width in [(37, 53), (64, 64), (3, 200)]:
+            for density in [0.02, 0.5, 0.98]:
+                with self.subTest(size=(height, width), density=density):
+                    mask = (rng.random((height, width)) < density).astype(np.uint8) * 255
+                    self.assertRoundTrips(mask)
+
+    def test_long_runs(self):
+        # Runs and deltas that need several 5-bit groups, positive and negative
+        mask = np.zeros((300, 200), dtype=np.uint8)
+        mask[50:250, 20:180] = 255
+        mask[:7, 190:] = 255
+        self.assertRoundTrips(mask)
+
+    def test_first_pixel_foreground(self):
+        mask = np.zeros((10, 12), dtype=np.uint8)
+        mask[:4, 0] = 255
+        mask[6:, 5:8] = 255
+        self.assertRoundTrips(mask)
+        self.assertTrue(coco_rle(mask)["counts"].startswith("0"))
+
+    def test_single_row_and_column(self):
+        rng = np.random.default_rng(1)
+        for shape in [(1, 77), (77, 1), (1, 1)]:
+            with self.subTest(shape=shape):
+                self.assertRoundTrips((rng.random(shape) < 0.5).astype(np.uint8) * 255)
+                self.assertRoundTrips(np.full(shape, 255, dtype=np.uint8))
+
+    def test_uniform_masks(self):
+        self.assertRoundTrips(np.zeros((20, 30), dtype=np.uint8))
+        self.assertRoundTrips(np.full((20, 30), 255, dtype=np.uint8))
+
+    def test_threshold(self):
+        mask = np.array([[0, 127, 128, 255]], dtype=np.uint8)
+        self.assertTrue(np.array_equal(decode_rle(coco_rle(mask)), [[0, 0, 1, 1]]))
+        self.assertTrue(np.array_equal(decode_rle(coco_rle(mask, threshold=1)), [[0, 1, 1, 1]]))
+
+
+class TestEncodeMask(unittest.TestCase):
+    """Mask-only output formats"""
+
+    def setUp(self):
+        self.mask = np.zeros((16, 24), dtype=np.uint8)
+        self.mask[4:12, 6:18] = 200
+        self.mask[0, 0] = 100
+
+    def test_png_formats(self):
+        grey = Image.open(io.BytesIO(encode_mask(self.mask, "mask")))
+        self.assertEqual(grey.mode, "L")
+        self.assertTrue(np.array_equal(np.asarray(grey), self.mask))
+        binary = Image.open(io.BytesIO(encode_mask(self.mask, "mask-1bit")))
+        self.assertEqual(binary.mode, "1")
+        self.assertTrue(np.array_equal(np.asarray(binary), self.mask >= 128))
+
+    def test_rle_json(self):
+        rle = json.loads(encode_mask(self.mask, "rle"))
+        self.assertTrue(np.array_equal(decode_rle(rle), self.mask >= 128))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            encode_mask(self.mask, "jpeg")
+
+
+class TestOutputArchive(unittest.TestCase):
+    """Collecting outputs into a tar file"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_keep_writes_members(self):
+        for name in ["masks.tar", "masks.tar.gz"]:
+            with self.subTest(name=name):
+                path = self.root / "out" / name
+                archive = OutputArchive(str(path))
+                archive.add("a/one.png", b"first")
+                archive.add("two.json", b"{}")
+                archive.close()
+                self.assertEqual(archive.members, 2)
+                with tarfile.open(path) as tar:
+                    self.assertEqual(tar.getnames(), ["a/one.png", "two.json"])
+                    self.assertEqual(tar.extractfile("a/one.png").read(), b"first")
+                self.assertFalse([p for p in os.listdir(path.parent) if p.endswith(".tmp")])
+
+    def test_discard_removes_temporary_file(self):
+        path = self.root / "masks.tar"
+        archive = OutputArchive(str(path))
+        archive.add("one.png", b"first")
+        archive.close(keep=False)
+        self.assertFalse(path.exists())
+        self.assertEqual(os.listdir(self.root), [])
+        # A second close does nothing
+        archive.close()
+        self.assertFalse(path.exists())
+
+    def test_discard_leaves_previous_archive(self):
+        path = self.root / "masks.tar"
+        path.write_bytes(b"previous run")
+        archive = OutputArchive(str(path))
+        archive.add("one.png", b"first")
+        archive.close(keep=False)
+        self.assertEqual(path.read_bytes(), b"previous run")
+        self.assertEqual(os.listdir(self.root), ["masks.tar"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
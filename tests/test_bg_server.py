@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's HTTP server (tools/bg-remover/server.py)
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+TOOL_DIR = Path(__file__).parent.parent / "tools" / "bg-remover"
+
+try:
+    import fastapi
+except ImportError:
+    fastapi = None
+
+try:
+    import onnx
+    import rembg  # noqa: F401
+    from onnx import TensorProto, helper
+except ImportError:
+    onnx = None
+
+
+def write_stand_in_model(path):
+    """A tiny ONNX graph with u2netp's input and output shapes: the mean of the channels."""
+    graph = helper.make_graph(
+        [helper.make_node("ReduceMean", ["input.1"], ["mask"], axes=[1], keepdims=1)],
+        "stand_in",
+        [helper.make_tensor_value_info("input.1", TensorProto.FLOAT, ["N", 3, 320, 320])],
+        [helper.make_tensor_value_info("mask", TensorProto.FLOAT, ["N", 1, 320, 320])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    path.parent.mkdir(parents=True, exist_ok=True)
+    onnx.save(model, str(path))
+
+
+@unittest.skipIf(fastapi is None or onnx is None, "needs fastapi, rembg and onnx")
+class TestServerExit(unittest.TestCase):
+    """The server process exits after serving"""
+
+    def test_exits_after_preload_and_batch(self):
+        script = textwrap.dedent("""
+            import asyncio
+            import numpy as np
+            import server
+            from processors.ort_session import configure_ort
+
+            configure_ort(graph_cache=False)
+            server.settings["preload"] = ["u2netp"]
+
+            async def main():
+                async with server.lifespan(server.app):
+                    image = np.zeros((40, 30, 3), dtype=np.uint8)
+                    mask = await server.get_batcher("u2netp").submit(image)
+                    png = server._encode(server.processors["u2netp"], image, mask, {}, "transparent")
+                print(mask.shape, png[:4])
+
+            asyncio.run(main())
+        """)
+        with tempfile.TemporaryDirectory() as home:
+            write_stand_in_model(Path(home) / "models" / "u2netp" / "u2netp.onnx")
+            try:
+                result = subprocess.run(
+                    [sys.executable, "-c", script], cwd=TOOL_DIR, capture_output=True, text=True,
+                    timeout=120, env={**os.environ, "U2NET_HOME": home}
+                )
+            except subprocess.TimeoutExpired:
+                self.fail("the server process did not exit")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("(40, 30) b'\\x89PNG'", result.stdout)
+
+
+@unittest.skipIf(fastapi is None, "needs fastapi")
+class TestServerStartup(unittest.TestCase):
+    """Refusing to start without a working backend"""
+
+    def test_refuses_to_start_without_rembg(self):
+        script = textwrap.dedent("""
+            import asyncio
+            from unittest import mock
+            import server
+
+            async def main():
+                with mock.patch.object(server, "missing_requirements", return_value=["rembg"]):
+                    async with server.lifespan(server.app):
+                        pass
+
+            try:
+                asyncio.run(main())
+            except RuntimeError as e:
+                print(e)
+        """)
+        result = subprocess.run(
+            [sys.executable, "-c", script], cwd=TOOL_DIR, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("The server needs rembg", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
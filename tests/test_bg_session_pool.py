@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's model session pool (tools/bg-remover/processors/session_pool.py)
+"""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from core.telemetry import configure_telemetry, load_spans
+from processors.session_pool import SessionPool
+
+
+class TestSessionPool(unittest.TestCase):
+    """LRU sessions under a byte budget"""
+
+    def setUp(self):
+        self.loads = []
+        self.settings = "s1"
+        self.pool = SessionPool(
+            250, self.load, size_estimator=lambda session: 100, settings_key=lambda: self.settings
+        )
+
+    def load(self, model):
+        self.loads.append(model)
+        return f"{model}:{self.settings}"
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.pool.get("a"), "a:s1")
+        self.assertEqual(self.pool.get("a"), "a:s1")
+        self.assertEqual(self.loads, ["a"])
+        stats = self.pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["resident_bytes"]), (1, 1, 100))
+
+    def test_evicts_least_recently_used(self):
+        self.pool.get("a")
+        self.pool.get("b")
+        self.pool.get("a")
+        self.pool.get("c")
+        self.assertEqual(self.pool.stats()["models"], ["a", "c"])
+        self.assertEqual(self.pool.evictions, 1)
+
+    def test_other_settings_load_again(self):
+        self.pool.get("a")
+        self.settings = "s2"
+        self.assertEqual(self.pool.get("a"), "a:s2")
+        self.assertEqual(self.loads, ["a", "a"])
+
+    def test_model_load_span_only_on_miss(self):
+        fd, path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        run_id = configure_telemetry(path)
+        try:
+            for model in ["a", "a", "b", "a"]:
+                self.pool.get(model)
+        finally:
+            configure_telemetry(None)
+        loads = [s["model"] for s in load_spans(path, run_id) if s["name"] == "model_load"]
+        self.assertEqual(loads, ["a", "b"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for the background remover's watch folders (tools/bg-remover/core/watch.py)
+"""
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "tools" / "bg-remover"))
+
+from core.watch import Debouncer, InotifyWatcher, OutputNames
+
+
+class TestDebouncer(unittest.TestCase):
+    """Holding files back until they stop changing"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "photo.jpg"
+        self.path.write_bytes(b"jpeg")
+        self.debouncer = Debouncer(settle_seconds=1.0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ready_after_settle_period(self):
+        self.debouncer.touch(self.path, now=10.0)
+        self.assertEqual(self.debouncer.ready(now=10.5), [])
+        self.assertEqual(self.debouncer.ready(now=11.0), [self.path])
+        self.assertEqual(len(self.debouncer), 0)
+
+    def test_touch_restarts_settle_period(self):
+        self.debouncer.touch(self.path, now=10.0)
+        self.debouncer.touch(self.path, now=10.8)
+        self.assertEqual(self.debouncer.ready(now=11.0), [])
+        self.assertEqual(self.debouncer.ready(now=11.8), [self.path])
+
+    def test_change_without_event_restarts_settle_period(self):
+        self.debouncer.touch(self.path, now=10.0)
+        with open(self.path, "ab") as f:
+            f.write(b" more")
+        self.assertEqual(self.debouncer.ready(now=11.0), [])
+        self.assertEqual(self.debouncer.ready(now=11.9), [])
+        self.assertEqual(self.debouncer.ready(now=12.0), [self.path])
+
+    def test_empty_and_deleted_files_are_dropped(self):
+        empty = Path(self.tmp.name) / "empty.jpg"
+        empty.write_bytes(b"")
+        self.debouncer.touch(empty, now=10.0)
+        self.debouncer.touch(self.path, now=10.0)
+        self.path.unlink()
+        self.assertEqual(self.debouncer.ready(now=11.0), [])
+        # The deletion changed the signature, so it settles once more first
+        self.assertEqual(self.debouncer.ready(now=12.0), [])
+        self.assertEqual(len(self.debouncer), 0)
+
+
+class TestOutputNames(unittest.TestCase):
+    """Naming outputs of watched inputs that share a stem"""
+
+    def setUp(self):
+        self.root = Path("in")
+        self.names = OutputNames(self.root, Path("out"), "_nobg", ".png")
+
+    def test_existing_inputs_sharing_a_stem_keep_their_extension(self):
+        self.names.add_all([self.root / "photo.jpg", self.root / "photo.png", self.root / "other.jpg"])
+        self.assertEqual(self.names.output_for(self.root / "photo.jpg"), Path("out/photo_jpg_nobg.png"))
+        self.assertEqual(self.names.output_for(self.root / "photo.png"), Path("out/photo_png_nobg.png"))
+        self.assertEqual(self.names.output_for(self.root / "other.jpg"), Path("out/other_nobg.png"))
+
+    def test_new_input_sharing_a_stem_keeps_its_extension(self):
+        self.names.add_all([self.root / "photo.jpg"])
+        self.assertEqual(self.names.output_for(self.root / "photo.png"), Path("out/photo_png_nobg.png"))
+        # The name already given does not change
+        self.assertEqual(self.names.output_for(self.root / "photo.jpg"), Path("out/photo_nobg.png"))
+
+    def test_next_to_inputs_without_output_dir(self):
+        names = OutputNames(self.root, None, "_nobg", ".png")
+        self.assertEqual(names.output_for(self.root / "sub" / "photo.jpg"), Path("in/sub/photo_nobg.png"))
+        self.assertEqual(names.output_for(self.root / "sub" / "photo.png"), Path("in/sub/photo_png_nobg.png"))
+
+    def test_remaining_collision_raises(self):
+        self.names.add_all([self.root / "photo_jpg.png", self.root / "photo.png"])
+        with self.assertRaises(ValueError):
+            self.names.output_for(self.root / "photo.jpg")
+        with self.assertRaises(ValueError):
+            OutputNames(self.root, None, "_nobg", ".png").add_all(
+                [self.root / "photo_jpg.png", self.root / "photo.jpg", self.root / "photo.png"]
+            )
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "inotify is Linux-only")
+class TestInotifyWatcher(unittest.TestCase):
+    """Recursive inotify watching"""
+
+    def test_reports_files_in_new_subdirectory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            watcher = InotifyWatcher(root)
+            try:
+                subdir = root / "new" / "deeper"
+                subdir.mkdir(parents=True)
+                image = subdir / "photo.png"
+                image.write_bytes(b"png")
+
+                seen = set()
+                deadline = time.monotonic() + 5
+                while image not in seen and time.monotonic() < deadline:
+                    seen.update(watcher.changes(timeout=0.5))
+                self.assertIn(image, seen)
+
+                # The new directory is watched from now on
+                later = subdir / "later.png"
+                later.write_bytes(b"png")
+                seen = set()
+                deadline = time.monotonic() + 5
+                while later not in seen and time.monotonic() < deadline:
+                    seen.update(watcher.changes(timeout=0.5))
+                self.assertIn(later, seen)
+            finally:
+                watcher.close()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
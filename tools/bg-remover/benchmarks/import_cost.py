@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: what each entry point costs to import
+Usage: python benchmarks/import_cost.py [modules...] [options]
+
+Imports each module in a fresh interpreter under ``python -X importtime`` and
+reports the total wall time plus the top-level packages that took longest
+(cumulative microseconds as measured by the interpreter). Also lists which
+processor backends are installed, checked without importing them.
+
+Examples:
+    python benchmarks/import_cost.py
+    python benchmarks/import_cost.py server rembg torch --top 5
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Tuple
+
+TOOL_DIR = Path(__file__).parent.parent
+
+# Add the tool directory to the path for imports
+sys.path.insert(0, str(TOOL_DIR))
+
+from processors.registry import BACKENDS, backend_report
+
+DEFAULT_MODULES = [
+    "cli_remove_bg",
+    "server",
+    "processors.rembg_processor",
+    "processors.sam3_processor",
+]
+
+
+def import_cost(module: str) -> Tuple[float, Dict[str, int], str]:
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        (wall seconds, {top-level package: cumulative microseconds}, error text)
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=TOOL_DIR, capture_output=True, text=True
+    )
+    seconds = time.perf_counter() - start
+
+    # importtime prints children before their parent, indented two spaces
+    # per level; the module's direct imports carry the cumulative cost of
+    # everything below them, so only those are counted
+    packages: Dict[str, int] = {}
+    children: Dict[str, int] = {}
+    error = ""
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            error = line
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        depth = len(fields[2]) - len(fields[2].lstrip())
+        name = fields[2].strip()
+        if depth == 3:
+            package = name.split(".")[0]
+            children[package] = children.get(package, 0) + int(fields[1])
+        elif depth == 1:
+            if name == module:
+                packages = children
+            children = {}
+    return seconds, packages, error if result.returncode else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time of the entry points")
+    parser.add_argument("modules", nargs="*", help=f"Modules to import (default: {', '.join(DEFAULT_MODULES)})")
+    parser.add_argument("--top", type=int, default=8, help="Packages to list per module")
+    args = parser.parse_args()
+
+    for module in args.modules or DEFAULT_MODULES:
+        seconds, packages, error = import_cost(module)
+        if error:
+            print(f"{module}: failed ({error})")
+            continue
+        print(f"{module}: {seconds:.2f}s")
+        ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+        for package, micros in ranked[:args.top]:
+            print(f"  {micros / 1e6:7.3f}s  {package}")
+
+    print("\nBackends:")
+    for name, info in backend_report().items():
+        state = "available" if info["available"] else f"missing {', '.join(info['missing'])}"
+        print(f"  {name:<6} {state} - requires {', '.join(BACKENDS[name].requires)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Benchmark: RGBA cutout output vs the mask-only output formats
+Usage: python benchmarks/mask_export.py [image mask] [options]
+
+Times everything that happens after the model for each output format
+(cutout, post-processing and encoding for rgba; encoding alone for the mask
+formats) and reports the encoded size. Without arguments, a synthetic 12MP
+image with a soft-edged mask is used.
+
+Examples:
+    python benchmarks/mask_export.py
+    python benchmarks/mask_export.py shot.jpg shot_mask.png --repeat 5
+"""
+
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+# Add the tool directory to the path for imports
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.constants import OUTPUT_FORMATS
+from utils.image import load_rgb_array, post_process_cutout
+from utils.mask_export import encode_mask
+
+
+def synthetic_sample(width: int, height: int, seed: int = 0) -> tuple:
+    """A noisy photo-like image and a soft-edged elliptical subject mask."""
+    rng = np.random.default_rng(seed)
+    small = (rng.random((height // 8, width // 8, 3)) * 255).astype(np.uint8)
+    image = np.asarray(Image.fromarray(small).resize((width, height), Image.Resampling.BICUBIC))
+    yy, xx = np.ogrid[0:height, 0:width]
+    inside = ((xx - width / 2) / (width * 0.3)) ** 2 + ((yy - height / 2) / (height * 0.35)) ** 2 < 1
+    mask = Image.fromarray((inside * 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(3))
+    return image, np.asarray(mask)
+
+
+def encode_rgba(image: np.ndarray, mask: np.ndarray) -> bytes:
+    """What cli_remove_bg.py does after the model for the default output."""
+    cutout = post_process_cutout(np.dstack((image, mask)), expand_canvas=False)
+    buffer = io.BytesIO()
+    Image.fromarray(cutout).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark output formats")
+    parser.add_argument("sample", nargs="*", help="An image and its mask (default: a synthetic sample)")
+    parser.add_argument("--size", default="4000x3000", help="Synthetic sample size (WxH)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per format (the fastest is reported)")
+    args = parser.parse_args()
+
+    if args.sample:
+        if len(args.sample) != 2:
+            parser.error("give an image and its mask")
+        image = load_rgb_array(args.sample[0])
+        with Image.open(args.sample[1]) as f:
+            mask = np.asarray(f.convert("L"))
+    else:
+        width, height = (int(v) for v in args.size.lower().split("x"))
+        image, mask = synthetic_sample(width, height)
+
+    baseline = None
+    for output_format in OUTPUT_FORMATS:
+        times = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            data = encode_rgba(image, mask) if output_format == "rgba" else encode_mask(mask, output_format)
+            times.append(time.perf_counter() - start)
+        seconds = min(times)
+        baseline = baseline or (seconds, len(data))
+        print(
+            f"{output_format:<10} {seconds * 1000:8.1f} ms {len(data) / 1024:10.1f} KB  "
+            f"({seconds / baseline[0] * 100:5.1f}% time, {len(data) / baseline[1] * 100:5.1f}% size)"
+        )
+
+
+if __name__ == "__main__":
+    main()
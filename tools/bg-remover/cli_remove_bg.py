@@ -8,17 +8,64 @@ Examples:
     python cli_remove_bg.py photo.jpg --output result.png
     python cli_remove_bg.py photo.jpg --model birefnet-portrait --background white
     python cli_remove_bg.py input/ --batch --output output/
+    python cli_remove_bg.py "shots/**/*.jpg" --output output/ --workers 8
+    python cli_remove_bg.py input/ --output output/ --threads-per-worker 4
+    python cli_remove_bg.py input/ --output output/ --resume
+    python cli_remove_bg.py catalog/ --output output/ --dedup
+    python cli_remove_bg.py dataset/ --format rle --archive masks.tar
+    python cli_remove_bg.py dropbox/ --watch --output done/ --workers 2
+    cat photo.jpg | python cli_remove_bg.py - > cutout.png
+    python cli_remove_bg.py --ndjson < jobs.ndjson > results.ndjson
+    python cli_remove_bg.py input/ --output output/ --trace run.trace.json
 """
 
 import argparse
+import base64
+import contextlib
+import functools
+import io
+import itertools
+import multiprocessing
+import os
+import shutil
 import sys
+import tempfile
+import time
+from collections import deque
 from pathlib import Path
-from PIL import Image, ImageFilter
-from typing import Optional
+from PIL import Image, ImageColor
+from typing import Callable, Optional
 import json
 
-from processors.rembg_processor import RembgProcessor
-from core.constants import REMBG_MODELS, BACKGROUND_OPTIONS, VALID_EXTENSIONS
+import numpy as np
+
+from processors.rembg_processor import RembgProcessor, download_model, configure_session_pool
+from core.constants import (
+    REMBG_MODELS, BACKGROUND_OPTIONS, VALID_EXTENSIONS, AUTO_MODEL, CASCADE_MODELS, MATTING_METHODS,
+    OUTPUT_FORMATS, MASK_FORMATS
+)
+from core.batch import (
+    is_batch_input, collect_inputs, input_root, mirror_output_paths, plan_threads, run_batch,
+    WorkerPool, JOBS_IN_FLIGHT_PER_WORKER
+)
+from core.manifest import BATCH_MANIFEST_NAME, DEFAULT_MAX_ATTEMPTS, JobManifest, input_signature
+from core.dedup import DEFAULT_DEDUP_DISTANCE, DUPLICATES_PER_JOB, align_mask, find_duplicate_groups
+from core.mask_cache import configure_mask_cache
+from core.telemetry import (
+    configure_telemetry, format_summary, get_telemetry_settings, load_spans, span, summarize, write_chrome_trace
+)
+from processors.registry import create_processor, warm
+from processors.ort_session import (
+    GRAPH_OPTIMIZATION_LEVELS, EXECUTION_MODES, configure_ort, get_default_graph_cache_dir
+)
+from core.high_res import DEFAULT_MAX_SIDE, process_high_res
+from core.watch import (
+    DEFAULT_SETTLE_SECONDS, Debouncer, OutputCollision, OutputNames, create_watcher, is_watched_file
+)
+from utils.hashing import bytes_digest, file_digest, settings_digest
+from utils.image import alpha_bbox, load_rgb_array, post_process_cutout
+from utils.mask_export import OutputArchive, encode_mask
+from utils.memory import process_memory
 
 
 def remove_background(
@@ -27,12 +74,17 @@ def remove_background(
     model: str = "birefnet-general",
     background: str = "transparent",
     alpha_matting: bool = False,
+    alpha_matting_method: str = "closed-form",
     auto_crop: bool = False,
     crop_margin: int = 10,
     sticker_mode: bool = False,
     sticker_color: str = "#ffffff",
     sticker_width: int = 5,
-    verbose: bool = False
+    verbose: bool = False,
+    processor: Optional[RembgProcessor] = None,
+    high_res: bool = False,
+    max_side: int = DEFAULT_MAX_SIDE,
+    output_format: str = "rgba"
 ) -> str:
     """
     Remove background from an image.
@@ -43,12 +95,20 @@ def remove_background(
         model: AI model to use (see REMBG_MODELS)
         background: Background type ('transparent', 'white', 'black')
         alpha_matting: Enable alpha matting for better edges
+        alpha_matting_method: Matting backend, 'closed-form' or 'guided' (much faster)
         auto_crop: Crop to subject bounds
         crop_margin: Margin around subject when cropping
         sticker_mode: Add outline around subject
         sticker_color: Outline color (hex)
         sticker_width: Outline width in pixels
         verbose: Print status messages
+        processor: Reuse an existing processor (keeps its model session warm)
+        high_res: Infer at max_side and stream the full-resolution result in
+            strips (for very large images; no alpha matting or sticker mode)
+        max_side: Longest side the model sees in high-res mode
+        output_format: "rgba" for the cutout, or a mask-only format (see
+            OUTPUT_FORMATS); masks ignore the background and can't have a
+            sticker outline
     
     Returns:
         Path to output file
@@ -60,10 +120,12 @@ def remove_background(
     
     if input_file.suffix.lower() not in VALID_EXTENSIONS:
         raise ValueError(f"Unsupported file format: {input_file.suffix}")
+    _check_output_format(output_format, sticker_mode, high_res, output_path)
     
     # Generate output path if not provided
     if output_path is None:
-        output_path = input_file.parent / f"{input_file.stem}_nobg.png"
+        suffix = "_mask" if output_format in MASK_FORMATS else "_nobg"
+        output_path = input_file.parent / f"{input_file.stem}{suffix}{OUTPUT_FORMATS[output_format]}"
     else:
         output_path = Path(output_path)
     
@@ -76,82 +138,1029 @@ def remove_background(
             print(f"[INFO] {msg}")
     
     # Initialize processor
-    processor = RembgProcessor()
+    if processor is None:
+        processor = create_processor("rembg")
+    
+    options = _processing_options(model, alpha_matting, alpha_matting_method)
     
-    # Build options
-    options = {
+    with span("image", image=str(input_file)):
+        if high_res:
+            if sticker_mode:
+                raise ValueError("Sticker mode is not supported in high-res mode")
+            status_cb(f"Processing {input_file.name} (high-res)...")
+            process_high_res(
+                processor, input_file, output_path, options,
+                max_side=max_side,
+                bg_color=BACKGROUND_OPTIONS[background][1],
+                crop_margin=crop_margin if auto_crop else None,
+                status_callback=status_cb
+            )
+            status_cb(f"Saved to {output_path}")
+            return str(output_path)
+
+        # Process image
+        status_cb(f"Processing {input_file.name}...")
+        with span("decode"):
+            image = load_rgb_array(input_file)
+        mask = processor.get_mask(input_file, image, options, status_cb)
+        data = _encode_output(
+            processor, image, mask, options, background, auto_crop, crop_margin,
+            sticker_mode, sticker_color, sticker_width, output_format, status_cb,
+            # Keeps e.g. "-o out.jpg --bg white" working
+            image_format=Image.registered_extensions().get(output_path.suffix.lower(), "PNG")
+        )
+        output_path.write_bytes(data)
+        status_cb(f"Saved to {output_path}")
+
+    return str(output_path)
+
+
+# Numbers in-memory jobs without a label, so their telemetry spans stay apart
+_bytes_job_numbers = itertools.count(1)
+
+
+def remove_background_bytes(
+    data: bytes,
+    model: str = "birefnet-general",
+    background: str = "transparent",
+    alpha_matting: bool = False,
+    alpha_matting_method: str = "closed-form",
+    auto_crop: bool = False,
+    crop_margin: int = 10,
+    sticker_mode: bool = False,
+    sticker_color: str = "#ffffff",
+    sticker_width: int = 5,
+    verbose: bool = False,
+    processor: Optional[RembgProcessor] = None,
+    output_format: str = "rgba",
+    label: Optional[str] = None
+) -> bytes:
+    """
+    Remove the background from encoded image bytes, without touching disk.
+
+    Takes the same options as remove_background() (high-res mode needs
+    files, so it isn't available here), plus a ``label`` naming the image in
+    telemetry spans (default: a per-process job number).
+
+    Returns:
+        The encoded result: a PNG, or for "rle" output JSON
+    """
+    def status_cb(msg: str):
+        if verbose:
+            print(f"[INFO] {msg}")
+
+    _check_output_format(output_format, sticker_mode, False)
+    if processor is None:
+        processor = create_processor("rembg")
+
+    if label is None:
+        label = f"<bytes #{next(_bytes_job_numbers)}>"
+    with span("image", image=label):
+        with span("decode"):
+            image = load_rgb_array(io.BytesIO(data))
+        options = _processing_options(model, alpha_matting, alpha_matting_method)
+        mask = processor.get_mask(None, image, options, status_cb)
+        return _encode_output(
+            processor, image, mask, options, background, auto_crop, crop_margin,
+            sticker_mode, sticker_color, sticker_width, output_format, status_cb
+        )
+
+
+def _check_output_format(
+    output_format: str, sticker_mode: bool, high_res: bool, output_path: Optional[str] = None
+) -> None:
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format in MASK_FORMATS and sticker_mode:
+        raise ValueError("Sticker mode is not supported for mask output")
+    if output_format in MASK_FORMATS and high_res:
+        raise ValueError("Mask output is not supported in high-res mode")
+    if high_res and output_path is not None and Path(output_path).suffix.lower() != ".png":
+        # The full-resolution result is streamed out as PNG rows
+        raise ValueError(f"High-res mode writes PNG files, got output {output_path}")
+
+
+def _encode_output(
+    processor: RembgProcessor,
+    image: np.ndarray,
+    mask: np.ndarray,
+    options: dict,
+    background: str,
+    auto_crop: bool,
+    crop_margin: int,
+    sticker_mode: bool,
+    sticker_color: str,
+    sticker_width: int,
+    output_format: str,
+    status_cb: Callable[[str], None],
+    image_format: str = "PNG"
+) -> bytes:
+    """Turn an image and its raw mask into the output file's contents."""
+    if output_format in MASK_FORMATS:
+        # No RGBA image at all: just the (matted) alpha, cropped to the subject if asked
+        if options["alpha_matting"]:
+            with span("matting"):
+                mask = processor.make_cutout(image, mask, options)[..., 3]
+        if auto_crop:
+            status_cb("Auto-cropping...")
+            box = alpha_bbox(mask, crop_margin)
+            if box is not None:
+                mask = mask[box[1]:box[3], box[0]:box[2]]
+        with span("encode"):
+            return encode_mask(mask, output_format)
+
+    with span("matting" if options["alpha_matting"] else "cutout"):
+        cutout = processor.make_cutout(image, mask, options)
+    with span("post_process"):
+        output_img = _finish_cutout(
+            cutout, background, auto_crop, crop_margin, sticker_mode, sticker_color, sticker_width, status_cb
+        )
+    with span("encode"):
+        buffer = io.BytesIO()
+        output_img.save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def _processing_options(model: str, alpha_matting: bool, alpha_matting_method: str) -> dict:
+    """Build the processor options for a model and matting choice."""
+    return {
         "model": model,
         "alpha_matting": alpha_matting,
         "alpha_matting_foreground_threshold": 240,
         "alpha_matting_background_threshold": 10,
         "alpha_matting_erode_size": 10,
+        "alpha_matting_method": alpha_matting_method,
     }
-    
-    # Process image
-    status_cb(f"Processing {input_file.name}...")
-    output_img = processor.process(input_file, output_path, options, status_cb)
-    
-    # Apply background
-    if background != "transparent":
-        bg_color = BACKGROUND_OPTIONS[background][1]
-        if bg_color:
-            bg_img = Image.new("RGB", output_img.size, bg_color)
-            bg_img.paste(output_img, (0, 0), output_img)
-            output_img = bg_img
-    
-    # Auto-crop if enabled
+
+
+def _finish_cutout(
+    cutout: np.ndarray,
+    background: str,
+    auto_crop: bool,
+    crop_margin: int,
+    sticker_mode: bool,
+    sticker_color: str,
+    sticker_width: int,
+    status_cb: Callable[[str], None]
+) -> Image.Image:
+    """Auto-crop, outline and put a background behind RGBA cutout pixels (one fused pass)."""
     if auto_crop:
         status_cb("Auto-cropping...")
-        bbox = output_img.getbbox()
-        if bbox:
-            x1, y1, x2, y2 = bbox
-            x1 = max(0, x1 - crop_margin)
-            y1 = max(0, y1 - crop_margin)
-            x2 = min(output_img.width, x2 + crop_margin)
-            y2 = min(output_img.height, y2 + crop_margin)
-            output_img = output_img.crop((x1, y1, x2, y2))
-    
-    # Sticker mode (add outline)
     if sticker_mode:
         status_cb("Adding sticker outline...")
-        # Create a stroke/outline
-        # Get alpha channel
-        r, g, b, a = output_img.split()
-        
-        # Dialate alpha channel to create outline
-        # Simple approach: Composite multiple shifted copies or use max filter
-        # Using MaxFilter for dilation
-        from PIL import ImageFilter
-        outline = a.filter(ImageFilter.MaxFilter(sticker_width * 2 + 1))
-        
-        # Create solid color image for outline
-        sticker_bg = Image.new("RGBA", output_img.size, sticker_color)
-        sticker_bg.putalpha(outline)
-        
-        # Paste original on top
-        sticker_bg.paste(output_img, (0, 0), output_img)
-        output_img = sticker_bg
-
-    # Save final result
-    output_img.save(output_path)
-    status_cb(f"Saved to {output_path}")
-    
-    return str(output_path)
+    return Image.fromarray(post_process_cutout(
+        cutout,
+        crop_margin=crop_margin if auto_crop else None,
+        outline_width=sticker_width if sticker_mode else 0,
+        outline_color=ImageColor.getrgb(sticker_color)[:3],
+        bg_color=BACKGROUND_OPTIONS[background][1],
+        expand_canvas=False
+    ))
+
+
+def _create_processor(
+    pool_mb: Optional[int] = None,
+    mask_cache: bool = True,
+    ort_settings: Optional[dict] = None,
+    telemetry: Optional[tuple] = None,
+    stdout_to_stderr: bool = False
+) -> RembgProcessor:
+    """Build a batch worker's processor, applying the session pool, mask cache, ONNX Runtime and telemetry settings.
+
+    With stdout_to_stderr (stdout carries an archive), a worker process sends
+    everything it writes to its stdout to stderr instead. A worker thread
+    shares the main process's stdout, which the caller has redirected.
+    """
+    if stdout_to_stderr and multiprocessing.parent_process() is not None:
+        # At the descriptor level, so native libraries' output moves too
+        sys.stdout.flush()
+        os.dup2(sys.stderr.fileno(), 1)
+    if pool_mb:
+        configure_session_pool(pool_mb)
+    if not mask_cache:
+        configure_mask_cache(enabled=False)
+    if ort_settings:
+        configure_ort(**ort_settings)
+    if telemetry and get_telemetry_settings() != telemetry:
+        configure_telemetry(*telemetry)
+    return create_processor("rembg")
+
+
+def _batch_task(processor: RembgProcessor, job: tuple) -> tuple:
+    """Process one batch job inside a worker process.
+
+    A job is (input, output, settings, duplicates, mask). Near-duplicates (see
+    core/dedup.py) are (input, output) pairs that reuse an image's mask,
+    aligned to them, instead of running the model again:
+
+    - no duplicates: process the image
+    - duplicates but no mask: process the image (their representative) and
+      return its mask, so the caller can queue the duplicates
+    - duplicates and the representative's mask: only align and write the
+      duplicates; the representative is just decoded
+
+    An output of None returns the encoded file in the result instead of
+    writing it (for --archive). If the image itself fails, the job raises;
+    a failed duplicate only fails its own result.
+
+    Returns:
+        (results, worker_pid, worker session pool stats, worker "auto" cascade stats),
+        with one result dict per image: input, output, seconds, output_hash,
+        input_stat and input_hash (taken before decoding), mask ("model",
+        "reused" or, when alignment was rejected, "fallback"), for output None
+        data, and for a representative reference_mask - or input, output and error
+    """
+    input_path, output_path, settings, duplicates, mask = job
+    start = time.perf_counter()
+    if mask is not None:
+        results = _align_duplicates(processor, input_path, settings, duplicates, mask)
+    elif output_path is not None and not duplicates:
+        signature = input_signature(input_path)
+        output = remove_background(str(input_path), str(output_path), processor=processor, **settings)
+        results = [_job_result(input_path, output, start, "model", signature)]
+    else:
+        results = [_process_representative(processor, input_path, output_path, settings, start, bool(duplicates))]
+    return results, os.getpid(), processor.get_pool_stats(), processor.get_cascade_stats()
+
+
+def _job_result(
+    input_path: Path,
+    output_path: Optional[str],
+    start: float,
+    mask_source: str,
+    signature: tuple,
+    data: Optional[bytes] = None
+) -> dict:
+    input_stat, input_hash = signature
+    result = {
+        "input": str(input_path),
+        "output": output_path and str(output_path),
+        "seconds": time.perf_counter() - start,
+        "output_hash": file_digest(output_path) if data is None else bytes_digest(data),
+        "input_stat": input_stat,
+        "input_hash": input_hash,
+        "mask": mask_source,
+    }
+    if data is not None:
+        result["data"] = data
+    return result
+
+
+def _group_options(settings: dict) -> dict:
+    """Processor options for an image handled outside remove_background()."""
+    if settings["high_res"]:
+        raise ValueError("High-res mode needs an output file")
+    _check_output_format(settings["output_format"], settings["sticker_mode"], False)
+    return _processing_options(settings["model"], settings["alpha_matting"], settings["alpha_matting_method"])
+
+
+def _finish_image(
+    processor: RembgProcessor,
+    settings: dict,
+    options: dict,
+    input_path: Path,
+    signature: tuple,
+    image: np.ndarray,
+    mask: np.ndarray,
+    output_path: Optional[Path],
+    mask_source: str,
+    start: float
+) -> dict:
+    """Encode an image with its mask and write it (or, for output None, return it) as a job result."""
+    data = _encode_output(
+        processor, image, mask, options, settings["background"], settings["auto_crop"],
+        settings["crop_margin"], settings["sticker_mode"], settings["sticker_color"],
+        settings["sticker_width"], settings["output_format"], lambda msg: None
+    )
+    if output_path is None:
+        return _job_result(input_path, None, start, mask_source, signature, data)
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    output_path.write_bytes(data)
+    return _job_result(input_path, output_path, start, mask_source, signature)
+
+
+def _process_representative(
+    processor: RembgProcessor,
+    input_path: Path,
+    output_path: Optional[Path],
+    settings: dict,
+    start: float,
+    keep_mask: bool
+) -> dict:
+    """Run the model on one image; with keep_mask, its mask is returned for its duplicates."""
+    options = _group_options(settings)
+    with span("image", image=str(input_path)):
+        signature = input_signature(input_path)
+        with span("decode"):
+            image = load_rgb_array(input_path)
+        mask = processor.get_mask(Path(input_path), image, options)
+        result = _finish_image(processor, settings, options, input_path, signature, image, mask, output_path,
+                               "model", start)
+    if keep_mask:
+        result["reference_mask"] = mask
+    return result
+
+
+def _align_duplicates(
+    processor: RembgProcessor,
+    input_path: Path,
+    settings: dict,
+    duplicates: tuple,
+    mask: np.ndarray
+) -> list:
+    """Give near-duplicates their representative's mask, aligned to each (see _batch_task())."""
+    options = _group_options(settings)
+    with span("decode", image=str(input_path)):
+        image = load_rgb_array(input_path)
+
+    results = []
+    for duplicate_input, duplicate_output in duplicates:
+        start = time.perf_counter()
+        try:
+            with span("image", image=str(duplicate_input)):
+                signature = input_signature(duplicate_input)
+                with span("decode"):
+                    duplicate = load_rgb_array(duplicate_input)
+                with span("align"):
+                    duplicate_mask = align_mask(mask, image, duplicate)
+                mask_source = "reused"
+                if duplicate_mask is None:
+                    duplicate_mask = processor.get_mask(Path(duplicate_input), duplicate, options)
+                    mask_source = "fallback"
+                results.append(_finish_image(
+                    processor, settings, options, duplicate_input, signature, duplicate, duplicate_mask,
+                    duplicate_output, mask_source, start
+                ))
+        except Exception as e:
+            results.append({"input": str(duplicate_input), "output": duplicate_output, "error": e})
+    return results
+
+
+def _settings_hash(settings: dict) -> str:
+    """Digest of everything that shapes an output: the CLI settings plus the processor options they imply."""
+    options = _processing_options(settings["model"], settings["alpha_matting"], settings["alpha_matting_method"])
+    return settings_digest({**settings, "options": options})
+
+
+def run_batch_mode(args, settings: dict, ort_settings: dict) -> int:
+    """
+    Process a directory or glob of images with a pool of worker processes.
+
+    Outputs mirror the input tree under ``--output`` (or sit next to each
+    input when no output directory is given). Every finished job is appended
+    to a manifest (see core/manifest.py), which makes re-runs incremental, as
+    in make: inputs it records as done with the same settings, and that are
+    unchanged since, are skipped unless ``--force`` is given. With
+    ``--resume``, failed inputs are also retried only up to
+    ``--max-attempts`` times in total. With ``--dedup``, near-identical
+    inputs are grouped (see core/dedup.py) and only the first of each group
+    goes through the model; once it is done, the rest of the group is queued
+    in jobs of DUPLICATES_PER_JOB that align its mask. If it fails, they run
+    the model themselves. With ``--archive``, outputs are streamed into one
+    tar file instead; every input is then processed and nothing is logged.
+
+    Returns:
+        Process exit code
+    """
+    output_dir = Path(args.output) if args.output else None
+    inputs = collect_inputs(args.input, exclude_dir=output_dir, exclude_suffix=args.suffix)
+    if not inputs:
+        print(f"Error: No images found in {args.input}")
+        return 1
+
+    extension = OUTPUT_FORMATS[settings["output_format"]]
+    try:
+        if args.archive:
+            # Member names: a tar keeps duplicates, but extracting one keeps only the last
+            outputs = mirror_output_paths([relative for _, relative in inputs], Path(), args.suffix, extension)
+        elif output_dir is not None:
+            outputs = mirror_output_paths([relative for _, relative in inputs], output_dir, args.suffix, extension)
+        else:
+            # Next to each input
+            outputs = mirror_output_paths([path for path, _ in inputs], Path(), args.suffix, extension)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    jobs = []
+    members = {}  # input -> archive member name
+    for (input_path, _), output_path in zip(inputs, outputs):
+        if args.archive:
+            members[str(input_path)] = output_path.as_posix()
+            output_path = None
+        jobs.append((input_path, output_path, settings, (), None))
+
+    manifest = JobManifest(
+        Path(args.manifest) if args.manifest else (output_dir or input_root(args.input)) / BATCH_MANIFEST_NAME
+    )
+    settings_hash = _settings_hash(settings)
+    # An archive is written from scratch, so it needs every input
+    incremental = not args.archive
+    if incremental and not args.force:
+        pending = []
+        finished = gave_up = 0
+        for job in jobs:
+            if manifest.is_done(job[0], job[1], settings_hash):
+                finished += 1
+            elif args.resume and manifest.failures(job[0], settings_hash) >= args.max_attempts:
+                gave_up += 1
+            else:
+                pending.append(job)
+        if finished or gave_up:
+            print(
+                f"[INFO] {finished} up to date, {len(pending)} to process"
+                + (f", {gave_up} skipped after failing {args.max_attempts} times" if gave_up else "")
+            )
+        jobs = pending
+        if not jobs:
+            manifest.close()
+            return 1 if gave_up else 0
+    manifest.compact()
+
+    total = len(jobs)
+    job_count = total
+    dedup_stats = None
+    if args.dedup:
+        if settings["high_res"]:
+            print("Error: --dedup is not supported with --high-res")
+            manifest.close()
+            return 1
+        # Inputs that failed before run on their own rather than lead a group
+        candidates = [job for job in jobs if not manifest.failures(job[0], settings_hash)]
+        with span("dedup_index"):
+            groups, dedup_stats = find_duplicate_groups([job[0] for job in candidates], args.dedup_distance)
+        jobs = [job for job in jobs if manifest.failures(job[0], settings_hash)] + [
+            (*candidates[group[0]][:3], tuple(candidates[i][:2] for i in group[1:]), None) for group in groups
+        ]
+        # Representatives and plain images, plus the align jobs queued after them
+        job_count = len(jobs) + sum(
+            -(-(len(group) - 1) // DUPLICATES_PER_JOB) for group in groups
+        )
+
+    done = [0]
+    counts = {"completed": 0, "failed": 0, "model": 0, "reused": 0, "fallback": 0}
+    worker_pool_stats = {}
+    worker_memory = {}
+    worker_cascade_stats = {}
+
+    def record_failure(input_path, output_path, error):
+        done[0] += 1
+        counts["failed"] += 1
+        if incremental:
+            manifest.record(input_path, output_path, settings_hash, error=error)
+        print(f"[{done[0]}/{total}] Error: {input_path}: {error}")
+
+    def on_progress(job, result, error):
+        """Record a finished job; returns the jobs its duplicates need next."""
+        input_path, output_path, _, duplicates, mask = job
+        if error is not None:
+            if mask is None:
+                record_failure(input_path, output_path, error)
+            if duplicates:
+                # Without the representative's mask, each duplicate runs the model itself
+                print(f"[INFO] Running the model on {len(duplicates)} near-duplicates of {input_path} instead")
+            return [(duplicate, output, settings, (), None) for duplicate, output in duplicates]
+
+        results, pid, pool_stats, cascade_stats = result
+        reference_mask = None
+        for item in results:
+            reference_mask = item.pop("reference_mask", reference_mask)
+            if "error" in item:
+                record_failure(item["input"], item["output"], item["error"])
+                continue
+            done[0] += 1
+            counts["completed"] += 1
+            counts[item["mask"]] += 1
+            if archive is not None:
+                item["output"] = f"{args.archive}:{members[item['input']]}"
+                archive.add(members[item["input"]], item["data"])
+            else:
+                manifest.record(
+                    item["input"], item["output"], settings_hash, seconds=item["seconds"],
+                    output_hash=item["output_hash"], input_hash=item["input_hash"],
+                    input_stat=item["input_stat"]
+                )
+            if args.verbose:
+                print(f"[{done[0]}/{total}] {item['input']} -> {item['output']}")
+        worker_pool_stats[pid] = pool_stats
+        worker_cascade_stats[pid] = cascade_stats
+        if args.memory_report:
+            # Sampled while the worker is still alive; the last sample is reported
+            worker_memory[pid] = process_memory(pid, get_default_graph_cache_dir())
+        if mask is not None or not duplicates:
+            return []
+        # The representative is done: its duplicates align its mask, spread over the workers
+        return [
+            (input_path, output_path, settings, duplicates[i:i + DUPLICATES_PER_JOB], reference_mask)
+            for i in range(0, len(duplicates), DUPLICATES_PER_JOB)
+        ]
+
+    # Fetch the model once up front so workers don't race to download it
+    download_model(settings["model"])
+
+    workers, threads = plan_threads(
+        args.workers, args.threads_per_worker or args.intra_op_threads, job_count
+    )
+    ort_settings = {**ort_settings, "intra_op_threads": threads}
+
+    print(
+        f"[INFO] Processing {total} images with model {settings['model']} "
+        f"({workers} workers x {threads} threads)..."
+    )
+    archive = OutputArchive(args.archive) if args.archive else None
+    try:
+        summary = run_batch(
+            jobs,
+            _batch_task,
+            functools.partial(
+                _create_processor, args.pool_mb, not args.no_mask_cache, ort_settings, get_telemetry_settings(),
+                args.archive == "-"
+            ),
+            workers=workers,
+            progress_callback=on_progress,
+            threads_per_worker=threads,
+            job_count=job_count
+        )
+    except BaseException:
+        if archive is not None:
+            archive.close(keep=False)
+        raise
+    finally:
+        manifest.close()
+    if archive is not None:
+        archive.close()
+
+    elapsed = summary["elapsed"]
+    print(
+        f"Completed: {counts['completed']}/{total} images "
+        f"({counts['failed']} errors) in {elapsed:.1f}s - "
+        f"{(counts['completed'] / elapsed) if elapsed > 0 else 0.0:.2f} images/s on {summary['workers']} workers"
+    )
+    if archive is not None:
+        print(f"[INFO] Archived {archive.members} files to {'stdout' if args.archive == '-' else args.archive}")
+    if dedup_stats is not None:
+        print(
+            f"[INFO] Near-duplicates: {dedup_stats['duplicates']} of {dedup_stats['images']} images in "
+            f"{dedup_stats['groups']} groups (indexed in {dedup_stats['seconds']:.1f}s); "
+            f"{counts['reused']} reused an aligned mask, {counts['fallback']} ran the model after alignment "
+            f"failed, {counts['model']} model runs in total"
+        )
+    pools = worker_pool_stats.values()
+    if any(p["hits"] or p["misses"] for p in pools):
+        print(
+            f"[INFO] Model sessions: {sum(p['hits'] for p in pools)} hits, "
+            f"{sum(p['misses'] for p in pools)} loads ({sum(p['load_seconds'] for p in pools):.1f}s), "
+            f"{max(p['resident_bytes'] for p in pools) / 1024 ** 2:.0f} MB resident per worker"
+        )
+    if settings["model"] == AUTO_MODEL and worker_cascade_stats:
+        cascades = worker_cascade_stats.values()
+        print(
+            f"[INFO] Auto model: {sum(c['escalated'] for c in cascades)}/"
+            f"{sum(c['images'] for c in cascades)} images escalated to {CASCADE_MODELS[1]}"
+        )
+    if worker_memory:
+        # unique: pages only this worker maps; shared: pages mapped by others too
+        # (the model store's weights, libraries); PSS splits shared pages evenly
+        for pid, memory in sorted(worker_memory.items()):
+            if memory:
+                print(
+                    f"[INFO] Worker {pid}: {memory['unique_mb']:.0f} MB unique, {memory['shared_mb']:.0f} MB shared "
+                    f"({memory['mapped_mb']:.0f} MB model store mapped), PSS {memory['pss_mb']:.0f} MB"
+                )
+        print(f"[INFO] Workers' total PSS: {sum(m.get('pss_mb', 0) for m in worker_memory.values()):.0f} MB")
+    return 1 if counts["failed"] else 0
+
+
+def run_watch_mode(args, settings: dict, ort_settings: dict) -> int:
+    """
+    Process images as they appear in a directory tree, until interrupted.
+
+    Existing images are processed first. Workers keep their model sessions for
+    the whole run. Each finished image is recorded in the same manifest batch
+    mode keeps (see run_batch_mode()), so after a restart, or after a batch
+    run over the tree, only new or changed images, or ones last processed
+    with other settings, go through the model. An image whose content was
+    already processed under another name gets a copy of that output.
+
+    Returns:
+        Process exit code
+    """
+    root = Path(args.input)
+    if not root.is_dir():
+        print(f"Error: --watch needs a directory, got {args.input}")
+        return 1
+    output_dir = Path(args.output) if args.output else None
+    exclude_dir = output_dir.resolve() if output_dir is not None else None
+    settings_hash = _settings_hash(settings)
+    manifest = JobManifest(Path(args.manifest) if args.manifest else (output_dir or root) / BATCH_MANIFEST_NAME)
+    manifest.compact()
+
+    output_names = OutputNames(root, output_dir, args.suffix, OUTPUT_FORMATS[settings["output_format"]])
+
+    download_model(settings["model"])
+    workers, threads = plan_threads(
+        args.workers, args.threads_per_worker or args.intra_op_threads, sys.maxsize
+    )
+    ort_settings = {**ort_settings, "intra_op_threads": threads}
+
+    # Start watching before listing what's there, so nothing slips in between
+    watcher = create_watcher(root, output_dir, poll=args.poll)
+    debouncer = Debouncer(args.settle)
+    existing = [path for path, _ in collect_inputs(str(root), exclude_dir=output_dir, exclude_suffix=args.suffix)]
+    try:
+        output_names.add_all(existing)
+    except ValueError as e:
+        watcher.close()
+        print(f"Error: {e}")
+        return 1
+    for path in existing:
+        debouncer.touch(path)
+
+    queued = deque()
+    in_flight = {}  # future -> (input, output)
+    counts = {"processed": 0, "reused": 0, "skipped": 0, "failed": 0}
+    max_in_flight = workers * JOBS_IN_FLIGHT_PER_WORKER
+
+    def collect_finished() -> None:
+        for future in [f for f in in_flight if f.done()]:
+            path, output = in_flight.pop(future)
+            if future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                counts["failed"] += 1
+                manifest.record(path, output, settings_hash, error=error)
+                print(f"Error: {path}: {error}")
+                continue
+            item = future.result()[0][0]
+            manifest.record(
+                path, output, settings_hash, seconds=item["seconds"], output_hash=item["output_hash"],
+                input_hash=item["input_hash"], input_stat=item["input_stat"]
+            )
+            counts["processed"] += 1
+            print(f"{path} -> {output}")
+
+    def dispatch(pool: WorkerPool) -> None:
+        while queued and len(in_flight) < max_in_flight:
+            path = queued.popleft()
+            try:
+                output = output_names.output_for(path)
+            except OutputCollision as e:
+                counts["failed"] += 1
+                manifest.record(path, e.output, settings_hash, error=e)
+                print(f"Error: {e}")
+                continue
+            if manifest.is_done(path, output, settings_hash):
+                counts["skipped"] += 1
+                if args.verbose:
+                    print(f"Up to date: {path}")
+                continue
+            try:
+                input_stat, input_hash = input_signature(path)
+            except OSError:
+                continue  # deleted after settling
+            previous = manifest.done_output(input_hash, settings_hash)
+            if previous is not None and previous.resolve() != output.resolve():
+                # Same image under another name - copy the earlier result
+                output.parent.mkdir(parents=True, exist_ok=True)
+                shutil.copyfile(previous, output)
+                manifest.record(
+                    path, output, settings_hash, output_hash=file_digest(output),
+                    input_hash=input_hash, input_stat=input_stat
+                )
+                counts["reused"] += 1
+                print(f"{path} -> {output} (copied from {previous.name})")
+                continue
+            in_flight[pool.submit((path, output, settings, (), None))] = (path, output)
+
+    print(
+        f"[INFO] Watching {root} with model {settings['model']} "
+        f"({workers} workers x {threads} threads, {len(manifest)} images in manifest) - Ctrl+C to stop"
+    )
+    start = time.perf_counter()
+    if workers == 1:
+        # The worker is a thread of this process (see processors/registry.py)
+        warm("rembg")
+    pool = WorkerPool(
+        _batch_task,
+        functools.partial(
+            _create_processor, args.pool_mb, not args.no_mask_cache, ort_settings, get_telemetry_settings()
+        ),
+        workers, threads
+    )
+    try:
+        while True:
+            busy = {job[0] for job in in_flight.values()} | set(queued)
+            timeout = 0.2 if (in_flight or len(debouncer)) else 1.0
+            for path in watcher.changes(timeout):
+                if is_watched_file(path, exclude_dir, args.suffix):
+                    debouncer.touch(path)
+            for path in debouncer.ready():
+                if path in busy:
+                    # Changed again while queued or processing; look again later
+                    debouncer.touch(path)
+                else:
+                    queued.append(path)
+            collect_finished()
+            dispatch(pool)
+    except KeyboardInterrupt:
+        print("\n[INFO] Stopping - waiting for running jobs...")
+    finally:
+        watcher.close()
+        pool.shutdown(cancel_pending=True)
+        collect_finished()
+        manifest.close()
+
+    print(
+        f"Processed {counts['processed']} images ({counts['failed']} errors), copied {counts['reused']} "
+        f"duplicates, {counts['skipped']} already up to date, in {time.perf_counter() - start:.0f}s"
+    )
+    return 1 if counts["failed"] else 0
+
+
+def run_stream_mode(args, settings: dict) -> int:
+    """
+    Read an image from stdin (input ``-``) and/or write the result to stdout (``-o -``).
+
+    Returns:
+        Process exit code
+    """
+    if settings["high_res"]:
+        print("Error: --high-res needs file input and output", file=sys.stderr)
+        return 1
+    options = {k: v for k, v in settings.items() if k not in ("high_res", "max_side")}
+
+    # Keep status messages off stdout, which may carry the image
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            data = sys.stdin.buffer.read() if args.input == "-" else Path(args.input).read_bytes()
+            png = remove_background_bytes(
+                data, verbose=args.verbose, label="<stdin>" if args.input == "-" else args.input, **options
+            )
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+
+    if args.output in (None, "-"):
+        sys.stdout.buffer.write(png)
+        sys.stdout.buffer.flush()
+    else:
+        output_path = Path(args.output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_path.write_bytes(png)
+    return 0
+
+
+# Per-job option fields of the NDJSON protocol (remove_background() arguments)
+NDJSON_JOB_OPTIONS = (
+    "model", "background", "alpha_matting", "alpha_matting_method", "auto_crop", "crop_margin",
+    "sticker_mode", "sticker_color", "sticker_width", "high_res", "max_side", "output_format",
+)
+
+
+def _run_ndjson_job(request: dict, defaults: dict, processor: RembgProcessor) -> dict:
+    """Run one NDJSON job and return the result fields of its response."""
+    unknown = set(request) - {"id", "input", "data", "output"} - set(NDJSON_JOB_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+    options = {**defaults, **{k: request[k] for k in NDJSON_JOB_OPTIONS if k in request}}
+    if options["model"] not in REMBG_MODELS:
+        raise ValueError(f"Unknown model: {options['model']}")
+    if options["background"] not in BACKGROUND_OPTIONS:
+        raise ValueError(f"Unknown background: {options['background']}")
+    if options["alpha_matting_method"] not in MATTING_METHODS:
+        raise ValueError(f"Unknown alpha matting method: {options['alpha_matting_method']}")
+
+    output = request.get("output")
+    if "input" in request and output:
+        # File to file: the mask cache and high-res mode work as usual
+        return {"output": remove_background(request["input"], output, processor=processor, **options)}
+
+    if "input" in request:
+        data = Path(request["input"]).read_bytes()
+    elif "data" in request:
+        data = base64.b64decode(request["data"], validate=True)
+    else:
+        raise ValueError("A job needs 'input' (an image path) or 'data' (base64 image bytes)")
+    if options.pop("high_res"):
+        raise ValueError("high_res needs 'input' and 'output' paths")
+    options.pop("max_side")
+
+    if "id" in request:
+        label = f"<ndjson id={request['id']}>"
+    else:
+        label = request.get("input")
+    encoded = remove_background_bytes(data, processor=processor, label=label, **options)
+    if output:
+        Path(output).parent.mkdir(parents=True, exist_ok=True)
+        Path(output).write_bytes(encoded)
+        return {"output": output}
+    return {"data": base64.b64encode(encoded).decode("ascii")}
+
+
+def run_ndjson_mode(settings: dict) -> int:
+    """
+    Serve jobs from stdin until it closes, one JSON object per line.
+
+    A job names its image with ``input`` (a path) or ``data`` (base64) and
+    may set ``output`` (a path), an ``id`` echoed back, and any of
+    NDJSON_JOB_OPTIONS to override the command-line settings. Each job gets
+    one response line, in order: ``{"id", "ok": true, "output" or "data"
+    (base64 of the encoded output), "seconds"}`` or ``{"id", "ok": false, "error", "seconds"}``.
+    One processor serves every job, so the model session stays warm.
+
+    Returns:
+        Process exit code (job errors are reported in their responses)
+    """
+    protocol = sys.stdout
+    processor = create_processor("rembg")
+
+    # Anything else printed while processing goes to stderr
+    with contextlib.redirect_stdout(sys.stderr):
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            start = time.perf_counter()
+            request = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("Each line must be a JSON object")
+                response = {"id": request.get("id"), "ok": True, **_run_ndjson_job(request, settings, processor)}
+            except Exception as e:
+                job_id = request.get("id") if isinstance(request, dict) else None
+                response = {"id": job_id, "ok": False, "error": str(e)}
+            response["seconds"] = round(time.perf_counter() - start, 4)
+            protocol.write(json.dumps(response) + "\n")
+            protocol.flush()
+    return 0
+
 
 def main():
     parser = argparse.ArgumentParser(description="Remove background from images")
-    parser.add_argument("input", help="Input image path")
-    parser.add_argument("--output", "-o", help="Output path")
+    parser.add_argument("input", nargs="?", help="Input image path, directory or glob pattern (- for stdin)")
+    parser.add_argument("--output", "-o", help="Output path (output directory in batch mode, - for stdout)")
+    parser.add_argument("--ndjson", action="store_true",
+                        help="Read one JSON job per line from stdin, write one JSON result per line to stdout")
     parser.add_argument("--model", "-m", default="birefnet-general", choices=REMBG_MODELS.keys())
     parser.add_argument("--bg", "-b", dest="background", default="transparent", choices=BACKGROUND_OPTIONS.keys())
     parser.add_argument("--alpha", "-a", action="store_true", help="Enable alpha matting")
+    parser.add_argument("--alpha-method", default=None, choices=MATTING_METHODS,
+                        help="Alpha matting backend, with --alpha; guided is much faster (default: closed-form)")
     parser.add_argument("--crop", "-c", action="store_true", help="Auto crop")
+    parser.add_argument("--crop-margin", type=int, default=10, help="Margin around the subject when cropping")
     parser.add_argument("--sticker", "-s", action="store_true", help="Sticker mode")
     parser.add_argument("--sticker-color", default="#ffffff", help="Sticker color")
+    parser.add_argument("--sticker-width", type=int, default=5, help="Sticker outline width in pixels")
+    parser.add_argument("--format", "-f", default="rgba", choices=OUTPUT_FORMATS.keys(),
+                        help="rgba cutout, or only the mask: 8-bit PNG (mask), 1-bit PNG (mask-1bit) "
+                             "or COCO RLE JSON (rle)")
+    parser.add_argument("--archive", default=None, metavar="FILE",
+                        help="Batch mode: write all outputs into one tar (.tar.gz compressed, - for stdout)")
+    parser.add_argument("--batch", action="store_true", help="Treat input as a directory or glob of images")
+    parser.add_argument("--watch", "-w", action="store_true",
+                        help="Keep running and process images as they are added to the input directory")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="Seconds a watched file must stop changing before it is processed")
+    parser.add_argument("--poll", action="store_true",
+                        help="Poll the watched directory instead of using inotify (network shares)")
+    parser.add_argument("--workers", "-j", type=int, default=None,
+                        help="Batch worker processes (default: CPU count)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="Batch mode: reuse one mask across near-identical images")
+    parser.add_argument("--dedup-distance", type=int, default=DEFAULT_DEDUP_DISTANCE, metavar="BITS",
+                        help="Perceptual hash bits (of 64) near-identical images may differ in "
+                             f"(default: {DEFAULT_DEDUP_DISTANCE})")
+    parser.add_argument("--force", action="store_true",
+                        help="Batch mode: reprocess images that are already up to date")
+    parser.add_argument("--resume", action="store_true",
+                        help="Batch mode: skip images that already failed --max-attempts times with the same settings")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help="With --resume, stop retrying an image after it failed this many times")
+    parser.add_argument("--manifest", default=None,
+                        help=f"Batch and watch job log (default: {BATCH_MANIFEST_NAME} in the output or input directory)")
+    parser.add_argument("--suffix", default=None,
+                        help="Output filename suffix in batch mode (default: _nobg, or _mask for mask formats)")
+    parser.add_argument("--pool-mb", type=int, default=None,
+                        help="RAM budget for resident model sessions (default: session_pool_mb setting)")
+    parser.add_argument("--no-mask-cache", action="store_true",
+                        help="Don't read or write the shared mask cache")
+    parser.add_argument("--high-res", action="store_true",
+                        help="Infer at reduced size and write full resolution in strips (huge images); "
+                             "the source is still decoded once at full size")
+    parser.add_argument("--max-side", type=int, default=DEFAULT_MAX_SIDE,
+                        help="Longest side the model sees in high-res mode")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Model threads per batch worker (default: CPU count / workers)")
+    parser.add_argument("--intra-op-threads", type=int, default=None,
+                        help="ONNX Runtime threads within an operator (default: ort_intra_op_threads setting)")
+    parser.add_argument("--inter-op-threads", type=int, default=None,
+                        help="ONNX Runtime threads across operators (parallel execution mode only)")
+    parser.add_argument("--execution-mode", choices=EXECUTION_MODES, default=None,
+                        help="ONNX Runtime execution mode")
+    parser.add_argument("--graph-opt", choices=GRAPH_OPTIMIZATION_LEVELS, default=None,
+                        help="ONNX Runtime graph optimisation level")
+    parser.add_argument("--providers", default=None,
+                        help="Comma-separated execution providers in priority order, "
+                             "e.g. CUDAExecutionProvider,CPUExecutionProvider")
+    parser.add_argument("--no-mem-arena", action="store_true",
+                        help="Disable ONNX Runtime's CPU memory arena (lower peak RAM, slower)")
+    parser.add_argument("--no-graph-cache", action="store_true",
+                        help="Don't use the model store (cached optimised graphs with memory-mapped, shared weights)")
+    parser.add_argument("--no-prepack", action="store_true",
+                        help="Don't repack weights per process: workers share all weight pages, at some speed cost")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Report each batch worker's unique and shared memory")
+    parser.add_argument("--telemetry", default=None, metavar="FILE",
+                        help="Append per-stage timing/memory spans to this JSONL file and print a summary")
+    parser.add_argument("--trace", default=None, metavar="FILE",
+                        help="Write a Chrome trace (chrome://tracing, Perfetto) of the run's stages")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also record per-stage heap peaks with tracemalloc (slower)")
     parser.add_argument("-v", "--verbose", action="store_true")
     
     args = parser.parse_args()
-    
+    # NDJSON jobs can turn matting on themselves, so there it is only a default
+    if args.alpha_method is not None and not args.alpha and not args.ndjson:
+        parser.error("--alpha-method needs --alpha")
+    args.alpha_method = args.alpha_method or "closed-form"
+    if args.suffix is None:
+        args.suffix = "_mask" if args.format in MASK_FORMATS else "_nobg"
+
+    if args.pool_mb:
+        configure_session_pool(args.pool_mb)
+    if args.no_mask_cache:
+        configure_mask_cache(enabled=False)
+
+    ort_settings = {
+        "intra_op_threads": args.intra_op_threads,
+        "inter_op_threads": args.inter_op_threads,
+        "execution_mode": args.execution_mode,
+        "graph_optimization": args.graph_opt,
+        "providers": [p.strip() for p in args.providers.split(",") if p.strip()] if args.providers else None,
+        "enable_mem_arena": False if args.no_mem_arena else None,
+        "graph_cache": False if args.no_graph_cache else None,
+        "prepack_weights": False if args.no_prepack else None,
+    }
+    configure_ort(**ort_settings)
+
+    settings = {
+        "model": args.model,
+        "background": args.background,
+        "alpha_matting": args.alpha,
+        "alpha_matting_method": args.alpha_method,
+        "auto_crop": args.crop,
+        "crop_margin": args.crop_margin,
+        "sticker_mode": args.sticker,
+        "sticker_color": args.sticker_color,
+        "sticker_width": args.sticker_width,
+        "high_res": args.high_res,
+        "max_side": args.max_side,
+        "output_format": args.format,
+    }
+
+    telemetry_path = args.telemetry
+    if args.trace and not telemetry_path:
+        # A trace alone still needs the spans of every worker in one place
+        fd, telemetry_path = tempfile.mkstemp(prefix="bg_remover_spans_", suffix=".jsonl")
+        os.close(fd)
+    run_id = configure_telemetry(telemetry_path, memory=args.trace_memory) if telemetry_path else None
+
+    # ndjson and stream modes own stdout, so their report goes to stderr
+    report_stream = (
+        sys.stderr if args.ndjson or args.input == "-" or args.output == "-" or args.archive == "-" else sys.stdout
+    )
+    try:
+        exit_code = _run_mode(parser, args, settings, ort_settings)
+    finally:
+        if run_id:
+            configure_telemetry(None)
+            _report_telemetry(telemetry_path, run_id, args.trace, report_stream)
+            if not args.telemetry:
+                os.remove(telemetry_path)
+    sys.exit(exit_code)
+
+
+def _run_mode(parser: argparse.ArgumentParser, args, settings: dict, ort_settings: dict) -> int:
+    """Dispatch to the mode the arguments ask for; returns the exit code."""
+    if args.ndjson:
+        return run_ndjson_mode(settings)
+    if args.input is None:
+        parser.error("an input path is required (or - for stdin, or --ndjson)")
+    if args.input == "-" or args.output == "-":
+        return run_stream_mode(args, settings)
+
+    if args.watch:
+        return run_watch_mode(args, settings, ort_settings)
+    if args.batch or is_batch_input(args.input):
+        if args.archive == "-":
+            # The archive owns stdout, so progress goes to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                return run_batch_mode(args, settings, ort_settings)
+        return run_batch_mode(args, settings, ort_settings)
+    if args.archive:
+        parser.error("--archive needs a directory or glob input")
+
     try:
         result = remove_background(
             args.input,
@@ -159,15 +1168,35 @@ def main():
             model=args.model,
             background=args.background,
             alpha_matting=args.alpha,
+            alpha_matting_method=args.alpha_method,
             auto_crop=args.crop,
+            crop_margin=args.crop_margin,
             sticker_mode=args.sticker,
             sticker_color=args.sticker_color,
+            sticker_width=args.sticker_width,
+            high_res=args.high_res,
+            max_side=args.max_side,
+            output_format=args.format,
             verbose=args.verbose or True 
         )
         print(f"Success: {result}")
     except Exception as e:
         print(f"Error: {e}")
-        sys.exit(1)
+        return 1
+    return 0
+
+
+def _report_telemetry(telemetry_path: str, run_id: str, trace_path: Optional[str], stream) -> None:
+    """Print the per-stage summary of a run and write its Chrome trace."""
+    spans = load_spans(telemetry_path, run_id)
+    if not spans:
+        return
+    print("\nTelemetry:", file=stream)
+    print(format_summary(summarize(spans)), file=stream)
+    if trace_path:
+        write_chrome_trace(spans, trace_path)
+        print(f"Trace written to {trace_path} (open in chrome://tracing or ui.perfetto.dev)", file=stream)
+
 
 if __name__ == "__main__":
     main()
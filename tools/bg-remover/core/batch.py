@@ -0,0 +1,348 @@
+"""
+Batch processing - input discovery and a process-pool worker farm.
+
+Each worker process builds its processor once (via ``processor_factory``) and
+keeps it for the lifetime of the pool, so model sessions stay warm across jobs.
+"""
+
+import glob
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from core.constants import VALID_EXTENSIONS
+except ImportError:
+    from .constants import VALID_EXTENSIONS
+
+
+# Jobs kept in flight per worker; enough to hide scheduling latency without
+# queueing the whole batch inside the executor.
+JOBS_IN_FLIGHT_PER_WORKER = 4
+
+# Per-process state, populated by _init_worker
+_worker_processor = None
+
+
+def is_batch_input(source: str) -> bool:
+    """Check whether an input argument names a directory or a glob pattern."""
+    return Path(source).is_dir() or glob.has_magic(source)
+
+
+def _glob_root(pattern: str) -> Path:
+    """Get the longest leading directory of a glob pattern without wildcards."""
+    parts = []
+    for part in Path(pattern).parts:
+        if glob.has_magic(part):
+            break
+        parts.append(part)
+    if len(parts) == len(Path(pattern).parts):
+        # No magic at all - the pattern is a plain path
+        return Path(pattern).parent
+    return Path(*parts) if parts else Path(".")
+
+
+def input_root(source: str) -> Path:
+    """Get the directory collect_inputs() reports relative paths against."""
+    return Path(source) if Path(source).is_dir() else _glob_root(source)
+
+
+def collect_inputs(
+    source: str,
+    exclude_dir: Optional[Path] = None,
+    exclude_suffix: Optional[str] = None
+) -> List[Tuple[Path, Path]]:
+    """
+    Collect image files from a directory (recursively) or a glob pattern.
+
+    Args:
+        source: Directory path or glob pattern (``**`` is supported)
+        exclude_dir: Skip files inside this directory (e.g. the output tree)
+        exclude_suffix: Skip files whose stem ends with this suffix
+            (previous outputs written next to their inputs)
+
+    Returns:
+        Sorted list of (input_path, path_relative_to_source_root) tuples
+    """
+    root = input_root(source)
+    if Path(source).is_dir():
+        candidates: Iterable[Path] = root.rglob("*")
+    else:
+        candidates = (Path(p) for p in glob.glob(source, recursive=True))
+
+    exclude = exclude_dir.resolve() if exclude_dir is not None else None
+    inputs = []
+    for path in candidates:
+        if path.is_file() and is_input_file(path, exclude, exclude_suffix):
+            inputs.append((path, path.relative_to(root)))
+
+    inputs.sort(key=lambda item: str(item[1]))
+    return inputs
+
+
+def is_input_file(
+    path: Path,
+    exclude_dir: Optional[Path] = None,
+    exclude_suffix: Optional[str] = None
+) -> bool:
+    """
+    Check whether a path names an image to process (see collect_inputs()).
+
+    ``exclude_dir`` must already be resolved.
+    """
+    if path.suffix.lower() not in VALID_EXTENSIONS:
+        return False
+    if exclude_suffix and path.stem.endswith(exclude_suffix):
+        return False
+    return exclude_dir is None or exclude_dir not in path.resolve().parents
+
+
+def mirror_output_path(
+    relative_path: Path,
+    output_dir: Path,
+    suffix: str = "_nobg",
+    extension: str = ".png",
+    keep_extension: bool = False
+) -> Path:
+    """Map an input's path relative to the source root into the output tree.
+
+    With keep_extension, the input's extension stays in the name
+    (photo.jpg -> photo_jpg_nobg.png).
+    """
+    stem = relative_path.stem
+    if keep_extension and relative_path.suffix:
+        stem = f"{stem}_{relative_path.suffix[1:]}"
+    return output_dir / relative_path.parent / f"{stem}{suffix}{extension}"
+
+
+def mirror_output_paths(
+    relative_paths: List[Path],
+    output_dir: Path,
+    suffix: str = "_nobg",
+    extension: str = ".png"
+) -> List[Path]:
+    """
+    mirror_output_path() for a whole batch, without two inputs sharing an output.
+
+    Inputs that differ only in their extension (photo.jpg, photo.png) keep it
+    in their output's name; the rest of the batch is named as usual.
+
+    Raises:
+        ValueError: If two inputs would still be written to the same path
+    """
+    outputs = [mirror_output_path(path, output_dir, suffix, extension) for path in relative_paths]
+    shared = {output for output, count in Counter(outputs).items() if count > 1}
+    if shared:
+        outputs = [
+            mirror_output_path(path, output_dir, suffix, extension, keep_extension=output in shared)
+            for path, output in zip(relative_paths, outputs)
+        ]
+    first_input = {}
+    for path, output in zip(relative_paths, outputs):
+        if output in first_input:
+            raise ValueError(f"{first_input[output]} and {path} would both be written to {output}")
+        first_input[output] = path
+    return outputs
+
+
+def resolve_workers(workers: Optional[int], job_count: int) -> int:
+    """Clamp the requested worker count to the CPU count and the number of jobs."""
+    if not workers or workers < 1:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, job_count))
+
+
+def plan_threads(
+    workers: Optional[int],
+    threads_per_worker: Optional[int],
+    job_count: int
+) -> Tuple[int, int]:
+    """
+    Split the CPU cores between worker processes and their model thread pools.
+
+    Given neither, runs one worker per core. Given only threads_per_worker,
+    runs as many workers as fit in the cores; given only workers, splits the
+    cores evenly between them.
+
+    Returns:
+        (workers, threads_per_worker)
+    """
+    cores = os.cpu_count() or 1
+    if not workers and threads_per_worker:
+        workers = max(1, cores // threads_per_worker)
+    workers = resolve_workers(workers, job_count)
+    if not threads_per_worker or threads_per_worker < 1:
+        threads_per_worker = max(1, cores // workers)
+    return workers, threads_per_worker
+
+
+def _init_worker(processor_factory: Callable[[], Any], threads_per_worker: int) -> None:
+    """Pool initializer: pin model threads and build this process's processor."""
+    global _worker_processor
+    # ONNX Runtime sessions fall back to OMP_NUM_THREADS when no thread count is
+    # configured; without it every worker grabs all cores and they oversubscribe.
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads_per_worker))
+    _worker_processor = processor_factory()
+
+
+def _run_job(task: Callable[[Any, Any], Any], job: Any) -> Any:
+    """Run one job against this worker's warm processor."""
+    return task(_worker_processor, job)
+
+
+def _spawn_pool(processor_factory: Callable[[], Any], workers: int, threads_per_worker: int) -> ProcessPoolExecutor:
+    """Start worker processes that each build their processor once."""
+    # Spawn rather than fork: the parent has already imported rembg, whose
+    # numba/onnxruntime thread pools are not fork-safe.
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(processor_factory, threads_per_worker)
+    )
+
+
+class WorkerPool:
+    """
+    Long-lived workers with warm processors, for jobs that arrive over time.
+
+    run_batch() needs the whole job list up front; a WorkerPool takes jobs one
+    at a time (e.g. from a watched folder). With a single worker the job runs
+    on a background thread of this process instead of a child process.
+    """
+
+    def __init__(
+        self,
+        task: Callable[[Any, Any], Any],
+        processor_factory: Callable[[], Any],
+        workers: int,
+        threads_per_worker: int
+    ):
+        self.task = task
+        self.workers = workers
+        if workers == 1:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(processor_factory, threads_per_worker)
+            )
+        else:
+            self._executor = _spawn_pool(processor_factory, workers, threads_per_worker)
+
+    def submit(self, job: Any) -> Future:
+        """Queue a job; the future's result is ``task(processor, job)``."""
+        return self._executor.submit(_run_job, self.task, job)
+
+    def shutdown(self, cancel_pending: bool = False) -> None:
+        """Wait for running jobs to finish, optionally dropping queued ones."""
+        self._executor.shutdown(wait=True, cancel_futures=cancel_pending)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.shutdown(cancel_pending=exc_type is not None)
+
+
+def run_batch(
+    jobs: List[Any],
+    task: Callable[[Any, Any], Any],
+    processor_factory: Callable[[], Any],
+    workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[Any, Any, Optional[Exception]], Optional[Iterable[Any]]]] = None,
+    threads_per_worker: Optional[int] = None,
+    job_count: Optional[int] = None
+) -> dict:
+    """
+    Run jobs across a pool of worker processes.
+
+    ``task`` and ``processor_factory`` must be picklable (module-level functions,
+    classes or functools.partial of those), since they are sent to the workers.
+
+    Args:
+        jobs: Job descriptions passed to ``task``
+        task: ``task(processor, job)`` - processes a single job
+        processor_factory: Builds the per-worker processor
+        workers: Number of worker processes (see plan_threads())
+        progress_callback: Called as ``callback(job, result, error)`` in the
+            parent process after each job finishes; it may return further
+            jobs (work that needed this job's result), which are queued
+        threads_per_worker: Model threads per worker (see plan_threads())
+        job_count: Jobs expected in total, counting ones progress_callback
+            will add, for sizing the pool (default: len(jobs))
+
+    Returns:
+        Summary dict with completed/failed counts, elapsed seconds and throughput
+    """
+    workers, threads_per_worker = plan_threads(workers, threads_per_worker, job_count or len(jobs))
+    start = time.perf_counter()
+    completed = 0
+    failed = 0
+    queue = deque(jobs)
+
+    for job, result, error in _iter_results(queue, task, processor_factory, workers, threads_per_worker):
+        if error is None:
+            completed += 1
+        else:
+            failed += 1
+        if progress_callback:
+            queue.extend(progress_callback(job, result, error) or ())
+
+    elapsed = time.perf_counter() - start
+    return {
+        "total": completed + failed,
+        "completed": completed,
+        "failed": failed,
+        "workers": workers,
+        "threads_per_worker": threads_per_worker,
+        "elapsed": elapsed,
+        "images_per_second": (completed / elapsed) if elapsed > 0 else 0.0,
+    }
+
+
+def _iter_results(
+    queue: "deque[Any]",
+    task: Callable[[Any, Any], Any],
+    processor_factory: Callable[[], Any],
+    workers: int,
+    threads_per_worker: int
+) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """
+    Yield (job, result, error) as jobs finish, keeping a bounded number in flight.
+
+    Jobs are taken from the front of ``queue``; the consumer may append more
+    while a result is being handled.
+    """
+    if workers == 1:
+        # No pool overhead for a single worker; the processor is still reused.
+        processor = processor_factory()
+        while queue:
+            job = queue.popleft()
+            try:
+                yield job, task(processor, job), None
+            except Exception as e:
+                yield job, None, e
+        return
+
+    max_in_flight = workers * JOBS_IN_FLIGHT_PER_WORKER
+
+    with _spawn_pool(processor_factory, workers, threads_per_worker) as pool:
+        in_flight = {}
+
+        def fill() -> None:
+            while queue and len(in_flight) < max_in_flight:
+                job = queue.popleft()
+                in_flight[pool.submit(_run_job, task, job)] = job
+
+        fill()
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = in_flight.pop(future)
+                error = future.exception()
+                yield job, (None if error else future.result()), error
+                fill()
@@ -4,6 +4,7 @@ Constants and configuration values for the application.
 
 # Available rembg models with descriptions
 REMBG_MODELS = {
+    "auto": "Auto - BiRefNet Lite, BiRefNet General only when unsure",
     "birefnet-general": "BiRefNet General - Best quality, most accurate",
     "birefnet-general-lite": "BiRefNet Lite - Faster, good quality",
     "birefnet-portrait": "BiRefNet Portrait - Optimized for faces",
@@ -20,6 +21,36 @@ REMBG_MODELS = {
     "sam": "SAM - Segment Anything Model",
 }
 
+# Dynamically quantised variants, built locally from the downloaded FP32 model
+# (see processors/quantize.py): "<model>-int8"
+INT8_SUFFIX = "-int8"
+QUANTIZABLE_MODELS = tuple(
+    name for name in REMBG_MODELS if name not in ("auto", "sam")
+)
+REMBG_MODELS.update({
+    f"{name}{INT8_SUFFIX}": f"{REMBG_MODELS[name].split(' - ')[0]} int8 - Quantised, faster on CPU"
+    for name in QUANTIZABLE_MODELS
+})
+
+# "auto" runs the first model, scores its mask and re-runs with the second
+# only when the score says the mask is unreliable
+AUTO_MODEL = "auto"
+CASCADE_MODELS = ("birefnet-general-lite", "birefnet-general")
+
+# Mask quality limits for the auto cascade (measured on a <=512px copy)
+CASCADE_THRESHOLDS = {
+    "max_mid_alpha_fraction": 0.04,  # share of pixels that are neither fg nor bg
+    "max_edge_width": 3.0,           # soft pixels per boundary pixel
+    "max_stray_fraction": 0.02,      # fg area outside the main object(s)
+    "max_fragments": 4,              # separate objects larger than 0.5% of the image
+    "min_fg_fraction": 0.005,        # found (almost) nothing
+    "max_fg_fraction": 0.98,         # kept (almost) everything
+}
+
+# Alpha matting backends: rembg's closed-form solver, or the fast
+# colour-line + guided filter refinement in utils/matting.py
+MATTING_METHODS = ("closed-form", "guided")
+
 # SAM3 is a special mode, not in the regular dropdown
 SAM3_MODEL_INFO = "SAM3 - Text-based segmentation (270K+ concepts)"
 
@@ -39,6 +70,16 @@ BACKGROUND_OPTIONS = {
     "black": ("Black", (0, 0, 0)),
 }
 
+# Output formats: key -> file extension. "rgba" is the cutout; the others
+# hold only the alpha mask (see utils/mask_export.py)
+OUTPUT_FORMATS = {
+    "rgba": ".png",
+    "mask": ".png",
+    "mask-1bit": ".png",
+    "rle": ".json",
+}
+MASK_FORMATS = ("mask", "mask-1bit", "rle")
+
 # Supported image formats
 VALID_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tiff', '.tif'}
 
@@ -51,17 +92,36 @@ DEFAULT_CONFIG = {
     "alpha_matting_fg_threshold": 240,
     "alpha_matting_bg_threshold": 10,
     "alpha_matting_erode_size": 10,
+    "alpha_matting_method": "closed-form",
     "output_format": "png",
     "auto_process": True,
     "use_sam3": False,
     "sam3_prompt": "",
     "sam3_keep_subject": True,
+    "sam3_embedding_cache_mb": 512,
     "hf_token": "",
     "auto_crop": False,
     "auto_crop_margin": 10,
     "sticker_mode": False,
     "sticker_color": "#ffffff",
     "sticker_width": 5,
+    "session_pool_mb": 2048,
+    "mask_cache": True,
+    "mask_cache_dir": "",
+    "mask_cache_mb": 1024,
+    "mask_cache_memory_mb": 256,
+    "ort_intra_op_threads": 0,
+    "ort_inter_op_threads": 0,
+    "ort_graph_optimization": "all",
+    "ort_execution_mode": "sequential",
+    "ort_enable_mem_arena": True,
+    "ort_enable_mem_pattern": True,
+    "ort_providers": [],
+    "ort_graph_cache": True,
+    "ort_prepack_weights": True,
+    "telemetry_file": "",
+    "telemetry_memory": False,
+    "trace_file": "",
 }
 
 # Window dimensions
@@ -0,0 +1,285 @@
+"""
+Near-duplicate detection - lets near-identical shots in a batch (same item,
+same background, a few pixels of offset, a recompression or a resize) share
+one model run.
+
+find_duplicate_groups() hashes a small greyscale copy of every input (see
+utils.hashing.perceptual_hash) and groups inputs whose hashes are within
+``max_distance`` bits and whose aspect ratios match. Representatives are
+indexed by hash chunks: two hashes that differ in at most ``max_distance``
+bits agree exactly on at least one of ``max_distance + 1`` chunks, so each
+input is only compared with the few representatives sharing a chunk rather
+than with all of them. The first input of a group is its representative;
+only it goes through the model.
+
+align_mask() then maps the representative's mask onto a duplicate. It
+rescales the mask to the duplicate's size, finds the offset between the two
+images by phase correlation and shifts the mask by that offset. If the aligned
+images still differ noticeably, it returns None and the caller runs the model
+after all.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    from utils.hashing import PERCEPTUAL_HASH_SIDE, hamming_distance, perceptual_hash
+    from utils.tiling import reduce_to_fit
+except ImportError:
+    from ..utils.hashing import PERCEPTUAL_HASH_SIDE, hamming_distance, perceptual_hash
+    from ..utils.tiling import reduce_to_fit
+
+
+# Hash bits (of 64) two images may differ in and still count as duplicates;
+# false matches are caught by align_mask()'s check
+DEFAULT_DEDUP_DISTANCE = 10
+
+# Duplicates aligned per batch job, so a large group spreads over the workers
+DUPLICATES_PER_JOB = 12
+
+# Relative aspect-ratio difference still treated as the same framing
+_ASPECT_TOLERANCE = 0.02
+
+# Images are aligned on copies no larger than this...
+_ALIGN_SIDE = 256
+# ...then refined on a full-resolution window of this size around the subject
+_REFINE_SIDE = 512
+
+# Mean absolute greyscale difference (0-255) of the aligned images above
+# which the mask is not reused
+_MAX_ALIGNED_DIFFERENCE = 8.0
+
+
+def _hash_input(path: Union[str, Path]) -> Optional[Tuple[int, float]]:
+    """(perceptual hash, aspect ratio) of an image file, or None if it can't be read."""
+    try:
+        with Image.open(path) as f:
+            # JPEGs decode straight at 1/2..1/8 scale
+            f.draft("RGB", (PERCEPTUAL_HASH_SIDE * 4, PERCEPTUAL_HASH_SIDE * 4))
+            image = ImageOps.exif_transpose(f).convert("L")
+    except (OSError, ValueError):
+        return None
+    aspect = image.width / image.height
+    gray = np.asarray(image.resize((PERCEPTUAL_HASH_SIDE, PERCEPTUAL_HASH_SIDE), Image.Resampling.BOX))
+    return perceptual_hash(gray), aspect
+
+
+class DuplicateIndex:
+    """Representatives' perceptual hashes, looked up by exact match on hash chunks."""
+
+    def __init__(self, max_distance: int = DEFAULT_DEDUP_DISTANCE):
+        self.max_distance = max_distance
+        chunks = min(max_distance + 1, 64)
+        self._bounds = [(64 * i // chunks, 64 * (i + 1) // chunks) for i in range(chunks)]
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in self._bounds]
+        self._entries: List[Tuple[int, float]] = []
+
+    def _chunks(self, phash: int):
+        for i, (start, stop) in enumerate(self._bounds):
+            yield i, (phash >> start) & ((1 << (stop - start)) - 1)
+
+    def add(self, phash: int, aspect: float) -> int:
+        """Index a representative; returns its id."""
+        entry_id = len(self._entries)
+        self._entries.append((phash, aspect))
+        for i, chunk in self._chunks(phash):
+            self._buckets[i].setdefault(chunk, []).append(entry_id)
+        return entry_id
+
+    def find(self, phash: int, aspect: float) -> Optional[int]:
+        """Id of the closest representative within max_distance and of the same aspect ratio, if any."""
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for i, chunk in self._chunks(phash):
+            for entry_id in self._buckets[i].get(chunk, ()):
+                if entry_id in seen:
+                    continue
+                seen.add(entry_id)
+                other_hash, other_aspect = self._entries[entry_id]
+                if abs(aspect - other_aspect) > _ASPECT_TOLERANCE * other_aspect:
+                    continue
+                distance = hamming_distance(phash, other_hash)
+                if distance < best_distance:
+                    best, best_distance = entry_id, distance
+        return best
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def find_duplicate_groups(
+    paths: List[Union[str, Path]],
+    max_distance: int = DEFAULT_DEDUP_DISTANCE,
+    workers: Optional[int] = None
+) -> Tuple[List[List[int]], dict]:
+    """
+    Group near-identical images.
+
+    Args:
+        paths: Image files, in processing order
+        max_distance: Hash bits two images may differ in (see DEFAULT_DEDUP_DISTANCE)
+        workers: Decode threads (default: CPU count)
+
+    Returns:
+        (groups, stats). Groups are lists of indices into ``paths``, the
+        representative first, covering every path once (unreadable files stay
+        on their own). Stats hold images, groups (with duplicates),
+        duplicates, unreadable and seconds.
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        hashes = list(pool.map(_hash_input, paths))
+
+    index = DuplicateIndex(max_distance)
+    groups: List[List[int]] = []
+    group_of_entry: List[int] = []
+    for i, hashed in enumerate(hashes):
+        entry_id = index.find(*hashed) if hashed is not None else None
+        if entry_id is not None:
+            groups[group_of_entry[entry_id]].append(i)
+            continue
+        if hashed is not None:
+            index.add(*hashed)
+            group_of_entry.append(len(groups))
+        groups.append([i])
+
+    duplicates = sum(len(group) - 1 for group in groups)
+    return groups, {
+        "images": len(paths),
+        "groups": sum(1 for group in groups if len(group) > 1),
+        "duplicates": duplicates,
+        "unreadable": sum(1 for hashed in hashes if hashed is None),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def _gray(image: Union[np.ndarray, Image.Image], max_side: int) -> np.ndarray:
+    """float32 greyscale copy of an RGB image, reduced to fit max_side."""
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    return np.asarray(reduce_to_fit(image, max_side).convert("L"), dtype=np.float32)
+
+
+def _phase_correlate(reference: np.ndarray, moved: np.ndarray) -> Tuple[float, float]:
+    """Sub-pixel (dy, dx) such that ``moved`` is ``reference`` shifted by it."""
+    height, width = reference.shape
+    window = np.outer(np.hanning(height), np.hanning(width)).astype(np.float32)
+    cross = np.fft.rfft2(moved * window) * np.conj(np.fft.rfft2(reference * window))
+    cross /= np.maximum(np.abs(cross), 1e-9)
+    surface = np.fft.irfft2(cross, s=reference.shape)
+    y, x = np.unravel_index(np.argmax(surface), surface.shape)
+
+    def refine(before: float, peak: float, after: float) -> float:
+        # Vertex of the parabola through the peak and its neighbours
+        curvature = before - 2 * peak + after
+        return 0.5 * (before - after) / curvature if curvature < 0 else 0.0
+
+    dy = y + refine(surface[y - 1, x], surface[y, x], surface[(y + 1) % height, x])
+    dx = x + refine(surface[y, x - 1], surface[y, x], surface[y, (x + 1) % width])
+    # Peaks past the middle are negative shifts
+    if dy > height / 2:
+        dy -= height
+    if dx > width / 2:
+        dx -= width
+    return float(dy), float(dx)
+
+
+def _shift(array: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    """Shift a 2-D array by whole pixels, repeating the edge into the uncovered border."""
+    height, width = array.shape
+    dy = max(-height + 1, min(height - 1, dy))
+    dx = max(-width + 1, min(width - 1, dx))
+    padded = np.pad(array, ((max(dy, 0), max(-dy, 0)), (max(dx, 0), max(-dx, 0))), mode="edge")
+    top, left = max(-dy, 0), max(-dx, 0)
+    return np.ascontiguousarray(padded[top:top + height, left:left + width])
+
+
+def _overlap_difference(reference: np.ndarray, moved: np.ndarray, dy: float, dx: float) -> float:
+    """
+    Mean absolute difference of two images where they overlap after shifting
+    ``reference`` by the sub-pixel offset (dy, dx).
+
+    The shifted reference is interpolated bilinearly: compared at the rounded
+    offset, a textured image differs from itself shifted by half a pixel by
+    more than the threshold.
+    """
+    height, width = reference.shape
+    top, left = int(np.floor(dy)), int(np.floor(dx))
+    fy, fx = dy - top, dx - left
+    shifted = (
+        (1 - fy) * (1 - fx) * _shift(reference, top, left)
+        + (1 - fy) * fx * _shift(reference, top, left + 1)
+        + fy * (1 - fx) * _shift(reference, top + 1, left)
+        + fy * fx * _shift(reference, top + 1, left + 1)
+    )
+    # Rows and columns every one of the four shifts covers with real pixels
+    ys = slice(max(top + 1, 0), height + min(top, 0))
+    xs = slice(max(left + 1, 0), width + min(left, 0))
+    overlap = np.abs(moved[ys, xs] - shifted[ys, xs])
+    return float(overlap.mean()) if overlap.size else float("inf")
+
+
+def _refine_window(mask: np.ndarray, side: int) -> Tuple[slice, slice]:
+    """A window of at most side x side centred on the mask's subject (or the image centre)."""
+    height, width = mask.shape
+    rows = np.flatnonzero(mask.max(axis=1) > 127)
+    cols = np.flatnonzero(mask.max(axis=0) > 127)
+    cy = (rows[0] + rows[-1]) // 2 if rows.size else height // 2
+    cx = (cols[0] + cols[-1]) // 2 if cols.size else width // 2
+    rows, cols = min(side, height), min(side, width)
+    top = min(max(cy - rows // 2, 0), height - rows)
+    left = min(max(cx - cols // 2, 0), width - cols)
+    return slice(top, top + rows), slice(left, left + cols)
+
+
+def align_mask(mask: np.ndarray, source: np.ndarray, target: np.ndarray) -> Optional[np.ndarray]:
+    """
+    Map the mask of one image onto a near-duplicate of it.
+
+    Args:
+        mask: HxW uint8 mask of ``source``
+        source: HxWx3 uint8 RGB pixels the mask was predicted for
+        target: H'xW'x3 uint8 RGB pixels of the near-duplicate
+
+    Returns:
+        H'xW' uint8 mask for ``target``, or None when the images still differ
+        too much after alignment for the mask to be trusted
+    """
+    target_height, target_width = target.shape[:2]
+    target_gray = _gray(target, _ALIGN_SIDE)
+    source_gray = _gray(source, _ALIGN_SIDE)
+    if source_gray.shape != target_gray.shape:
+        source_gray = np.asarray(
+            Image.fromarray(source_gray).resize(target_gray.shape[::-1], Image.Resampling.BILINEAR)
+        )
+
+    # Coarse offset on the reduced copies, checked before anything full-size is touched
+    dy, dx = _phase_correlate(source_gray, target_gray)
+    if _overlap_difference(source_gray, target_gray, dy, dx) > _MAX_ALIGNED_DIFFERENCE:
+        return None
+    scale = target_height / target_gray.shape[0]
+    dy, dx = dy * scale, dx * scale
+
+    if mask.shape != (target_height, target_width):
+        mask = np.asarray(
+            Image.fromarray(mask).resize((target_width, target_height), Image.Resampling.BILINEAR)
+        )
+    elif scale > 1:
+        # Same size: refine the offset at full resolution, on a window around
+        # the subject and the window the coarse offset moves it to
+        rows, cols = _refine_window(mask, _REFINE_SIDE)
+        top = min(max(rows.start + round(dy), 0), target_height - (rows.stop - rows.start))
+        left = min(max(cols.start + round(dx), 0), target_width - (cols.stop - cols.start))
+        reference = _gray(source[rows, cols], _REFINE_SIDE)
+        moved = _gray(target[top:top + rows.stop - rows.start, left:left + cols.stop - cols.start], _REFINE_SIDE)
+        fine_dy, fine_dx = _phase_correlate(reference, moved)
+        dy = top - rows.start + fine_dy
+        dx = left - cols.start + fine_dx
+
+    return _shift(mask, round(dy), round(dx))
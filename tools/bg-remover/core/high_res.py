@@ -0,0 +1,149 @@
+"""
+High-res mode - low-resolution inference with strip-wise full-resolution output.
+
+The model sees a copy of the image reduced to ``max_side``. Its mask is then
+upsampled one horizontal strip at a time, refined against the full-resolution
+pixels near the subject's boundary, applied, and streamed to a PNG writer.
+Apart from the decoded source, memory use is bounded by the strip size, so
+50-100MP print assets no longer need several full-size RGBA copies.
+
+The source is still decoded once at full size (in its own mode, e.g. 3 bytes
+per pixel for RGB), since the strips are cut from it; that buffer is the
+floor of peak memory. The model's copy is decoded at reduced scale where the
+format allows it (JPEG), so it never needs a second full-size buffer.
+"""
+
+import math
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+try:
+    from utils.image import post_process_cutout
+    from utils.tiling import PngStreamWriter, reduce_to_fit, refine_boundary, upsample_mask_strip
+except ImportError:
+    from ..utils.image import post_process_cutout
+    from ..utils.tiling import PngStreamWriter, reduce_to_fit, refine_boundary, upsample_mask_strip
+
+
+DEFAULT_MAX_SIDE = 2048
+DEFAULT_STRIP_HEIGHT = 256
+
+
+def _crop_box(
+    coarse: np.ndarray,
+    full_size: Tuple[int, int],
+    margin: int
+) -> Optional[Tuple[int, int, int, int]]:
+    """Map the low-res mask's bounding box to full resolution, plus margin."""
+    rows = np.flatnonzero(coarse.any(axis=1))
+    cols = np.flatnonzero(coarse.any(axis=0))
+    if not len(rows) or not len(cols):
+        return None
+
+    width, height = full_size
+    scale_x = width / coarse.shape[1]
+    scale_y = height / coarse.shape[0]
+    # One coarse pixel of slack: the upsampled mask can bleed into it
+    left = max(0, math.floor((cols[0] - 1) * scale_x) - margin)
+    top = max(0, math.floor((rows[0] - 1) * scale_y) - margin)
+    right = min(width, math.ceil((cols[-1] + 2) * scale_x) + margin)
+    bottom = min(height, math.ceil((rows[-1] + 2) * scale_y) + margin)
+    return left, top, right, bottom
+
+
+def _load_reduced(input_path: Path, max_side: int) -> Image.Image:
+    """Decode an upright RGB copy of an image whose longer side is at most max_side."""
+    with Image.open(input_path) as image:
+        scale = max_side / max(image.size)
+        if scale < 1:
+            # JPEG decodes straight to 1/2, 1/4 or 1/8 scale; other formats ignore this
+            image.draft("RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        upright = ImageOps.exif_transpose(image)
+    return reduce_to_fit(upright, max_side).convert("RGB")
+
+
+def process_high_res(
+    processor,
+    input_path: Path,
+    output_path: Path,
+    options: dict,
+    max_side: int = DEFAULT_MAX_SIDE,
+    strip_height: int = DEFAULT_STRIP_HEIGHT,
+    bg_color: Optional[Tuple[int, int, int]] = None,
+    crop_margin: Optional[int] = None,
+    status_callback: Optional[Callable[[str], None]] = None
+) -> Tuple[int, int]:
+    """
+    Remove the background of a very large image and write it as a PNG.
+
+    Args:
+        processor: Any BaseProcessor with a pixel-wise make_cutout (alpha
+            matting is not applied in this mode)
+        input_path: Path to input image
+        output_path: Path for the output PNG
+        options: Processing options dict
+        max_side: Longest side of the image the model sees
+        strip_height: Full-resolution rows processed at a time
+        bg_color: RGB background, or None for transparent
+        crop_margin: Crop to the subject with this margin, or None to keep
+            the full canvas
+        status_callback: Optional callback for status updates
+
+    Returns:
+        (width, height) of the written image
+    """
+    input_path = Path(input_path)
+    options = {**options, "alpha_matting": False}
+
+    if status_callback:
+        status_callback(f"High-res mode: inferring at {max_side}px...")
+    small = np.asarray(_load_reduced(input_path, max_side))
+    coarse = processor.get_mask(input_path, small, options, status_callback)
+    del small
+
+    # Decode once and rotate in place; this is the only full-size buffer
+    source = Image.open(input_path)
+    source.load()
+    ImageOps.exif_transpose(source, in_place=True)
+    if source.mode not in ("RGB", "RGBA", "L"):
+        source = source.convert("RGB")
+    full_size = source.size
+
+    # Band half-width tracks how far bilinear upsampling smears the edge
+    upscale = max(full_size) / max(coarse.shape)
+    radius = int(min(32, max(4, math.ceil(upscale))))
+
+    box = (0, 0) + full_size
+    if crop_margin is not None:
+        box = _crop_box(coarse, full_size, crop_margin) or box
+    left, top, right, bottom = box
+    out_width, out_height = right - left, bottom - top
+
+    if status_callback:
+        status_callback(f"Refining and writing {out_width}x{out_height} in {strip_height}px strips...")
+
+    with PngStreamWriter(output_path, out_width, out_height, "RGB" if bg_color else "RGBA") as writer:
+        for y in range(top, bottom, strip_height):
+            y_end = min(y + strip_height, bottom)
+            # Read a halo around the strip so the box filters see real neighbours
+            halo_top, halo_bottom = max(0, y - radius), min(full_size[1], y_end + radius)
+            halo_left, halo_right = max(0, left - radius), min(full_size[0], right + radius)
+
+            rgb = np.asarray(source.crop((halo_left, halo_top, halo_right, halo_bottom)).convert("RGB"))
+            mask = upsample_mask_strip(
+                coarse, full_size, (halo_top, halo_bottom), (halo_left, halo_right)
+            )
+            mask = refine_boundary(rgb, mask, radius)
+
+            inner = (slice(y - halo_top, y_end - halo_top), slice(left - halo_left, right - halo_left))
+            mask = (mask[inner] * 255 + 0.5).astype(np.uint8)
+            strip = processor.make_cutout(np.ascontiguousarray(rgb[inner]), mask, options)
+
+            if bg_color:
+                strip = post_process_cutout(strip, bg_color=bg_color)
+            writer.write_rows(strip)
+
+    return out_width, out_height
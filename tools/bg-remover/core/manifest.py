@@ -0,0 +1,212 @@
+"""
+Job manifest - an append-only JSONL log of batch job outcomes, so an
+interrupted run can pick up where it stopped.
+
+Each finished job appends one line: input and output paths, status, seconds,
+the input's and output's content hashes, the input's size/mtime and a digest
+of the settings. The input's hash and stat are taken before the worker reads
+it. The file stays open and each line is a single write() - no fsync, no
+rewrite - so logging costs nothing next to inference. A crash loses
+at most the lines not yet handed to the OS, and those jobs simply run again.
+For each input, later lines override earlier ones.
+
+The log doubles as a make-style index: an input whose size and mtime are
+unchanged is up to date after one stat() call. Only when the stat changed
+(a touch, a copy) is the input re-hashed and compared with its recorded hash.
+
+Batch runs and watch folders (see core/watch.py) share this log, under the
+same name and with the same settings digest, so each skips images the other
+already processed.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+try:
+    from utils.hashing import file_digest
+except ImportError:
+    from ..utils.hashing import file_digest
+
+
+BATCH_MANIFEST_NAME = ".bg_remover_batch.jsonl"
+
+# Attempts before --resume stops retrying an input that keeps failing
+DEFAULT_MAX_ATTEMPTS = 3
+
+# Rewrite the log when it holds this many times more lines than inputs
+_COMPACT_RATIO = 4
+
+
+def _input_key(path: Union[str, Path]) -> str:
+    return os.path.abspath(path)
+
+
+def _input_stat(path: Union[str, Path]) -> Optional[list]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def input_signature(path: Union[str, Path]) -> Tuple[Optional[list], str]:
+    """
+    An input's [size, mtime_ns] and content hash, for JobManifest.record().
+
+    Take it before the input is decoded: if the file changes while it is
+    processed, the recorded stat and hash then describe the old content, and
+    the next run sees the change instead of trusting an output made from
+    something else.
+    """
+    return _input_stat(path), file_digest(path)
+
+
+class JobManifest:
+    """Latest outcome per input, loaded from and appended to a JSONL file."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._latest: Dict[str, dict] = {}
+        self._lines = 0
+        self._file = None
+        # A torn final line has no newline; the next record must not be glued onto it
+        self._torn = False
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._torn = not line.endswith("\n")
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line
+                    if isinstance(record, dict) and "input" in record:
+                        self._latest[record["input"]] = record
+                        self._lines += 1
+        except FileNotFoundError:
+            pass
+
+    def is_done(self, input_path: Union[str, Path], output_path: Union[str, Path], settings_hash: str) -> bool:
+        """
+        Whether an input was processed to this output with these settings.
+
+        The output must still exist, and the input must still have the size
+        and mtime it had then - or, if only its mtime changed, the same
+        content hash (the new mtime is then recorded, so the next check is a
+        stat() again).
+        """
+        record = self._latest.get(_input_key(input_path))
+        if (
+            record is None
+            or record.get("status") != "done"
+            or record.get("settings") != settings_hash
+            or record.get("output") != _input_key(output_path)
+            or not os.path.exists(record["output"])
+        ):
+            return False
+
+        stat = _input_stat(input_path)
+        recorded = record.get("input_stat")
+        if stat is not None and stat == recorded:
+            return True
+        if stat is None or not recorded or stat[0] != recorded[0] or "input_hash" not in record:
+            return False
+        try:
+            if file_digest(input_path) != record["input_hash"]:
+                return False
+        except OSError:
+            return False
+        self._append({**record, "input_stat": stat, "time": round(time.time(), 3)})
+        return True
+
+    def done_output(self, input_hash: str, settings_hash: str) -> Optional[Path]:
+        """An existing output made with these settings from any input with this content hash."""
+        for record in reversed(list(self._latest.values())):
+            if (
+                record.get("input_hash") == input_hash
+                and record.get("status") == "done"
+                and record.get("settings") == settings_hash
+                and os.path.exists(record["output"])
+            ):
+                return Path(record["output"])
+        return None
+
+    def failures(self, input_path: Union[str, Path], settings_hash: str) -> int:
+        """How many times in a row an input has failed with these settings."""
+        record = self._latest.get(_input_key(input_path))
+        if record is None or record.get("status") != "failed" or record.get("settings") != settings_hash:
+            return 0
+        return record.get("attempts", 1)
+
+    def record(
+        self,
+        input_path: Union[str, Path],
+        output_path: Union[str, Path],
+        settings_hash: str,
+        error: Optional[BaseException] = None,
+        seconds: Optional[float] = None,
+        output_hash: Optional[str] = None,
+        input_hash: Optional[str] = None,
+        input_stat: Optional[list] = None
+    ) -> None:
+        """
+        Append the outcome of one job.
+
+        ``input_stat`` and ``input_hash`` should come from input_signature(),
+        taken before the input was read; without them the input is never
+        treated as up to date.
+        """
+        key = _input_key(input_path)
+        record = {
+            "input": key,
+            "output": _input_key(output_path),
+            "status": "done" if error is None else "failed",
+            "settings": settings_hash,
+            "input_stat": input_stat,
+            "time": round(time.time(), 3),
+        }
+        if seconds is not None:
+            record["seconds"] = round(seconds, 4)
+        if output_hash is not None:
+            record["output_hash"] = output_hash
+        if input_hash is not None:
+            record["input_hash"] = input_hash
+        if error is not None:
+            record["error"] = str(error)
+            record["attempts"] = self.failures(key, settings_hash) + 1
+        self._append(record)
+
+    def _append(self, record: dict) -> None:
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Line buffered: one write() per record
+            self._file = open(self.path, "a", encoding="utf-8", buffering=1)
+            if self._torn:
+                self._file.write("\n")
+                self._torn = False
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self._latest[record["input"]] = record
+        self._lines += 1
+
+    def compact(self) -> None:
+        """Rewrite the log with only the latest line per input, once it has grown well past that."""
+        if self._lines <= _COMPACT_RATIO * max(len(self._latest), 256):
+            return
+        self.close()
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._latest.values():
+                f.write(json.dumps(record, separators=(",", ":")) + "\n")
+        os.replace(tmp_path, self.path)
+        self._lines = len(self._latest)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        return len(self._latest)
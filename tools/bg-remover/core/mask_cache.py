@@ -0,0 +1,252 @@
+"""
+Mask cache - content-addressed store of raw model masks, in memory and on disk.
+
+Masks are keyed by the input file's content hash, the processor and the options
+that affect inference (model, SAM3 prompt). Post-processing settings such as
+crop, sticker outline or background colour are not part of the key, so changing
+them reuses the cached mask instead of running the model again.
+
+The disk cache lives next to the config file by default, so the GUI and
+cli_remove_bg.py share it.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+from PIL import Image
+
+try:
+    from core.config import load_config
+    from utils.hashing import file_digest, settings_digest
+except ImportError:
+    from .config import load_config
+    from ..utils.hashing import file_digest, settings_digest
+
+
+# Files whose content hash is remembered, most recently used kept
+HASH_MEMO_ENTRIES = 4096
+
+
+def get_default_cache_dir() -> Path:
+    """Get the default on-disk mask cache directory."""
+    if getattr(sys, 'frozen', False):
+        base_path = Path(sys.executable).parent
+    else:
+        base_path = Path(__file__).parent.parent
+    return base_path / "cache" / "masks"
+
+
+class MaskCache:
+    """Two-level (memory LRU + disk) cache of uint8 masks with size-based eviction."""
+
+    def __init__(self, cache_dir: Path, max_disk_bytes: int, max_memory_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes: Optional[int] = None  # computed lazily on first write
+        self._hash_memo: "OrderedDict[str, tuple]" = OrderedDict()  # path -> (size, mtime_ns, content hash)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def content_hash(self, path: Union[str, Path]) -> str:
+        """Get the content hash of a file, memoised on its size and mtime."""
+        stat = os.stat(path)
+        memo_key = str(path)
+        with self._lock:
+            memo = self._hash_memo.get(memo_key)
+            if memo is not None and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._hash_memo.move_to_end(memo_key)
+                return memo[2]
+
+        digest = file_digest(path)
+        with self._lock:
+            # Replaces the entry of an earlier version of the file
+            self._hash_memo[memo_key] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._hash_memo.move_to_end(memo_key)
+            while len(self._hash_memo) > HASH_MEMO_ENTRIES:
+                self._hash_memo.popitem(last=False)
+        return digest
+
+    def make_key(self, content_hash: str, processor: str, options: dict) -> str:
+        """Build a cache key from the input hash and the inference-affecting options."""
+        return f"{content_hash}-{settings_digest({'processor': processor, **options})}"
+
+    def _path_for(self, key: str) -> Path:
+        # Two-level fan-out keeps directories small on big catalogs
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a mask, checking memory first, then disk."""
+        with self._lock:
+            mask = self._memory.get(key)
+            if mask is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return mask
+
+        path = self._path_for(key)
+        try:
+            with Image.open(path) as f:
+                mask = np.asarray(f.convert("L"))
+            # Refresh mtime so disk eviction is least-recently-used
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            self._remember(key, mask)
+        return mask
+
+    def put(self, key: str, mask: np.ndarray) -> None:
+        """Store a mask in memory and on disk."""
+        with self._lock:
+            self._remember(key, mask)
+
+        if self.max_disk_bytes <= 0:
+            return
+
+        path = self._path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so readers in other processes never see a partial file
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            Image.fromarray(mask).save(tmp_path, "PNG", compress_level=1)
+            os.replace(tmp_path, path)
+            size = path.stat().st_size
+        except OSError as e:
+            print(f"Failed to write mask cache entry: {e}")
+            return
+
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._scan_disk_bytes()
+            else:
+                self._disk_bytes += size
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _remember(self, key: str, mask: np.ndarray) -> None:
+        """Add to the memory LRU (caller holds the lock)."""
+        size = mask.nbytes
+        if size > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= self._memory[key].nbytes
+        self._memory[key] = mask
+        self._memory.move_to_end(key)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return [p for p in self.cache_dir.glob("*/*.png") if p.is_file()]
+
+    def _scan_disk_bytes(self) -> int:
+        total = 0
+        for path in self._entries():
+            try:
+                total += path.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict_disk(self) -> None:
+        """Delete least-recently-used files until the cache is 90% of its budget."""
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_disk_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                # Another process evicted it first
+                pass
+            total -= size
+        self._disk_bytes = total
+
+    def clear(self) -> None:
+        """Remove all cached masks from memory and disk."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            for path in self._entries():
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        """Get hit/miss counters and cache sizes."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "cache_dir": str(self.cache_dir),
+            }
+
+
+_mask_cache: Optional[MaskCache] = None
+_mask_cache_enabled: Optional[bool] = None
+
+
+def configure_mask_cache(enabled: bool = True, max_mb: Optional[int] = None) -> None:
+    """Enable/disable the process-wide mask cache or change its disk budget."""
+    global _mask_cache_enabled
+    _mask_cache_enabled = enabled
+    if max_mb is not None:
+        get_mask_cache(create=True).max_disk_bytes = int(max_mb) * 1024 * 1024
+
+
+def get_mask_cache(create: bool = False) -> Optional[MaskCache]:
+    """
+    Get the process-wide mask cache, or None when it is disabled.
+
+    Settings come from the config: ``mask_cache`` (enabled), ``mask_cache_dir``
+    (empty for the default location), ``mask_cache_mb`` and
+    ``mask_cache_memory_mb``.
+    """
+    global _mask_cache, _mask_cache_enabled
+    if _mask_cache is None or _mask_cache_enabled is None:
+        config = load_config()
+        if _mask_cache_enabled is None:
+            _mask_cache_enabled = bool(config.get("mask_cache", True))
+        if _mask_cache is None:
+            cache_dir = config.get("mask_cache_dir") or get_default_cache_dir()
+            _mask_cache = MaskCache(
+                Path(cache_dir),
+                int(config.get("mask_cache_mb", 1024)) * 1024 * 1024,
+                int(config.get("mask_cache_memory_mb", 256)) * 1024 * 1024,
+            )
+    if not _mask_cache_enabled and not create:
+        return None
+    return _mask_cache
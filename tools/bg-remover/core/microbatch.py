@@ -0,0 +1,138 @@
+"""
+Dynamic micro-batching - groups concurrent requests into one model run.
+
+Requests wait at most ``max_wait_ms`` for company; the first request of a batch
+starts the clock, so an idle server still answers a lone request almost
+immediately while a busy one fills batches up to ``max_batch_size``.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class QueueFullError(Exception):
+    """Raised when a batcher's queue is at capacity (callers should back off)."""
+
+
+class MicroBatcher:
+    """Collects items submitted from asyncio code and runs them in batches."""
+
+    def __init__(
+        self,
+        run_batch: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_queue: int = 64,
+        name: str = "batcher"
+    ):
+        """
+        Args:
+            run_batch: Blocking function mapping a list of items to a list of
+                results in the same order; runs on a dedicated worker thread
+            max_batch_size: Largest batch handed to ``run_batch``
+            max_wait_ms: How long the first item of a batch waits for more
+            max_queue: Items allowed to wait before ``submit`` rejects new ones
+            name: Label used for the worker thread and stats
+        """
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "asyncio.Queue[Tuple[Any, asyncio.Future]]" = asyncio.Queue(maxsize=max_queue)
+        # One thread per batcher: the model session runs one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self._task: Optional[asyncio.Task] = None
+
+        self.batches_run = 0
+        self.items_run = 0
+        self.rejected = 0
+
+    def start(self) -> None:
+        """Start the batching loop on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the batching loop and release the worker thread."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Queue an item and wait for its result.
+
+        Raises:
+            QueueFullError: If the queue is full
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name}: queue full ({self._queue.maxsize} waiting)")
+        return await future
+
+    def stats(self) -> dict:
+        """Get queue depth and batching counters."""
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches_run,
+            "items": self.items_run,
+            "avg_batch_size": (self.items_run / self.batches_run) if self.batches_run else 0.0,
+            "rejected": self.rejected,
+        }
+
+    async def _collect(self) -> List[Tuple[Any, asyncio.Future]]:
+        """Wait for one item, then gather more until the batch is full or the window closes."""
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take whatever is already waiting without yielding to the clock
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            # Skip requests whose clients already went away
+            batch = [(item, future) for item, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self._executor, self.run_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(items)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,201 @@
+"""
+Staged bulk pipeline - decode -> infer -> post-process/encode with bounded queues.
+
+Decoding and encoding run on small thread pools while inference runs on one
+dedicated thread (a model session serves one image at a time). Bounded queues
+between the stages keep the model fed from disk and zlib without holding the
+whole batch in memory. Per-stage busy time shows where the bottleneck is.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+
+# Tells a stage worker that its input is exhausted
+_DONE = object()
+
+
+class _Stage:
+    """One pipeline stage: its function, thread count and busy-time counters."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.running = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0  # time spent waiting on an empty input queue
+        self.lock = threading.Lock()
+
+    def record(self, busy: float, starved: float) -> None:
+        with self.lock:
+            self.items += 1
+            self.busy += busy
+            self.starved += starved
+
+    def stats(self, elapsed: float) -> dict:
+        capacity = elapsed * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy, 3),
+            "starved_seconds": round(self.starved, 3),
+            "utilisation": round(self.busy / capacity, 3) if capacity > 0 else 0.0,
+        }
+
+
+def default_stage_workers() -> int:
+    """Threads per decode/encode pool: leave a core for inference, cap at 4."""
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class BulkPipeline:
+    """Runs jobs through decode, infer and encode stages concurrently."""
+
+    def __init__(
+        self,
+        decode: Callable[[Any], Any],
+        infer: Callable[[Any], Any],
+        encode: Callable[[Any], Any],
+        decode_workers: Optional[int] = None,
+        encode_workers: Optional[int] = None,
+        queue_size: int = 4
+    ):
+        """
+        Args:
+            decode: Loads a job's input (e.g. path -> pixels)
+            infer: Runs the model on a decoded item; always called from the
+                same thread
+            encode: Post-processes and saves an inferred item, returning the
+                job's result
+            decode_workers: Decode threads (default: default_stage_workers())
+            encode_workers: Encode threads (default: default_stage_workers())
+            queue_size: Items allowed to wait between two stages
+        """
+        self.stages = [
+            _Stage("decode", decode, decode_workers or default_stage_workers()),
+            _Stage("infer", infer, 1),
+            _Stage("encode", encode, encode_workers or default_stage_workers()),
+        ]
+        self.queue_size = queue_size
+        self._cancelled = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_time: Optional[float] = None
+        self._end_time: Optional[float] = None
+
+    def start(
+        self,
+        jobs: Iterable[Any],
+        result_callback: Optional[Callable[[Any, Any, Optional[Exception]], None]] = None,
+        complete_callback: Optional[Callable[[dict], None]] = None
+    ) -> None:
+        """
+        Start processing on background threads and return immediately.
+
+        Args:
+            jobs: Inputs for the decode stage
+            result_callback: Called as (job, result, error) when a job finishes
+                or fails at any stage; runs on a pipeline thread
+            complete_callback: Called with stats() once every job is done;
+                runs on a pipeline thread
+        """
+        # Jobs are known up front; only the queues between stages are bounded
+        queues = [queue.Queue()] + [
+            queue.Queue(maxsize=self.queue_size) for _ in self.stages[1:]
+        ]
+        for job in jobs:
+            queues[0].put((job, job))
+        for _ in range(self.stages[0].workers):
+            queues[0].put(_DONE)
+
+        def finish_stage(index: int) -> None:
+            """Called by each exiting worker; the last one closes the next queue."""
+            stage = self.stages[index]
+            with stage.lock:
+                stage.running -= 1
+                if stage.running:
+                    return
+            if index + 1 < len(self.stages):
+                for _ in range(self.stages[index + 1].workers):
+                    queues[index + 1].put(_DONE)
+            else:
+                self._end_time = time.perf_counter()
+                if complete_callback:
+                    complete_callback(self.stats())
+
+        def report(job: Any, output: Any, error: Optional[Exception]) -> None:
+            """Hand a job's outcome to result_callback, which must not stop the worker."""
+            if not result_callback:
+                return
+            try:
+                result_callback(job, output, error)
+            except Exception as e:
+                print(f"Pipeline result callback failed for {job}: {e}")
+
+        def worker(index: int) -> None:
+            stage = self.stages[index]
+            source = queues[index]
+            sink = queues[index + 1] if index + 1 < len(queues) else None
+            try:
+                while True:
+                    wait_start = time.perf_counter()
+                    entry = source.get()
+                    if entry is _DONE:
+                        break
+                    if self._cancelled.is_set():
+                        continue
+
+                    job, item = entry
+                    start = time.perf_counter()
+                    try:
+                        output = stage.func(item)
+                    except Exception as e:
+                        stage.record(time.perf_counter() - start, start - wait_start)
+                        report(job, None, e)
+                        continue
+                    stage.record(time.perf_counter() - start, start - wait_start)
+
+                    if sink is not None:
+                        sink.put((job, output))
+                    else:
+                        report(job, output, None)
+            finally:
+                # Downstream stages wait for this to see the end of their input
+                finish_stage(index)
+
+        self._start_time = time.perf_counter()
+        self._end_time = None
+        self._threads = [
+            threading.Thread(target=worker, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+            for index, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def cancel(self) -> None:
+        """Skip all jobs not yet started; in-progress ones still finish."""
+        self._cancelled.set()
+
+    def stats(self) -> dict:
+        """Get elapsed time and per-stage busy time / utilisation."""
+        if self._start_time is None:
+            elapsed = 0.0
+        else:
+            elapsed = (self._end_time or time.perf_counter()) - self._start_time
+        return {
+            "elapsed": round(elapsed, 3),
+            "stages": {stage.name: stage.stats(elapsed) for stage in self.stages},
+        }
+
+
+def format_utilisation(stats: dict) -> str:
+    """Render per-stage utilisation as e.g. 'decode 35% | infer 97% | encode 60%'."""
+    return " | ".join(
+        f"{name} {stage['utilisation'] * 100:.0f}%"
+        for name, stage in stats["stages"].items()
+    )
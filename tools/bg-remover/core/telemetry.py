@@ -0,0 +1,281 @@
+"""
+Telemetry - timing and peak-memory spans for each processing stage.
+
+Code wraps a stage in ``with span("inference"):``. While telemetry is off
+(the default) span() returns a shared no-op context, so instrumented code
+pays almost nothing. Once configure_telemetry() has been called, every span
+appends one JSON line to the telemetry file. The line holds the stage name,
+the image it belongs to (inherited from the enclosing span), start time,
+seconds, process and thread, and memory:
+
+- ``peak_rss_mb``: the process's peak resident set size so far
+- ``rss_growth_mb``: how much this span raised that peak
+- ``heap_peak_mb`` (with ``memory=True``): peak NumPy/Python allocation
+  above the level at span start, from tracemalloc. This is exact only
+  while spans don't overlap across threads.
+
+Batch worker processes append to the same file, tagged with the parent's run
+id, so the parent can summarise the whole run (p50/p95 per stage,
+images/second) and convert it to a Chrome trace (chrome://tracing, Perfetto).
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+_MB = 1024 * 1024
+
+# Shared by every span() call while telemetry is off
+_NULL_SPAN = contextlib.nullcontext()
+
+_recorder = None
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of this process in bytes (0 where unknown)."""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class _Recorder:
+    """Appends span records of this process to the telemetry file."""
+
+    def __init__(self, path: str, memory: bool, run_id: str):
+        self.path = path
+        self.memory = memory
+        self.run_id = run_id
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Line buffered: each span is one write() in append mode, so processes
+        # sharing the file don't interleave within a line
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stack(self) -> list:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def emit(self, record: dict) -> None:
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class _Span:
+    """One timed stage; see span()."""
+
+    def __init__(self, recorder: _Recorder, name: str, attrs: dict):
+        self.recorder = recorder
+        self.name = name
+        self.attrs = attrs
+        self.child_heap_peak = 0
+
+    def __enter__(self) -> "_Span":
+        recorder = self.recorder
+        stack = recorder.stack()
+        self.parent = stack[-1] if stack else None
+        if self.parent is not None and "image" not in self.attrs and "image" in self.parent.attrs:
+            self.attrs["image"] = self.parent.attrs["image"]
+
+        self.start_rss = _peak_rss()
+        if recorder.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            # Resetting the peak would hide the parent's peak so far; hand it up
+            if self.parent is not None:
+                self.parent.child_heap_peak = max(self.parent.child_heap_peak, peak)
+            tracemalloc.reset_peak()
+            self.heap_base = current
+
+        stack.append(self)
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        seconds = time.perf_counter() - self.start
+        recorder = self.recorder
+        recorder.stack().pop()
+
+        peak_rss = _peak_rss()
+        record = {
+            "run": recorder.run_id,
+            "name": self.name,
+            "start": round(self.wall_start, 6),
+            "seconds": round(seconds, 6),
+            "pid": os.getpid(),
+            "tid": threading.get_native_id(),
+            "peak_rss_mb": round(peak_rss / _MB, 1),
+            "rss_growth_mb": round((peak_rss - self.start_rss) / _MB, 1),
+            **self.attrs,
+        }
+        if recorder.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            heap_peak = max(peak, self.child_heap_peak)
+            record["heap_peak_mb"] = round(max(0, heap_peak - self.heap_base) / _MB, 2)
+            if self.parent is not None:
+                self.parent.child_heap_peak = max(self.parent.child_heap_peak, heap_peak)
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        recorder.emit(record)
+
+
+def span(name: str, **attrs: Any):
+    """
+    Time a stage: ``with span("decode", image=path): ...``.
+
+    Args:
+        name: Stage name (decode, model_load, inference, matting, ...)
+        **attrs: Extra JSON-serialisable fields for the record
+    """
+    if _recorder is None:
+        return _NULL_SPAN
+    return _Span(_recorder, name, attrs)
+
+
+def configure_telemetry(path: Optional[str], memory: bool = False, run_id: Optional[str] = None) -> Optional[str]:
+    """
+    Start (or, with path None, stop) recording spans in this process.
+
+    Args:
+        path: JSONL file to append spans to
+        memory: Also record tracemalloc heap peaks (slows allocation-heavy code)
+        run_id: Tag shared by all processes of one run (default: new one)
+
+    Returns:
+        The run id, or None when telemetry was stopped
+    """
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+    if not path:
+        return None
+    run_id = run_id or f"{int(time.time())}-{os.getpid()}"
+    _recorder = _Recorder(path, memory, run_id)
+    return run_id
+
+
+def get_telemetry_settings() -> Optional[Tuple[str, bool, str]]:
+    """(path, memory, run id) of the active recorder, to pass on to worker processes."""
+    if _recorder is None:
+        return None
+    return _recorder.path, _recorder.memory, _recorder.run_id
+
+
+def load_spans(path: str, run_id: Optional[str] = None) -> List[dict]:
+    """Read span records from a telemetry file, optionally only those of one run."""
+    spans = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict) and (run_id is None or record.get("run") == run_id):
+                    spans.append(record)
+    except FileNotFoundError:
+        pass
+    return spans
+
+
+def summarize(spans: List[dict]) -> dict:
+    """
+    Per-stage latency percentiles and overall throughput of a run.
+
+    Returns:
+        Dict with ``stages`` (name -> count, total_seconds, p50_ms, p95_ms,
+        max_ms), ``images`` (distinct images seen), ``wall_seconds``,
+        ``images_per_second`` and ``peak_rss_mb``
+    """
+    durations: Dict[str, List[float]] = {}
+    for record in spans:
+        durations.setdefault(record["name"], []).append(record["seconds"])
+
+    stages = {}
+    for name, seconds in durations.items():
+        values = np.asarray(seconds)
+        stages[name] = {
+            "count": len(values),
+            "total_seconds": round(float(values.sum()), 3),
+            "p50_ms": round(float(np.percentile(values, 50)) * 1000, 2),
+            "p95_ms": round(float(np.percentile(values, 95)) * 1000, 2),
+            "max_ms": round(float(values.max()) * 1000, 2),
+        }
+
+    wall = 0.0
+    if spans:
+        wall = max(r["start"] + r["seconds"] for r in spans) - min(r["start"] for r in spans)
+    # Pipelined stages run on different threads, so count images by their tag
+    images = len({r["image"] for r in spans if "image" in r}) or stages.get("image", {}).get("count", 0)
+    return {
+        "stages": stages,
+        "images": images,
+        "wall_seconds": round(wall, 3),
+        "images_per_second": round(images / wall, 3) if wall > 0 else 0.0,
+        "peak_rss_mb": max((r.get("peak_rss_mb", 0) for r in spans), default=0),
+    }
+
+
+def format_summary(summary: dict) -> str:
+    """Render summarize() output as a small table, slowest stage (by total) first."""
+    lines = [f"{'stage':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}"]
+    ranked = sorted(summary["stages"].items(), key=lambda item: item[1]["total_seconds"], reverse=True)
+    for name, stage in ranked:
+        lines.append(
+            f"{name:<14}{stage['count']:>7}{stage['p50_ms']:>10.1f}"
+            f"{stage['p95_ms']:>10.1f}{stage['total_seconds']:>10.2f}"
+        )
+    lines.append(
+        f"{summary['images']} images in {summary['wall_seconds']:.1f}s "
+        f"({summary['images_per_second']:.2f} images/s), peak RSS {summary['peak_rss_mb']:.0f} MB"
+    )
+    return "\n".join(lines)
+
+
+def write_chrome_trace(spans: List[dict], path: str) -> None:
+    """Write spans in the Chrome trace event format (complete "X" events)."""
+    reserved = {"run", "name", "start", "seconds", "pid", "tid"}
+    events = [
+        {
+            "name": record["name"],
+            "cat": "bg-remover",
+            "ph": "X",
+            "ts": round(record["start"] * 1e6, 1),
+            "dur": round(record["seconds"] * 1e6, 1),
+            "pid": record["pid"],
+            "tid": record["tid"],
+            "args": {k: v for k, v in record.items() if k not in reserved},
+        }
+        for record in spans
+    ]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,303 @@
+"""
+Watch folders - pick up images as they are dropped into a directory tree.
+
+On Linux the watcher uses inotify (through ctypes, no extra dependency), so
+an idle watch costs nothing. Elsewhere, or on network shares where inotify
+never sees writes made by other machines, it polls file sizes and mtimes.
+
+Events only mark a file as pending: it is handed on once it has stopped
+changing for a settle period, so a half-copied image is never processed.
+Finished images go into the batch job manifest (see core/manifest.py), so a
+restarted watcher, or a batch run over the same tree, skips images already
+processed with the same settings.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from core.batch import is_input_file, mirror_output_path, mirror_output_paths
+except ImportError:
+    from .batch import is_input_file, mirror_output_path, mirror_output_paths
+
+
+# Seconds a file must go unchanged before it is processed
+DEFAULT_SETTLE_SECONDS = 1.0
+
+# Seconds between scans of the polling watcher
+DEFAULT_POLL_INTERVAL = 2.0
+
+# inotify event bits (linux/inotify.h)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+
+# struct inotify_event header: wd, mask, cookie, len (name follows)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _walk_tree(root: Path, exclude_dir: Optional[Path]):
+    """os.walk() over root, skipping exclude_dir (which must be resolved)."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        directory = Path(dirpath)
+        if exclude_dir is not None and directory.resolve() == exclude_dir:
+            dirnames[:] = []
+            continue
+        yield directory, filenames
+
+
+class InotifyWatcher:
+    """Recursive directory watcher on Linux inotify."""
+
+    def __init__(self, root: Path, exclude_dir: Optional[Path] = None):
+        self.root = Path(root)
+        self._exclude = exclude_dir.resolve() if exclude_dir is not None else None
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+        self._dirs: Dict[int, Path] = {}  # watch descriptor -> directory
+        self._add_tree(self.root)
+
+    def _add_tree(self, directory: Path) -> List[Path]:
+        """Watch a directory and its subdirectories; returns the files already in them."""
+        files = []
+        for path, filenames in _walk_tree(directory, self._exclude):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    raise OSError(err, "inotify watch limit reached - raise "
+                                       "fs.inotify.max_user_watches or use --poll")
+                continue  # removed again before we got to it
+            self._dirs[wd] = path
+            files.extend(path / name for name in filenames)
+        return files
+
+    def changes(self, timeout: float) -> List[Path]:
+        """Wait up to ``timeout`` seconds for events; returns the files they touched."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return []
+
+        paths = []
+        while True:
+            try:
+                data = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+
+                if mask & _IN_Q_OVERFLOW:
+                    # The kernel dropped events; rescan so nothing is missed
+                    paths.extend(self._add_tree(self.root))
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & _IN_ISDIR:
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        paths.extend(self._add_tree(path))
+                else:
+                    paths.append(path)
+        return paths
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Portable watcher that compares size and mtime snapshots of the tree."""
+
+    def __init__(self, root: Path, exclude_dir: Optional[Path] = None, interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = Path(root)
+        self.interval = interval
+        self._exclude = exclude_dir.resolve() if exclude_dir is not None else None
+        self._snapshot = self._scan()
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        snapshot = {}
+        for directory, filenames in _walk_tree(self.root, self._exclude):
+            for name in filenames:
+                path = directory / name
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                snapshot[path] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: float) -> List[Path]:
+        """Wait up to ``timeout`` seconds; returns files created or changed since the last scan."""
+        wait = self._next_scan - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0.0, wait))
+        snapshot = self._scan()
+        self._next_scan = time.monotonic() + self.interval
+        changed = [path for path, signature in snapshot.items() if self._snapshot.get(path) != signature]
+        self._snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(root: Path, exclude_dir: Optional[Path] = None, poll: bool = False):
+    """Create an inotify watcher where available, otherwise a polling one."""
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(root, exclude_dir)
+        except (OSError, AttributeError) as e:
+            print(f"inotify unavailable ({e}), polling instead")
+    return PollingWatcher(root, exclude_dir)
+
+
+def is_watched_file(path: Path, exclude_dir: Optional[Path] = None, exclude_suffix: Optional[str] = None) -> bool:
+    """Whether an event's file should be processed (hidden partial uploads are ignored)."""
+    if path.name.startswith("."):
+        return False
+    return is_input_file(path, exclude_dir, exclude_suffix)
+
+
+class Debouncer:
+    """Holds back files until they have stopped changing for a settle period."""
+
+    def __init__(self, settle_seconds: float = DEFAULT_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self._pending: Dict[Path, Tuple[float, Optional[Tuple[int, int]]]] = {}
+
+    @staticmethod
+    def _signature(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def touch(self, path: Path, now: Optional[float] = None) -> None:
+        """Record activity on a file, restarting its settle period."""
+        now = time.monotonic() if now is None else now
+        self._pending[path] = (now, self._signature(path))
+
+    def ready(self, now: Optional[float] = None) -> List[Path]:
+        """Files that have settled. Deleted and empty files are dropped."""
+        now = time.monotonic() if now is None else now
+        settled = []
+        for path, (last_seen, signature) in list(self._pending.items()):
+            if now - last_seen < self.settle_seconds:
+                continue
+            current = self._signature(path)
+            if current != signature:
+                # Still being written (or no event arrived for the last write)
+                self._pending[path] = (now, current)
+                continue
+            del self._pending[path]
+            if current is not None and current[0] > 0:
+                settled.append(path)
+        return settled
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+
+class OutputCollision(ValueError):
+    """An input would be written to another input's output."""
+
+    def __init__(self, owner: Path, path: Path, output: Path):
+        super().__init__(f"{owner} and {path} would both be written to {output}")
+        self.output = output
+
+
+class OutputNames:
+    """
+    Output paths for a watched tree, named as batch mode names them.
+
+    Inputs sharing a stem (photo.jpg, photo.png) keep their extension in the
+    output's name (see mirror_output_paths()). A name, once given, never
+    changes, so an image that arrives later next to one already processed is
+    the one that gets the longer name.
+    """
+
+    def __init__(self, root: Path, output_dir: Optional[Path], suffix: str, extension: str):
+        self.root = root
+        # Without an output directory, outputs go next to their inputs
+        self.output_dir = output_dir if output_dir is not None else root
+        self.suffix = suffix
+        self.extension = extension
+        self._outputs: Dict[Path, Path] = {}  # input -> output
+        self._owners: Dict[Path, Path] = {}  # output -> input
+        self._plain: Dict[Path, List[Path]] = {}  # name without extension -> inputs
+
+    def _plain_name(self, path: Path) -> Path:
+        return mirror_output_path(path.relative_to(self.root), self.output_dir, self.suffix, self.extension)
+
+    def _assign(self, path: Path, output: Path) -> None:
+        owner = self._owners.get(output)
+        if owner is not None and owner != path:
+            raise OutputCollision(owner, path, output)
+        self._outputs[path] = output
+        self._owners[output] = path
+
+    def add_all(self, paths: List[Path]) -> None:
+        """
+        Name the images already in the tree, all at once.
+
+        Raises:
+            ValueError: If two inputs would still be written to the same path
+        """
+        paths = [path for path in paths if path not in self._outputs]
+        outputs = mirror_output_paths(
+            [path.relative_to(self.root) for path in paths], self.output_dir, self.suffix, self.extension
+        )
+        for path, output in zip(paths, outputs):
+            self._plain.setdefault(self._plain_name(path), []).append(path)
+            self._assign(path, output)
+
+    def output_for(self, path: Path) -> Path:
+        """
+        The output path of an input, naming it on first sight.
+
+        Raises:
+            OutputCollision: If the input would be written to another input's output
+        """
+        output = self._outputs.get(path)
+        if output is not None:
+            return output
+        plain = self._plain_name(path)
+        sharing = self._plain.setdefault(plain, [])
+        output = plain
+        if sharing:
+            output = mirror_output_path(
+                path.relative_to(self.root), self.output_dir, self.suffix, self.extension, keep_extension=True
+            )
+        self._assign(path, output)
+        sharing.append(path)
+        return output
@@ -5,8 +5,16 @@ Base processor interface - defines the contract for all image processors.
 from abc import ABC, abstractmethod
 from pathlib import Path
 from PIL import Image
+import numpy as np
 from typing import Optional, Callable
 
+try:
+    from core.mask_cache import get_mask_cache
+    from core.telemetry import span
+except ImportError:
+    from ..core.mask_cache import get_mask_cache
+    from ..core.telemetry import span
+
 
 class BaseProcessor(ABC):
     """Abstract base class for image processing backends."""
@@ -33,6 +41,93 @@ class BaseProcessor(ABC):
         """
         pass
 
+    def process_array(
+        self,
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None,
+        input_path: Optional[Path] = None
+    ) -> np.ndarray:
+        """
+        Array-in/array-out processing, with no intermediate encode/decode.
+
+        Args:
+            image: HxWx3 uint8 RGB pixels
+            options: Processing options dict
+            status_callback: Optional callback for status updates
+            input_path: File the pixels came from, if any (enables the mask cache)
+
+        Returns:
+            HxWx4 uint8 RGBA pixels
+        """
+        mask = self.get_mask(input_path, image, options, status_callback)
+        with span("matting" if options.get("alpha_matting") else "cutout"):
+            return self.make_cutout(image, mask, options)
+
+    @abstractmethod
+    def predict_mask(
+        self,
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> np.ndarray:
+        """
+        Run the model and return the raw alpha mask (HxW uint8, same size as image).
+
+        ``process_array`` goes through ``get_mask``, which calls this on a
+        mask cache miss.
+        """
+        pass
+
+    def mask_options(self, options: dict) -> dict:
+        """Get the options that change ``predict_mask`` output (the cache key)."""
+        return {}
+
+    def make_cutout(self, image: np.ndarray, mask: np.ndarray, options: dict) -> np.ndarray:
+        """Combine RGB pixels and a mask into RGBA pixels (one allocation)."""
+        return np.dstack((image, mask))
+
+    def get_mask(
+        self,
+        input_path: Optional[Path],
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> np.ndarray:
+        """
+        Get the raw mask for an image, from the mask cache when possible.
+
+        Args:
+            input_path: Path the image was loaded from (its contents are hashed);
+                None skips the cache
+            image: HxWx3 uint8 RGB pixels
+            options: Processing options dict
+            status_callback: Optional callback for status updates
+
+        Returns:
+            HxW uint8 mask
+        """
+        cache = get_mask_cache() if input_path is not None else None
+        if cache is None:
+            return self.predict_mask(image, options, status_callback)
+
+        with span("mask_cache"):
+            # Shape distinguishes full-size masks from high-res mode's reduced ones
+            key = cache.make_key(
+                cache.content_hash(input_path),
+                self.get_name(),
+                {**self.mask_options(options), "shape": list(image.shape[:2])}
+            )
+            mask = cache.get(key)
+        if mask is not None and mask.shape == image.shape[:2]:
+            if status_callback:
+                status_callback("Using cached mask...")
+            return mask
+
+        mask = self.predict_mask(image, options, status_callback)
+        cache.put(key, mask)
+        return mask
+
     @abstractmethod
     def is_available(self) -> bool:
         """Check if this processor is available (dependencies installed)."""
@@ -0,0 +1,99 @@
+"""
+Cascade model selection - scores a mask so "auto" mode can keep a lite model's
+result and re-run only the images it is unsure about with the heavy model.
+"""
+
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+try:
+    from core.constants import CASCADE_THRESHOLDS
+except ImportError:
+    from ..core.constants import CASCADE_THRESHOLDS
+
+
+# Masks are scored on a copy no larger than this
+_SCORE_SIDE = 512
+
+# Fragments smaller than this share of the image are ignored as specks
+_MIN_FRAGMENT_FRACTION = 0.005
+
+
+def _component_areas(foreground: np.ndarray) -> np.ndarray:
+    """Pixel areas of the 8-connected components of a boolean mask."""
+    try:
+        import cv2
+        _, _, stats, _ = cv2.connectedComponentsWithStats(
+            foreground.astype(np.uint8), connectivity=8
+        )
+        return stats[1:, cv2.CC_STAT_AREA]
+    except ImportError:
+        from scipy import ndimage
+        labels, _ = ndimage.label(foreground, structure=np.ones((3, 3)))
+        return np.bincount(labels.ravel())[1:]
+
+
+def mask_quality(mask: np.ndarray, thresholds: Optional[dict] = None) -> dict:
+    """
+    Measure how trustworthy a predicted mask looks.
+
+    Args:
+        mask: HxW uint8 alpha mask
+        thresholds: Limits to judge against (default: CASCADE_THRESHOLDS)
+
+    Returns:
+        Dict of the metrics plus ``confident`` (all within limits) and
+        ``reasons`` (names of the limits that were exceeded)
+    """
+    limits = thresholds or CASCADE_THRESHOLDS
+
+    small = Image.fromarray(mask)
+    factor = max(small.width, small.height) // _SCORE_SIDE
+    if factor >= 2:
+        small = small.reduce(factor)
+    alpha = np.asarray(small)
+
+    foreground = alpha >= 128
+    mid = (alpha > 25) & (alpha < 230)
+    fg_fraction = float(foreground.mean())
+    mid_fraction = float(mid.mean())
+
+    # Boundary pixels: foreground with a background 4-neighbour
+    interior = foreground.copy()
+    interior[1:, :] &= foreground[:-1, :]
+    interior[:-1, :] &= foreground[1:, :]
+    interior[:, 1:] &= foreground[:, :-1]
+    interior[:, :-1] &= foreground[:, 1:]
+    boundary = int((foreground & ~interior).sum())
+    edge_width = float(mid.sum()) / max(boundary, 1)
+
+    areas = _component_areas(foreground)
+    significant = areas[areas >= _MIN_FRAGMENT_FRACTION * alpha.size]
+    fragments = int(len(significant))
+    stray_fraction = float(areas.sum() - significant.sum()) / alpha.size
+
+    reasons = []
+    if fg_fraction < limits["min_fg_fraction"]:
+        reasons.append("min_fg_fraction")
+    if fg_fraction > limits["max_fg_fraction"]:
+        reasons.append("max_fg_fraction")
+    if mid_fraction > limits["max_mid_alpha_fraction"]:
+        reasons.append("max_mid_alpha_fraction")
+    if edge_width > limits["max_edge_width"]:
+        reasons.append("max_edge_width")
+    if stray_fraction > limits["max_stray_fraction"]:
+        reasons.append("max_stray_fraction")
+    if fragments > limits["max_fragments"]:
+        reasons.append("max_fragments")
+
+    return {
+        "fg_fraction": round(fg_fraction, 4),
+        "mid_alpha_fraction": round(mid_fraction, 4),
+        "edge_width": round(edge_width, 2),
+        "fragments": fragments,
+        "stray_fraction": round(stray_fraction, 4),
+        "confident": not reasons,
+        "reasons": reasons,
+    }
@@ -0,0 +1,367 @@
+"""
+ONNX Runtime sessions - builds rembg sessions with tuned SessionOptions and
+keeps each model's optimised graph in an on-disk model store.
+
+rembg's new_session() only ever uses default options. Here thread counts,
+graph optimisation level, execution mode, memory arena behaviour and provider
+order come from the config (``ort_*`` keys), optionally overridden per process
+with configure_ort(). With the CPU provider, the graph ONNX Runtime optimised
+is saved next to the mask cache and later sessions load it with optimisation
+disabled, skipping the (for large models, multi-second) optimisation passes.
+
+The stored graph keeps its weights in a separate external-data file, which
+ONNX Runtime memory-maps instead of copying onto the heap. Every process that
+loads the model - e.g. all batch workers - then shares one read-only copy of
+the weights through the page cache. Only weights ONNX Runtime repacks for its
+MatMul kernels become private again; ``ort_prepack_weights: false`` turns
+that off as well, trading some speed for memory.
+"""
+
+import os
+import platform
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional
+
+try:
+    from core.config import load_config
+    from utils.hashing import settings_digest
+except ImportError:
+    from ..core.config import load_config
+    from ..utils.hashing import settings_digest
+
+from .quantize import base_model_name, is_quantized_model, quantize_model
+
+if TYPE_CHECKING:
+    import onnxruntime as ort
+
+
+GRAPH_OPTIMIZATION_LEVELS = ("disable", "basic", "extended", "all")
+EXECUTION_MODES = ("sequential", "parallel")
+
+_ORT_KEYS = (
+    "ort_intra_op_threads",
+    "ort_inter_op_threads",
+    "ort_graph_optimization",
+    "ort_execution_mode",
+    "ort_enable_mem_arena",
+    "ort_enable_mem_pattern",
+    "ort_providers",
+    "ort_graph_cache",
+    "ort_prepack_weights",
+)
+
+# Providers rembg prefers over the CPU when they are available
+_ACCELERATED_PROVIDERS = ("CUDAExecutionProvider", "ROCMExecutionProvider", "OpenVINOExecutionProvider")
+
+# Process-wide overrides of the config's ort_* settings (CLI flags, batch planner)
+_overrides: dict = {}
+
+
+def get_default_graph_cache_dir() -> Path:
+    """Get the default directory for optimised model graphs."""
+    if getattr(sys, 'frozen', False):
+        base_path = Path(sys.executable).parent
+    else:
+        base_path = Path(__file__).parent.parent
+    return base_path / "cache" / "ort"
+
+
+def configure_ort(**settings: Any) -> None:
+    """
+    Override ort_* settings for sessions created from now on in this process.
+
+    Keyword names are the config keys without the ``ort_`` prefix, e.g.
+    ``configure_ort(intra_op_threads=4, providers=["CPUExecutionProvider"])``.
+    None values are ignored, so CLI arguments can be passed straight through.
+    """
+    for name, value in settings.items():
+        key = f"ort_{name}"
+        if key not in _ORT_KEYS:
+            raise ValueError(f"Unknown ONNX Runtime setting: {name}")
+        if value is not None:
+            _overrides[key] = value
+
+
+def get_ort_settings() -> dict:
+    """Get the effective ort_* settings: config values plus process overrides."""
+    config = load_config()
+    settings = {key: config.get(key) for key in _ORT_KEYS}
+    settings.update(_overrides)
+    return settings
+
+
+def _thread_count(value: Optional[int]) -> int:
+    """A configured thread count, falling back to OMP_NUM_THREADS (set by batch workers)."""
+    if value:
+        return int(value)
+    try:
+        return int(os.environ.get("OMP_NUM_THREADS", 0))
+    except ValueError:
+        return 0
+
+
+def build_session_options(settings: Optional[dict] = None) -> "ort.SessionOptions":
+    """
+    Build ONNX Runtime SessionOptions from ort_* settings.
+
+    Thread counts of 0 use OMP_NUM_THREADS when it is set (as rembg does),
+    otherwise ONNX Runtime's default of one thread per physical core.
+    """
+    import onnxruntime as ort
+
+    settings = settings or get_ort_settings()
+    opts = ort.SessionOptions()
+    opts.intra_op_num_threads = _thread_count(settings.get("ort_intra_op_threads"))
+    opts.inter_op_num_threads = _thread_count(settings.get("ort_inter_op_threads"))
+
+    level = settings.get("ort_graph_optimization") or "all"
+    if level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown graph optimisation level: {level}")
+    opts.graph_optimization_level = {
+        "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+        "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+        "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+        "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+    }[level]
+
+    mode = settings.get("ort_execution_mode") or "sequential"
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"Unknown execution mode: {mode}")
+    opts.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL if mode == "parallel" else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+
+    opts.enable_cpu_mem_arena = bool(settings.get("ort_enable_mem_arena", True))
+    opts.enable_mem_pattern = bool(settings.get("ort_enable_mem_pattern", True))
+    if not settings.get("ort_prepack_weights", True):
+        # Repacked weights are private copies; without them all weight pages stay shared
+        opts.add_session_config_entry("session.disable_prepacking", "1")
+    return opts
+
+
+def _runs_on_cpu(providers: list) -> bool:
+    """Whether a session with these providers (empty: rembg's choice) runs on the CPU provider alone."""
+    if providers:
+        return providers == ["CPUExecutionProvider"]
+    import onnxruntime as ort
+    available = ort.get_available_providers()
+    return not any(provider in available for provider in _ACCELERATED_PROVIDERS)
+
+
+def _graph_cache_path(model: str, model_path: Path, level: str) -> Path:
+    """Cache file for a model's optimised graph.
+
+    Saved graphs may contain kernels specific to the ONNX Runtime build and CPU
+    they were optimised on, so both are part of the key, as is the source file.
+    """
+    import onnxruntime as ort
+
+    stat = model_path.stat()
+    digest = settings_digest({
+        "model_size": stat.st_size,
+        "model_mtime": stat.st_mtime_ns,
+        "ort": ort.__version__,
+        "level": level,
+        "weights": "external",
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    })
+    return get_default_graph_cache_dir() / f"{model}-{level}-{digest[:16]}.onnx"
+
+
+def _protobuf_fields(buffer: bytes):
+    """Yield (field number, value) of a serialised protobuf message; values of
+    length-delimited fields are bytes, varints are ints, fixed-size fields are skipped."""
+    offset = 0
+
+    def varint() -> int:
+        nonlocal offset
+        value = shift = 0
+        while True:
+            byte = buffer[offset]
+            offset += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                return value
+
+    while offset < len(buffer):
+        key = varint()
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            yield field, varint()
+        elif wire_type == 2:
+            length = varint()
+            yield field, buffer[offset:offset + length]
+            offset += length
+        elif wire_type in (1, 5):
+            offset += 8 if wire_type == 1 else 4
+        else:
+            raise ValueError(f"Unsupported protobuf wire type {wire_type}")
+
+
+def external_data_files(graph_path: Path) -> set:
+    """
+    Paths of the external-data files an ONNX graph's initializers point into.
+
+    Reads the ``location`` entries of the main graph's initializers straight
+    from the protobuf (ModelProto.graph = 7, GraphProto.initializer = 5,
+    TensorProto.external_data = 13), so the onnx package isn't needed.
+    Relative locations are resolved against the graph's directory.
+    """
+    graph_path = Path(graph_path)
+    locations = set()
+    for field, graph in _protobuf_fields(graph_path.read_bytes()):
+        if field != 7:
+            continue
+        for field, tensor in _protobuf_fields(graph):
+            if field != 5:
+                continue
+            for field, entry in _protobuf_fields(tensor):
+                if field != 13:
+                    continue
+                pair = dict(_protobuf_fields(entry))
+                if pair.get(1) == b"location" and 2 in pair:
+                    locations.add(graph_path.parent / os.fsdecode(pair[2]))
+    return locations
+
+
+def _remove_stale_graphs(model: str, level: str, keep: Path) -> None:
+    """Delete graphs stored for older builds of a model or ONNX Runtime, and
+    weights files the kept graph doesn't refer to.
+
+    Weights still being written next to another worker's temporary graph are
+    left alone. Processes that already mapped removed weights keep their mapping.
+    """
+    try:
+        referenced = external_data_files(keep)
+    except (OSError, ValueError, IndexError):
+        return
+    stale = [path for path in keep.parent.glob(f"{model}-{level}-*.onnx") if path != keep]
+    stale += [
+        path for path in keep.parent.glob(f"{model}-{level}-*.data")
+        if path not in referenced and not path.with_suffix(".tmp").exists()
+    ]
+    for path in stale:
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+
+def _session_from_file(session_class, model: str, path: Path, opts, providers: list) -> Any:
+    """Build a BaseSession-style rembg session around a specific ONNX file."""
+    import onnxruntime as ort
+
+    session = session_class.__new__(session_class)
+    session.model_name = model
+    session.inner_session = ort.InferenceSession(str(path), sess_options=opts, providers=providers)
+    return session
+
+
+def _load_stored_graph(session_class, model: str, path: Path, settings: dict) -> Optional[Any]:
+    """Load an already optimised graph from the store, or None if it can't be read."""
+    import onnxruntime as ort
+
+    opts = build_session_options(settings)
+    # Running the optimisation passes again would only cost time
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+    try:
+        return _session_from_file(session_class, model, path, opts, ["CPUExecutionProvider"])
+    except Exception as e:
+        print(f"Ignoring unreadable optimised graph {path.name}: {e}")
+        return None
+
+
+def create_session(model: str, settings: Optional[dict] = None) -> Any:
+    """
+    Create a rembg session for a model using the ort_* settings.
+
+    A drop-in replacement for rembg.new_session(model) that SessionPool uses
+    as its loader. ``<model>-int8`` names load the quantised file (see
+    processors/quantize.py) through the FP32 model's session class, building
+    it first if it doesn't exist yet.
+
+    Args:
+        model: rembg model name
+        settings: ort_* settings (default: get_ort_settings())
+
+    Returns:
+        rembg session object
+    """
+    from rembg.sessions import sessions_class
+    from rembg.sessions.base import BaseSession
+
+    settings = settings or get_ort_settings()
+    session_class = next((sc for sc in sessions_class if sc.name() == base_model_name(model)), None)
+    if session_class is None:
+        raise ValueError(f"No session class found for model '{model}'")
+    # Only sessions that load a single model file through BaseSession can be
+    # pointed at a different (quantised or pre-optimised) file
+    single_file = session_class.__init__ is BaseSession.__init__
+
+    opts = build_session_options(settings)
+    providers = list(settings.get("ort_providers") or [])
+    provider_kwargs = {"providers": providers} if providers else {}
+
+    model_path = None
+    if is_quantized_model(model):
+        if not single_file:
+            raise ValueError(f"{base_model_name(model)} has no int8 variant")
+        model_path = quantize_model(model, status_callback=print)
+
+    # Saved graphs are only portable for the CPU provider. Even unoptimised
+    # graphs are stored, for their memory-mapped weights.
+    level = settings.get("ort_graph_optimization") or "all"
+    cacheable = (
+        settings.get("ort_graph_cache", True)
+        and _runs_on_cpu(providers)
+        and single_file
+    )
+    if not cacheable:
+        if model_path is not None:
+            # Integer kernels are CPU-only, so the CPU provider is always a fallback
+            return _session_from_file(
+                session_class, model, model_path, opts, providers or ["CPUExecutionProvider"]
+            )
+        return session_class(model, opts, **provider_kwargs)
+
+    model_path = model_path or Path(session_class.download_models())
+    cache_path = _graph_cache_path(model, model_path, level)
+
+    stored = _load_stored_graph(session_class, model, cache_path, settings) if cache_path.exists() else None
+    if stored is not None:
+        return stored
+    broken = cache_path.exists()
+
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+    except OSError as e:
+        print(f"Failed to create ONNX graph cache: {e}")
+        return _session_from_file(session_class, model, model_path, opts, ["CPUExecutionProvider"])
+
+    # Write then rename, so other workers never load a partial graph. The
+    # weights file is named per writer (the graph refers to it by name), so
+    # concurrent writers never overwrite weights another graph points into.
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    data_path = cache_path.with_suffix(f".{os.getpid()}.data")
+    opts.optimized_model_filepath = str(tmp_path)
+    opts.add_session_config_entry("session.optimized_model_external_initializers_file_name", data_path.name)
+    session = _session_from_file(session_class, model, model_path, opts, ["CPUExecutionProvider"])
+    try:
+        if cache_path.exists() and not broken:
+            # Another worker stored the graph first; use its weights, not a second copy
+            tmp_path.unlink()
+            if data_path.exists():
+                data_path.unlink()
+        else:
+            os.replace(tmp_path, cache_path)
+            _remove_stale_graphs(model, level, cache_path)
+    except OSError as e:
+        print(f"Failed to write optimised graph for {model}: {e}")
+        return session
+
+    # The session just built holds its weights on the heap; one loaded from the
+    # store maps them, shared with the other workers
+    return _load_stored_graph(session_class, model, cache_path, settings) or session
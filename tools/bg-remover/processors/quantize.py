@@ -0,0 +1,190 @@
+"""
+Int8 model variants - dynamic quantisation of downloaded rembg models and an
+accuracy check against the FP32 originals.
+
+``<model>-int8`` (e.g. ``birefnet-general-int8``) is built offline from the
+already-downloaded FP32 file with ONNX Runtime's quantize_dynamic(): weights
+are stored as int8 and activations are quantised on the fly, so MatMul/Conv
+run as integer kernels on the CPU. Run it through the same rembg session
+class as the FP32 model; only the ONNX file differs.
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from core.constants import INT8_SUFFIX
+except ImportError:
+    from ..core.constants import INT8_SUFFIX
+
+
+# Operators quantised by default. Conv covers the U2Net/ISNet encoders and the
+# BiRefNet decoder, MatMul the BiRefNet (Swin) backbone.
+DEFAULT_QUANTIZED_OPS = ("MatMul", "Conv")
+
+
+def is_quantized_model(model: str) -> bool:
+    """Whether a model name refers to an int8 variant."""
+    return model.endswith(INT8_SUFFIX)
+
+
+def base_model_name(model: str) -> str:
+    """The FP32 model an int8 variant is built from (other names are returned as-is)."""
+    return model[:-len(INT8_SUFFIX)] if is_quantized_model(model) else model
+
+
+def _session_class(model: str):
+    from rembg.sessions import sessions_class
+    for session_class in sessions_class:
+        if session_class.name() == model:
+            return session_class
+    raise ValueError(f"No session class found for model '{model}'")
+
+
+def quantized_model_path(model: str) -> Path:
+    """Where the int8 file for a model lives: next to the FP32 download."""
+    base = base_model_name(model)
+    fp32_path = Path(_session_class(base).download_models())
+    return fp32_path.with_name(f"{base}{INT8_SUFFIX}.onnx")
+
+
+def quantize_model(
+    model: str,
+    op_types: Iterable[str] = DEFAULT_QUANTIZED_OPS,
+    force: bool = False,
+    status_callback: Optional[Callable[[str], None]] = None
+) -> Path:
+    """
+    Build the int8 variant of a model from its downloaded FP32 file.
+
+    The FP32 model is downloaded first if needed. An existing int8 file is
+    reused unless ``force`` is set or it is older than the FP32 file.
+
+    Args:
+        model: Model name, with or without the ``-int8`` suffix
+        op_types: ONNX operator types to quantise
+        force: Rebuild even if an up-to-date int8 file exists
+        status_callback: Optional callback for status updates
+
+    Returns:
+        Path of the int8 ONNX file
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    base = base_model_name(model)
+    fp32_path = Path(_session_class(base).download_models())
+    int8_path = fp32_path.with_name(f"{base}{INT8_SUFFIX}.onnx")
+    if (
+        not force
+        and int8_path.exists()
+        and int8_path.stat().st_mtime >= fp32_path.stat().st_mtime
+    ):
+        return int8_path
+
+    if status_callback:
+        status_callback(f"Quantising {base} to int8 (one-off, may take a minute)...")
+
+    # Write then rename, so a concurrent loader never sees a partial model
+    tmp_path = int8_path.with_suffix(f".{os.getpid()}.tmp")
+    prepared_path = int8_path.with_suffix(f".{os.getpid()}.prep.tmp")
+    source = fp32_path
+    try:
+        try:
+            # Shape inference + graph cleanup lets more nodes be quantised;
+            # models it can't handle are quantised as they are
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+            quant_pre_process(str(fp32_path), str(prepared_path), skip_symbolic_shape=True)
+            source = prepared_path
+        except Exception:
+            pass
+
+        quantize_dynamic(
+            str(source),
+            str(tmp_path),
+            op_types_to_quantize=list(op_types),
+            weight_type=QuantType.QInt8,
+        )
+        os.replace(tmp_path, int8_path)
+    finally:
+        for path in (tmp_path, prepared_path):
+            if path.exists():
+                path.unlink()
+
+    if status_callback:
+        size_mb = int8_path.stat().st_size / 1024 ** 2
+        status_callback(f"Wrote {int8_path.name} ({size_mb:.0f} MB)")
+    return int8_path
+
+
+def mask_agreement(reference: np.ndarray, candidate: np.ndarray) -> Tuple[float, float]:
+    """
+    Compare two uint8 masks of the same size.
+
+    Returns:
+        (IoU of the alpha >= 128 regions, mean absolute alpha difference / 255)
+    """
+    ref_fg = reference >= 128
+    cand_fg = candidate >= 128
+    union = np.count_nonzero(ref_fg | cand_fg)
+    iou = np.count_nonzero(ref_fg & cand_fg) / union if union else 1.0
+    diff = np.abs(reference.astype(np.int16) - candidate.astype(np.int16)).mean() / 255.0
+    return float(iou), float(diff)
+
+
+def evaluate_quantized(
+    processor,
+    model: str,
+    images: List[Tuple[str, np.ndarray]],
+    status_callback: Optional[Callable[[str], None]] = None
+) -> dict:
+    """
+    Measure how closely a model's int8 variant tracks the FP32 model.
+
+    Both models are loaded before timing starts, so the reported times are
+    inference only.
+
+    Args:
+        processor: RembgProcessor to predict with
+        model: Model name, with or without the ``-int8`` suffix
+        images: (name, HxWx3 uint8 RGB array) samples
+        status_callback: Optional callback for status updates
+
+    Returns:
+        Dict with per-image IoU / alpha error, their mean and worst values,
+        and the mean seconds per image of each model
+    """
+    base = base_model_name(model)
+    quantized = f"{base}{INT8_SUFFIX}"
+    timings = {base: 0.0, quantized: 0.0}
+    for name in timings:
+        processor.load_model(name, status_callback)
+
+    results = []
+    for index, (name, image) in enumerate(images, 1):
+        if status_callback:
+            status_callback(f"[{index}/{len(images)}] {name}")
+        masks = {}
+        for variant in timings:
+            start = time.perf_counter()
+            masks[variant] = processor.predict_mask(image, {"model": variant})
+            timings[variant] += time.perf_counter() - start
+        iou, alpha_error = mask_agreement(masks[base], masks[quantized])
+        results.append({"image": name, "iou": round(iou, 4), "alpha_error": round(alpha_error, 4)})
+
+    count = max(len(results), 1)
+    fp32_seconds = timings[base] / count
+    int8_seconds = timings[quantized] / count
+    return {
+        "model": base,
+        "images": results,
+        "mean_iou": round(sum(r["iou"] for r in results) / count, 4),
+        "min_iou": min((r["iou"] for r in results), default=1.0),
+        "mean_alpha_error": round(sum(r["alpha_error"] for r in results) / count, 4),
+        "fp32_seconds": round(fp32_seconds, 4),
+        "int8_seconds": round(int8_seconds, 4),
+        "speedup": round(fp32_seconds / int8_seconds, 2) if int8_seconds > 0 else 0.0,
+    }
@@ -0,0 +1,102 @@
+"""
+Processor registry - the backends, what each needs installed, and lazy loading.
+
+Availability is answered from importlib.util.find_spec(), which locates a
+package without importing it, so asking "is SAM3 installed?" no longer pulls
+in torch. A backend's module is imported the first time its class is asked
+for, and the backends themselves import rembg/onnxruntime/sam3 only when a
+model is first loaded.
+
+Callers that use a backend from worker threads warm() it on the main thread
+first: rembg pulls in numba (through pymatting), and a process that first
+imports numba on any other thread hangs when it exits.
+"""
+
+import importlib
+import importlib.util
+import time
+from typing import Any, Dict, List, Tuple
+
+
+class BackendSpec:
+    """Where a backend lives and which top-level packages it needs."""
+
+    def __init__(self, name: str, module: str, class_name: str, requires: Tuple[str, ...], description: str):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.requires = requires
+        self.description = description
+
+
+BACKENDS: Dict[str, BackendSpec] = {
+    "rembg": BackendSpec(
+        "rembg", "rembg_processor", "RembgProcessor", ("rembg", "onnxruntime"),
+        "ONNX models via rembg (falls back to a GrabCut heuristic when missing)",
+    ),
+    "sam3": BackendSpec(
+        "sam3", "sam3_processor", "Sam3Processor", ("sam3", "torch"),
+        "SAM3 text-prompted segmentation",
+    ),
+}
+
+_found: Dict[str, bool] = {}
+_import_seconds: Dict[str, float] = {}
+
+
+def modules_available(*names: str) -> bool:
+    """Whether all the given top-level packages are installed (without importing them)."""
+    for name in names:
+        if name not in _found:
+            try:
+                _found[name] = importlib.util.find_spec(name) is not None
+            except (ImportError, ValueError):
+                _found[name] = False
+        if not _found[name]:
+            return False
+    return True
+
+
+def missing_requirements(backend: str) -> List[str]:
+    """Packages a backend needs that are not installed."""
+    return [name for name in BACKENDS[backend].requires if not modules_available(name)]
+
+
+def is_backend_available(backend: str) -> bool:
+    """Whether a backend's dependencies are installed."""
+    return not missing_requirements(backend)
+
+
+def get_processor_class(backend: str) -> type:
+    """Import a backend's module on first use and return its processor class."""
+    spec = BACKENDS[backend]
+    start = time.perf_counter()
+    module = importlib.import_module(f".{spec.module}", __package__)
+    _import_seconds.setdefault(backend, time.perf_counter() - start)
+    return getattr(module, spec.class_name)
+
+
+def warm(backend: str) -> None:
+    """Import an installed backend's packages now, on the calling thread (see the module docstring)."""
+    if not is_backend_available(backend):
+        return
+    for name in BACKENDS[backend].requires:
+        importlib.import_module(name)
+
+
+def create_processor(backend: str, **kwargs: Any):
+    """Create a processor for a backend."""
+    return get_processor_class(backend)(**kwargs)
+
+
+def backend_report() -> Dict[str, dict]:
+    """Availability, missing packages and module import time of each backend."""
+    return {
+        name: {
+            "available": is_backend_available(name),
+            "missing": missing_requirements(name),
+            "import_seconds": round(_import_seconds[name], 4) if name in _import_seconds else None,
+            "description": spec.description,
+        }
+        for name, spec in BACKENDS.items()
+    }
@@ -2,27 +2,232 @@
 Rembg processor - CPU-based background removal using rembg library.
 """
 
-import io
 from pathlib import Path
 from PIL import Image
-from typing import Optional, Callable
+from typing import Optional, Callable, List
 
+import numpy as np
+
+from .base import BaseProcessor
+from .cascade import mask_quality
+from .ort_session import create_session, get_ort_settings
+from .quantize import base_model_name, is_quantized_model, quantize_model
+from .registry import modules_available
+from .session_pool import SessionPool
 
 try:
-    from rembg import remove, new_session
-    rembg_available = True
+    from core.config import load_config
+    from core.constants import AUTO_MODEL, CASCADE_MODELS
+    from core.telemetry import span
+    from utils.hashing import settings_digest
+    from utils.image import load_rgb_array
+    from utils.matting import guided_matting_cutout
 except ImportError:
-    rembg_available = False
+    from ..core.config import load_config
+    from ..core.constants import AUTO_MODEL, CASCADE_MODELS
+    from ..core.telemetry import span
+    from ..utils.hashing import settings_digest
+    from ..utils.image import load_rgb_array
+    from ..utils.matting import guided_matting_cutout
 
-from .base import BaseProcessor
+
+# rembg (and the onnxruntime/pymatting/numba stack behind it) is only imported
+# when a model is first used; importing it costs about a second
+rembg_available = modules_available("rembg", "onnxruntime")
+
+_IMAGENET_MEAN = (0.485, 0.456, 0.406)
+_IMAGENET_STD = (0.229, 0.224, 0.225)
+_BIREFNET = (_IMAGENET_MEAN, _IMAGENET_STD, (1024, 1024), True)
+_U2NET = (_IMAGENET_MEAN, _IMAGENET_STD, (320, 320), False)
+
+# Models whose session does plain normalize -> run -> min/max rescale, so several
+# images can be stacked into one ONNX run. Mirrors each rembg session's predict():
+# model -> (mean, std, input size, apply sigmoid to the logits)
+BATCHABLE_MODELS = {
+    "birefnet-general": _BIREFNET,
+    "birefnet-general-lite": _BIREFNET,
+    "birefnet-portrait": _BIREFNET,
+    "birefnet-dis": _BIREFNET,
+    "birefnet-hrsod": _BIREFNET,
+    "birefnet-cod": _BIREFNET,
+    "birefnet-massive": _BIREFNET,
+    "u2net": _U2NET,
+    "u2netp": _U2NET,
+    "u2net_human_seg": _U2NET,
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024), False),
+    "isnet-anime": (_IMAGENET_MEAN, (1.0, 1.0, 1.0), (1024, 1024), False),
+}
+
+
+# Fragments of onnxruntime's messages when a graph can't take a batch: a fixed
+# batch dimension on the input, or a Reshape/broadcast with the batch size
+# baked in
+_BATCH_SHAPE_ERRORS = ("invalid dimensions", "shape", "broadcast")
+
+
+def _is_batch_shape_error(error: Exception) -> bool:
+    """Whether an onnxruntime run failed because of the input's batch dimension."""
+    # onnxruntime's pybind exceptions (InvalidArgument, Fail, ...) are matched by
+    # name so this module doesn't import onnxruntime
+    if type(error).__module__.split(".")[0] != "onnxruntime":
+        return False
+    message = str(error).lower()
+    return any(fragment in message for fragment in _BATCH_SHAPE_ERRORS)
+
+
+def _normalize(image: np.ndarray, mean, std, size) -> np.ndarray:
+    """Build a 1x3xHxW model input from RGB pixels, as rembg's session.normalize does."""
+    small = np.asarray(Image.fromarray(image).resize(size, Image.Resampling.LANCZOS), dtype=np.float32)
+    small /= max(float(small.max()), 1e-6)
+    small -= np.asarray(mean, dtype=np.float32)
+    small /= np.asarray(std, dtype=np.float32)
+    return small.transpose(2, 0, 1)[np.newaxis]
+
+
+# The heuristic fallback runs GrabCut on a copy no larger than this, then
+# re-runs it at full resolution only in tiles along the subject's outline
+HEURISTIC_COARSE_SIDE = 640
+_HEURISTIC_TILE = 256
+
+
+def _grabcut_rect(img: np.ndarray, iterations: int = 5) -> np.ndarray:
+    """GrabCut initialised with the image minus a 2px border. Returns a 0/255 foreground mask."""
+    import cv2
+
+    h, w = img.shape[:2]
+    mask_grab = np.zeros((h, w), np.uint8)
+    bgdModel = np.zeros((1, 65), np.float64)
+    fgdModel = np.zeros((1, 65), np.float64)
+    rect = (2, 2, w - 4, h - 4)
+
+    try:
+        cv2.grabCut(img, mask_grab, rect, bgdModel, fgdModel, iterations, cv2.GC_INIT_WITH_RECT)
+    except cv2.error:
+        mask_grab = np.ones((h, w), np.uint8) * 3 # Fallback to all ProbFG
+
+    return np.where((mask_grab == 2) | (mask_grab == 0), 0, 255).astype('uint8')
+
+
+def _grabcut_coarse_to_fine(img: np.ndarray, coarse_side: int, iterations: int = 5) -> np.ndarray:
+    """
+    GrabCut on a downsampled copy, refined at full resolution near the boundary.
+
+    The coarse mask is upsampled; pixels further than a few coarse pixels from
+    its edge are fixed as sure foreground/background. GrabCut then re-runs
+    (seeded from the upsampled mask) only on full-resolution tiles that
+    contain the uncertain band, so its cost follows the outline's length
+    rather than the image area.
+
+    Returns:
+        0/255 foreground mask at full resolution
+    """
+    import cv2
+
+    h, w = img.shape[:2]
+    scale = coarse_side / max(h, w)
+    small = cv2.resize(img, (max(8, round(w * scale)), max(8, round(h * scale))), interpolation=cv2.INTER_AREA)
+    coarse = _grabcut_rect(small, iterations)
+    foreground = cv2.resize(coarse, (w, h), interpolation=cv2.INTER_LINEAR) >= 128
+
+    # Band: two coarse pixels either side of the upsampled edge
+    radius = 2 * int(np.ceil(1 / scale))
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+    fg_u8 = foreground.astype(np.uint8)
+    sure_fg = cv2.erode(fg_u8, kernel).astype(bool)
+    sure_bg = ~cv2.dilate(fg_u8, kernel).astype(bool)
+
+    labels = np.where(foreground, cv2.GC_PR_FGD, cv2.GC_PR_BGD).astype(np.uint8)
+    labels[sure_fg] = cv2.GC_FGD
+    labels[sure_bg] = cv2.GC_BGD
+    # Same sure-background border as the rect initialisation
+    labels[:2, :] = labels[-2:, :] = cv2.GC_BGD
+    labels[:, :2] = labels[:, -2:] = cv2.GC_BGD
+    band = (labels == cv2.GC_PR_FGD) | (labels == cv2.GC_PR_BGD)
+
+    refined = labels.copy()
+    for top in range(0, h, _HEURISTIC_TILE):
+        for left in range(0, w, _HEURISTIC_TILE):
+            tile = (slice(top, top + _HEURISTIC_TILE), slice(left, left + _HEURISTIC_TILE))
+            if not band[tile].any():
+                continue
+            # Include a halo so the colour models see sure pixels on both sides
+            y0, y1 = max(0, top - radius), min(h, top + _HEURISTIC_TILE + radius)
+            x0, x1 = max(0, left - radius), min(w, left + _HEURISTIC_TILE + radius)
+            crop_labels = labels[y0:y1, x0:x1].copy()
+            has_fg = np.isin(crop_labels, (cv2.GC_FGD, cv2.GC_PR_FGD)).any()
+            has_bg = np.isin(crop_labels, (cv2.GC_BGD, cv2.GC_PR_BGD)).any()
+            if not (has_fg and has_bg):
+                continue
+
+            bgdModel = np.zeros((1, 65), np.float64)
+            fgdModel = np.zeros((1, 65), np.float64)
+            try:
+                cv2.grabCut(np.ascontiguousarray(img[y0:y1, x0:x1]), crop_labels, None,
+                            bgdModel, fgdModel, 2, cv2.GC_INIT_WITH_MASK)
+            except cv2.error:
+                continue
+            inner = (slice(top - y0, top - y0 + _HEURISTIC_TILE), slice(left - x0, left - x0 + _HEURISTIC_TILE))
+            refined[tile] = crop_labels[inner]
+
+    return np.where((refined == cv2.GC_BGD) | (refined == cv2.GC_PR_BGD), 0, 255).astype(np.uint8)
+
+
+def download_model(model: str, status_callback: Optional[Callable[[str], None]] = None) -> None:
+    """Download a model's weights without creating a session (building int8 variants locally)."""
+    if not rembg_available:
+        return
+    if model == AUTO_MODEL:
+        for cascade_model in CASCADE_MODELS:
+            download_model(cascade_model, status_callback)
+        return
+    if is_quantized_model(model):
+        quantize_model(model, status_callback=status_callback)
+        return
+    from rembg.sessions import sessions_class
+    for session_class in sessions_class:
+        if session_class.name() == model:
+            session_class.download_models()
+            return
+
+
+_session_pool: Optional[SessionPool] = None
+
+
+def get_session_pool() -> SessionPool:
+    """Get the process-wide rembg session pool, sized from ``session_pool_mb``."""
+    global _session_pool
+    if _session_pool is None:
+        budget_mb = load_config().get("session_pool_mb", 2048)
+        # configure_ort() may change the settings later; sessions built under
+        # the old ones are not handed out again
+        _session_pool = SessionPool(
+            int(budget_mb) * 1024 * 1024,
+            create_session,
+            settings_key=lambda: settings_digest(get_ort_settings()),
+        )
+    return _session_pool
+
+
+def configure_session_pool(max_mb: int) -> None:
+    """Set the RAM budget (in MB) of the process-wide session pool."""
+    if rembg_available:
+        get_session_pool().set_budget(int(max_mb) * 1024 * 1024)
 
 
 class RembgProcessor(BaseProcessor):
     """Background removal using rembg with various ONNX models."""
 
-    def __init__(self):
+    def __init__(self, session_pool: Optional[SessionPool] = None):
+        """
+        Args:
+            session_pool: Pool to take model sessions from (defaults to the
+                process-wide pool shared by every processor)
+        """
+        self._pool = session_pool
         self._session = None
         self._current_model = None
+        self._unbatchable_models = set()
+        self._cascade_stats = {"images": 0, "escalated": 0}
 
     def process(
         self,
@@ -34,61 +239,203 @@ class RembgProcessor(BaseProcessor):
         """
         Process image using rembg.
         """
+        with span("decode"):
+            image = load_rgb_array(input_path)
+        rgba = self.process_array(image, options, status_callback, Path(input_path))
+        return Image.fromarray(rgba)
+
+    def predict_mask(
+        self,
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> np.ndarray:
+        """Run the rembg model (or the heuristic fallback) and return the raw mask."""
         if not rembg_available:
             if status_callback:
                 status_callback("WARNING: 'rembg' not available. Using basic color-based removal.")
-            return self._heuristic_remove(input_path)
+            with span("inference", model="heuristic"):
+                return self._heuristic_mask(image)
 
         model = options.get("model", "birefnet-general")
+        if model == AUTO_MODEL:
+            return self._predict_auto([image], status_callback)[0]
 
-        # Get or create session
-        if self._session is None or self._current_model != model:
-            if status_callback:
-                status_callback(f"Loading model: {model}...")
-            self._session = new_session(model)
-            self._current_model = model
-
-        # Read input image
-        with open(input_path, 'rb') as f:
-            input_data = f.read()
-
-        # Build kwargs
+        self.load_model(model, status_callback)
         if status_callback:
             status_callback("Removing background...")
+        with span("inference", model=model):
+            return self._predict_masks([image], model)[0]
 
-        kwargs = {
-            "session": self._session,
-        }
+    def mask_options(self, options: dict) -> dict:
+        """Only the model changes the mask; alpha matting is applied afterwards."""
+        if not rembg_available:
+            return {}
+        return {"model": options.get("model", "birefnet-general")}
 
-        if options.get("alpha_matting", False):
-            kwargs["alpha_matting"] = True
-            kwargs["alpha_matting_foreground_threshold"] = options.get(
-                "alpha_matting_foreground_threshold", 240
-            )
-            kwargs["alpha_matting_background_threshold"] = options.get(
-                "alpha_matting_background_threshold", 10
-            )
-            kwargs["alpha_matting_erode_size"] = options.get(
-                "alpha_matting_erode_size", 10
+    def predict_masks(
+        self,
+        images: List[np.ndarray],
+        model: str,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> List[np.ndarray]:
+        """
+        Predict alpha masks for several decoded images with one model run.
+
+        Images are stacked into a single ONNX batch when the model supports it
+        (see BATCHABLE_MODELS); otherwise they are predicted one at a time on
+        the same session.
+
+        Args:
+            images: HxWx3 uint8 RGB arrays
+            model: Model name
+            status_callback: Optional callback for status updates
+
+        Returns:
+            List of HxW uint8 masks, in input order and at each image's size
+        """
+        if not rembg_available:
+            raise RuntimeError("Batch processing requires 'rembg'")
+        if model == AUTO_MODEL:
+            return self._predict_auto(images, status_callback)
+
+        self.load_model(model, status_callback)
+        if status_callback:
+            status_callback(f"Removing background from {len(images)} images...")
+        with span("inference", model=model, batch=len(images)):
+            return self._predict_masks(images, model)
+
+    def make_cutout(self, image: np.ndarray, mask: np.ndarray, options: dict) -> np.ndarray:
+        """Apply a predicted mask to its image, with optional alpha matting."""
+        if options.get("alpha_matting", False) and options.get("alpha_matting_method") == "guided":
+            return guided_matting_cutout(
+                image,
+                mask,
+                options.get("alpha_matting_foreground_threshold", 240),
+                options.get("alpha_matting_background_threshold", 10),
+                options.get("alpha_matting_erode_size", 10),
             )
+        if rembg_available and options.get("alpha_matting", False):
+            try:
+                from rembg.bg import alpha_matting_cutout
+                cutout = alpha_matting_cutout(
+                    Image.fromarray(image),
+                    Image.fromarray(mask),
+                    options.get("alpha_matting_foreground_threshold", 240),
+                    options.get("alpha_matting_background_threshold", 10),
+                    options.get("alpha_matting_erode_size", 10),
+                )
+                return np.asarray(cutout.convert("RGBA"))
+            except ValueError:
+                pass
+        if not rembg_available:
+            return super().make_cutout(image, mask, options)
+
+        # Same pixels as rembg's naive_cutout (Image.composite over transparent
+        # black, using PIL's rounding), without the PIL round-trip
+        weighted = image.astype(np.uint16) * mask[..., np.newaxis] + 128
+        rgb = ((weighted + (weighted >> 8)) >> 8).astype(np.uint8)
+        return np.dstack((rgb, mask))
 
-        output_data = remove(input_data, **kwargs)
+    def _predict_masks(self, images: List[np.ndarray], model: str) -> List[np.ndarray]:
+        """Predict one mask per image, batching the ONNX run when possible."""
+        # int8 variants share the FP32 model's input size and normalisation
+        spec = BATCHABLE_MODELS.get(base_model_name(model))
+        if spec is None or model in self._unbatchable_models:
+            return [self._predict_one(image) for image in images]
 
-        # Load the processed image
-        output_img = Image.open(io.BytesIO(output_data)).convert("RGBA")
+        mean, std, size, use_sigmoid = spec
+        input_name = self._session.inner_session.get_inputs()[0].name
+        batch = np.concatenate([_normalize(image, mean, std, size) for image in images])
 
-        return output_img
+        try:
+            preds = self._session.inner_session.run(None, {input_name: batch})[0][:, 0, :, :]
+        except Exception as e:
+            if len(images) == 1 or not _is_batch_shape_error(e):
+                raise
+            # Graph was exported with a fixed batch size of 1
+            self._unbatchable_models.add(model)
+            return [self._predict_one(image) for image in images]
 
-    def _heuristic_remove(self, input_path: Path) -> Image.Image:
-        """Fallback: OpenCV GrabCut -> Erode -> Feather."""
+        masks = []
+        for pred, image in zip(preds, images):
+            if use_sigmoid:
+                pred = 1 / (1 + np.exp(-pred))
+            # Rescale per image, as rembg does for a batch of one
+            lo, hi = pred.min(), pred.max()
+            pred = (pred - lo) / max(hi - lo, 1e-6)
+            mask = Image.fromarray((pred.clip(0, 1) * 255).astype(np.uint8))
+            mask = mask.resize((image.shape[1], image.shape[0]), Image.Resampling.LANCZOS)
+            masks.append(np.asarray(mask))
+        return masks
+
+    def _predict_auto(
+        self,
+        images: List[np.ndarray],
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> List[np.ndarray]:
+        """Run the lite model, then the heavy one on images whose mask scores badly."""
+        fast_model, heavy_model = CASCADE_MODELS
+
+        self.load_model(fast_model, status_callback)
+        if status_callback:
+            status_callback(f"Removing background ({fast_model})...")
+        with span("inference", model=fast_model, batch=len(images)):
+            masks = self._predict_masks(images, fast_model)
+
+        unsure = []
+        for index, mask in enumerate(masks):
+            quality = mask_quality(mask)
+            if not quality["confident"]:
+                unsure.append(index)
+                if status_callback:
+                    status_callback(f"Unsure mask ({', '.join(quality['reasons'])}), escalating to {heavy_model}...")
+
+        self._cascade_stats["images"] += len(images)
+        self._cascade_stats["escalated"] += len(unsure)
+        if unsure:
+            self.load_model(heavy_model, status_callback)
+            with span("inference", model=heavy_model, batch=len(unsure)):
+                heavy_masks = self._predict_masks([images[i] for i in unsure], heavy_model)
+            for index, mask in zip(unsure, heavy_masks):
+                masks[index] = mask
+        return masks
+
+    def _predict_one(self, image: np.ndarray) -> np.ndarray:
+        """Predict through the session's own predict() (models with custom pre/post-processing)."""
+        return np.asarray(self._session.predict(Image.fromarray(image))[0].convert("L"))
+
+    def load_model(
+        self,
+        model: str,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> None:
+        """Take the session for a model from the pool, loading it if needed."""
+        if not rembg_available:
+            return
+        if model == AUTO_MODEL:
+            # Warm both cascade models; each prediction picks its own session
+            for cascade_model in CASCADE_MODELS:
+                self.load_model(cascade_model, status_callback)
+            return
+
+        if self._pool is None:
+            self._pool = get_session_pool()
+        self._session = self._pool.get(model, status_callback)
+        self._current_model = model
+
+    def _heuristic_mask(self, image: np.ndarray, coarse_side: Optional[int] = HEURISTIC_COARSE_SIDE) -> np.ndarray:
+        """
+        Fallback: OpenCV GrabCut -> Erode -> Feather. Returns the alpha mask.
+
+        Images larger than ``coarse_side`` run GrabCut coarse-to-fine (see
+        _grabcut_coarse_to_fine); None always runs it at full resolution.
+        """
         import cv2
-        import numpy as np
-        
-        # Load as BGR (GrabCut needs 3 channels)
-        img = cv2.imread(str(input_path))
-        if img is None:
-             raise ValueError("Could not load image via OpenCV")
-             
+
+        # BGR copy (GrabCut needs 3 channels)
+        img = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+
         # 1. Flood Fill Mask (High Tolerance to catch noise)
         # Create a mask for floodFill (h+2, w+2)
         h, w = img.shape[:2]
@@ -107,17 +454,10 @@ class RembgProcessor(BaseProcessor):
         mask_fg_flood = cv2.bitwise_not(mask_flood) # White = Object
         
         # 2. GrabCut Mask
-        mask_grab = np.zeros((h, w), np.uint8)
-        bgdModel = np.zeros((1,65), np.float64)
-        fgdModel = np.zeros((1,65), np.float64)
-        rect = (2, 2, w - 4, h - 4)
-        
-        try:
-            cv2.grabCut(img, mask_grab, rect, bgdModel, fgdModel, 5, cv2.GC_INIT_WITH_RECT)
-        except:
-            mask_grab = np.ones((h, w), np.uint8) * 3 # Fallback to all ProbFG
-            
-        mask_fg_grab = np.where((mask_grab==2)|(mask_grab==0), 0, 255).astype('uint8')
+        if coarse_side and max(h, w) > coarse_side:
+            mask_fg_grab = _grabcut_coarse_to_fine(img, coarse_side)
+        else:
+            mask_fg_grab = _grabcut_rect(img)
         
         # 3. Combine: Intersection
         final_mask = cv2.bitwise_and(mask_fg_flood, mask_fg_grab)
@@ -141,12 +481,7 @@ class RembgProcessor(BaseProcessor):
         # 6. Feather
         final_mask = cv2.GaussianBlur(final_mask, (5, 5), 1.0)
         
-        # Apply to Alpha
-        b, g, r = cv2.split(img)
-        result = cv2.merge([b, g, r, final_mask])
-        
-        result_rgb = cv2.cvtColor(result, cv2.COLOR_BGRA2RGBA)
-        return Image.fromarray(result_rgb)
+        return final_mask
 
     def is_available(self) -> bool:
         return True
@@ -155,7 +490,25 @@ class RembgProcessor(BaseProcessor):
         return "rembg" if rembg_available else "heuristic"
 
     def clear_session(self) -> None:
-        """Clear the cached model session."""
+        """Release this processor's session and drop its model from the pool."""
+        if self._pool is not None and self._current_model is not None:
+            self._pool.evict(self._current_model)
         self._session = None
         self._current_model = None
 
+    def get_cascade_stats(self) -> dict:
+        """Get how many "auto" images this processor ran and how many it escalated."""
+        return dict(self._cascade_stats)
+
+    def get_pool_stats(self) -> dict:
+        """Get hit/miss/load-time/resident-size stats of the session pool."""
+        if not rembg_available:
+            # The heuristic fallback never loads a session
+            return {
+                "models": [], "hits": 0, "misses": 0, "evictions": 0,
+                "load_seconds": 0.0, "resident_bytes": 0, "max_bytes": 0,
+            }
+        if self._pool is None:
+            self._pool = get_session_pool()
+        return self._pool.stats()
+
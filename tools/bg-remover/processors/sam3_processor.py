@@ -2,38 +2,137 @@
 SAM3 processor - GPU-based text-prompted segmentation using Meta's SAM3.
 """
 
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from PIL import Image
-from typing import Optional, Callable, Tuple
+from typing import Any, Dict, List, Optional, Callable, Tuple
 import numpy as np
 
 try:
     from processors.base import BaseProcessor
-    from core.config import get_hf_token, set_hf_token
+    from processors.registry import missing_requirements
+    from core.config import get_hf_token, set_hf_token, load_config
+    from core.telemetry import span
+    from utils.hashing import array_digest
+    from utils.image import load_rgb_array
 except ImportError:
     from .base import BaseProcessor
-    from ..core.config import get_hf_token, set_hf_token
-
-
-# Check for SAM3 availability
-SAM3_AVAILABLE = False
-SAM3_IMPORT_ERROR = None
-try:
-    from sam3.model_builder import build_sam3_image_model
-    from sam3.model.sam3_image_processor import Sam3Processor as Sam3ProcessorClass
-    SAM3_AVAILABLE = True
-except ImportError as e:
-    SAM3_IMPORT_ERROR = str(e)
-except Exception as e:
-    SAM3_IMPORT_ERROR = f"Unexpected error: {e}"
+    from .registry import missing_requirements
+    from ..core.config import get_hf_token, set_hf_token, load_config
+    from ..core.telemetry import span
+    from ..utils.hashing import array_digest
+    from ..utils.image import load_rgb_array
+
+
+# Check for SAM3 availability without importing it: sam3 pulls in torch, which
+# takes seconds, so the import happens when the model is first loaded
+_missing = missing_requirements("sam3")
+SAM3_AVAILABLE = not _missing
+SAM3_IMPORT_ERROR = f"No module named '{_missing[0]}'" if _missing else None
+
+
+# States kept at most, however small their estimated size
+_MAX_CACHED_STATES = 32
+
+
+def _state_nbytes(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    Estimate the memory held by an inference state (tensors/arrays, recursively).
+
+    Objects of unknown types count with their attributes plus their own
+    ``sys.getsizeof``, so nothing is ever counted as free.
+    """
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):
+        return value.element_size() * value.nelement()
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if _seen is None:
+        _seen = set()
+    if id(value) in _seen:
+        return 0
+    _seen.add(id(value))
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        return size + sum(_state_nbytes(v, _seen) for v in value.values())
+    if isinstance(value, (list, tuple, set)):
+        return size + sum(_state_nbytes(v, _seen) for v in value)
+    if hasattr(value, "__dict__"):
+        return size + _state_nbytes(vars(value), _seen)
+    return size
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of SAM3 inference states (image embeddings) under a memory and entry budget."""
+
+    def __init__(self, max_bytes: int, max_entries: int = _MAX_CACHED_STATES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._states: "OrderedDict[str, tuple]" = OrderedDict()  # image hash -> (state, bytes)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Any:
+        """Get the state for an image hash, or None."""
+        with self._lock:
+            entry = self._states.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._states.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, state: Any) -> None:
+        """Store a state, evicting least-recently-used ones over the budget."""
+        size = _state_nbytes(state)
+        if size > self.max_bytes or self.max_entries < 1:
+            return
+        with self._lock:
+            self._states[key] = (state, size)
+            self._states.move_to_end(key)
+            while self.resident_bytes > self.max_bytes or len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._states.values())
+
+    def clear(self) -> None:
+        """Drop all states."""
+        with self._lock:
+            self._states.clear()
+
+    def stats(self) -> dict:
+        """Get hit/miss counters and resident size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._states),
+                "max_entries": self.max_entries,
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+            }
 
 
 class Sam3Processor(BaseProcessor):
     """Text-prompted segmentation using SAM3 (Segment Anything 3)."""
 
-    def __init__(self):
+    def __init__(self, embedding_cache_mb: Optional[int] = None):
+        """
+        Args:
+            embedding_cache_mb: Memory budget for cached image embeddings
+                (default: sam3_embedding_cache_mb setting; 0 disables)
+        """
         self._model = None
         self._processor = None
+        if embedding_cache_mb is None:
+            embedding_cache_mb = load_config().get("sam3_embedding_cache_mb", 512)
+        self._embeddings = EmbeddingCache(int(embedding_cache_mb) * 1024 * 1024)
 
     def process(
         self,
@@ -53,59 +152,177 @@ class Sam3Processor(BaseProcessor):
         if not SAM3_AVAILABLE:
             raise RuntimeError("SAM3 is not installed. Run: pip install sam3")
 
-        # Load model if needed
-        if self._model is None:
-            if status_callback:
-                status_callback("Loading SAM3 model...")
-            print("[SAM3] Loading model...")
-
-            # Setup HF token for authentication
-            hf_token = options.get("hf_token", "") or get_hf_token()
-            if hf_token:
-                print("[SAM3] Setting up Hugging Face authentication...")
-                set_hf_token(hf_token)
-
-            try:
-                self._model = build_sam3_image_model()
-                self._processor = Sam3ProcessorClass(self._model)
-                print("[SAM3] Model loaded successfully")
-            except Exception as e:
-                error_msg = str(e)
-                print(f"[SAM3] Model loading failed: {error_msg}")
-
-                # Check for gated repo error
-                if "403" in error_msg or "gated" in error_msg.lower() or "restricted" in error_msg.lower():
-                    raise RuntimeError(
-                        "SAM3 model access denied. Please:\n"
-                        "1. Request access at huggingface.co/facebook/sam3\n"
-                        "2. Add your HF token via Install SAM3 button\n"
-                        "3. Restart the app"
-                    )
-                raise RuntimeError(f"Failed to load SAM3 model: {e}")
+        if not options.get("prompt", "").strip():
+            raise ValueError("SAM3 requires a text prompt")
 
         # Load image
-        if status_callback:
-            status_callback("Processing with SAM3...")
         print(f"[SAM3] Loading image: {input_path}")
-        image = Image.open(input_path).convert("RGBA")
-        print(f"[SAM3] Image size: {image.size}")
+        with span("decode"):
+            image = load_rgb_array(input_path)
+        print(f"[SAM3] Image size: {image.shape[1]}x{image.shape[0]}")
 
-        # Set image in processor
-        print("[SAM3] Setting image in processor...")
-        inference_state = self._processor.set_image(image.convert("RGB"))
-        print(f"[SAM3] Inference state type: {type(inference_state)}")
+        rgba = self.process_array(image, options, status_callback, Path(input_path))
+        return Image.fromarray(rgba)
+
+    def make_cutout(self, image: np.ndarray, mask: np.ndarray, options: dict) -> np.ndarray:
+        """Apply the mask as alpha, inverted when removing the matched object."""
+        if not options.get("keep_subject", True):
+            # Invert mask to remove the matched object instead
+            mask = 255 - mask
+        return super().make_cutout(image, mask, options)
 
+    def _load_model(
+        self,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> None:
+        """Build the SAM3 model on first use."""
+        if self._model is not None:
+            return
+
+        if status_callback:
+            status_callback("Loading SAM3 model...")
+        print("[SAM3] Loading model...")
+
+        # Setup HF token for authentication
+        hf_token = options.get("hf_token", "") or get_hf_token()
+        if hf_token:
+            print("[SAM3] Setting up Hugging Face authentication...")
+            set_hf_token(hf_token)
+
+        global SAM3_AVAILABLE, SAM3_IMPORT_ERROR
+        try:
+            from sam3.model_builder import build_sam3_image_model
+            from sam3.model.sam3_image_processor import Sam3Processor as Sam3ProcessorClass
+        except Exception as e:
+            # Installed, but broken (e.g. a torch/CUDA mismatch)
+            SAM3_AVAILABLE = False
+            SAM3_IMPORT_ERROR = str(e) if isinstance(e, ImportError) else f"Unexpected error: {e}"
+            raise RuntimeError(f"SAM3 could not be imported: {SAM3_IMPORT_ERROR}") from e
+
+        try:
+            self._model = build_sam3_image_model()
+            self._processor = Sam3ProcessorClass(self._model)
+            print("[SAM3] Model loaded successfully")
+        except Exception as e:
+            error_msg = str(e)
+            print(f"[SAM3] Model loading failed: {error_msg}")
+
+            # Check for gated repo error
+            if "403" in error_msg or "gated" in error_msg.lower() or "restricted" in error_msg.lower():
+                raise RuntimeError(
+                    "SAM3 model access denied. Please:\n"
+                    "1. Request access at huggingface.co/facebook/sam3\n"
+                    "2. Add your HF token via Install SAM3 button\n"
+                    "3. Restart the app"
+                )
+            raise RuntimeError(f"Failed to load SAM3 model: {e}")
+
+    def mask_options(self, options: dict) -> dict:
+        """The prompt selects the mask; keep_subject is applied afterwards."""
+        return {"prompt": options.get("prompt", "").strip()}
+
+    def predict_mask(
+        self,
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> np.ndarray:
+        """Segment the prompted object and return its mask (HxW uint8, image size)."""
         # Get text prompt
         prompt = options.get("prompt", "").strip()
         if not prompt:
             raise ValueError("SAM3 requires a text prompt")
 
+        inference_state = self._inference_state(image, options, status_callback)
+
         if status_callback:
             status_callback(f"Segmenting: {prompt}...")
+        mask = self._mask_for_prompt(inference_state, prompt, image.shape[:2])
+        if mask is None:
+            raise RuntimeError(f"No objects found matching '{prompt}'")
+        return mask
+
+    def predict_prompt_masks(
+        self,
+        image: np.ndarray,
+        prompts: List[str],
+        options: Optional[dict] = None,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Segment several text prompts on one image with a single encoder pass.
+
+        Args:
+            image: HxWx3 uint8 RGB array
+            prompts: Text prompts to segment
+            options: Processing options (hf_token)
+            status_callback: Optional callback for status updates
+
+        Returns:
+            Dict of prompt -> HxW uint8 mask; prompts that match nothing get
+            an all-zero mask
+        """
+        if not SAM3_AVAILABLE:
+            raise RuntimeError("SAM3 is not installed. Run: pip install sam3")
+        prompts = [p.strip() for p in prompts if p.strip()]
+        if not prompts:
+            raise ValueError("SAM3 requires a text prompt")
+
+        inference_state = self._inference_state(image, options or {}, status_callback)
+
+        masks = {}
+        for prompt in prompts:
+            if status_callback:
+                status_callback(f"Segmenting: {prompt}...")
+            mask = self._mask_for_prompt(inference_state, prompt, image.shape[:2])
+            masks[prompt] = mask if mask is not None else np.zeros(image.shape[:2], np.uint8)
+        return masks
+
+    def _inference_state(
+        self,
+        image: np.ndarray,
+        options: dict,
+        status_callback: Optional[Callable[[str], None]] = None
+    ) -> Any:
+        """Get the image's encoder state, from the embedding cache when possible."""
+        if self._model is None:
+            with span("model_load", model="sam3"):
+                self._load_model(options, status_callback)
+
+        key = array_digest(image)
+        inference_state = self._embeddings.get(key)
+        if inference_state is not None:
+            print("[SAM3] Reusing cached image embedding")
+            return inference_state
+
+        if status_callback:
+            status_callback("Processing with SAM3...")
+
+        # Set image in processor
+        print("[SAM3] Setting image in processor...")
+        with span("embedding", model="sam3"):
+            inference_state = self._processor.set_image(Image.fromarray(image))
+        print(f"[SAM3] Inference state type: {type(inference_state)}")
+        self._embeddings.put(key, inference_state)
+        return inference_state
+
+    def _mask_for_prompt(
+        self,
+        inference_state: Any,
+        prompt: str,
+        size: Tuple[int, int]
+    ) -> Optional[np.ndarray]:
+        """Run one text prompt against an encoded image; None if nothing matches."""
+        # Results of an earlier prompt are stored in the state; start clean
+        if hasattr(self._processor, "reset_all_prompts"):
+            self._processor.reset_all_prompts(inference_state)
+
         print(f"[SAM3] Running with prompt: '{prompt}'")
 
         # Run text-based segmentation
-        output = self._processor.set_text_prompt(state=inference_state, prompt=prompt)
+        with span("inference", model="sam3", prompt=prompt):
+            output = self._processor.set_text_prompt(state=inference_state, prompt=prompt)
         print(f"[SAM3] Output keys: {output.keys() if isinstance(output, dict) else type(output)}")
 
         masks = output.get("masks", []) if isinstance(output, dict) else []
@@ -113,7 +330,7 @@ class Sam3Processor(BaseProcessor):
         print(f"[SAM3] Found {len(masks)} masks, {len(scores)} scores")
 
         if len(masks) == 0:
-            raise RuntimeError(f"No objects found matching '{prompt}'")
+            return None
 
         # Use the best scoring mask
         best_idx = 0
@@ -144,27 +361,13 @@ class Sam3Processor(BaseProcessor):
         mask = (mask > 0.5).astype(np.uint8) * 255
 
         # Resize mask to match image if needed
-        if mask.shape[:2] != (image.height, image.width):
+        height, width = size
+        if mask.shape[:2] != (height, width):
             mask_img = Image.fromarray(mask)
-            mask_img = mask_img.resize((image.width, image.height), Image.Resampling.LANCZOS)
-            mask = np.array(mask_img)
+            mask_img = mask_img.resize((width, height), Image.Resampling.LANCZOS)
+            mask = np.asarray(mask_img)
 
-        # Apply mask
-        keep_subject = options.get("keep_subject", True)
-
-        if not keep_subject:
-            # Invert mask to remove the matched object instead
-            mask = 255 - mask
-
-        # Convert original to numpy for processing
-        img_array = np.array(image)
-
-        # Apply mask as alpha channel
-        img_array[:, :, 3] = mask
-
-        result = Image.fromarray(img_array, "RGBA")
-
-        return result
+        return mask
 
     def is_available(self) -> bool:
         """Check if SAM3 is installed."""
@@ -178,9 +381,14 @@ class Sam3Processor(BaseProcessor):
         return SAM3_IMPORT_ERROR
 
     def clear_model(self) -> None:
-        """Clear the cached model (e.g., after token change)."""
+        """Clear the cached model (e.g., after token change) and its embeddings."""
         self._model = None
         self._processor = None
+        self._embeddings.clear()
+
+    def get_embedding_cache_stats(self) -> dict:
+        """Get hit/miss/resident-size stats of the image embedding cache."""
+        return self._embeddings.stats()
 
 
 def is_sam3_available() -> bool:
@@ -0,0 +1,135 @@
+"""
+Session pool - keeps several rembg model sessions resident under a RAM budget.
+
+Sessions are evicted least-recently-used first once the estimated resident size
+of all loaded models exceeds the budget. The most recently requested model is
+always kept, even if it alone is larger than the budget.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Optional
+
+from .ort_session import external_data_files
+
+try:
+    from core.telemetry import span
+except ImportError:
+    from ..core.telemetry import span
+
+
+def estimate_session_bytes(session: Any) -> int:
+    """Estimate a session's resident size from the size of its ONNX weights.
+
+    Graphs from the model store (see ort_session.py) keep their weights in an
+    external-data file next to them; the files the graph refers to count too.
+    """
+    inner = getattr(session, "inner_session", None)
+    model_path = getattr(inner, "_model_path", None)
+    if not model_path or not os.path.exists(model_path):
+        return 0
+    path = Path(model_path)
+    try:
+        data_files = external_data_files(path)
+    except (OSError, ValueError, IndexError):
+        data_files = set()
+    return path.stat().st_size + sum(data.stat().st_size for data in data_files if data.exists())
+
+
+class SessionPool:
+    """Thread-safe LRU cache of model sessions keyed by model name and session settings."""
+
+    def __init__(
+        self,
+        max_bytes: int,
+        loader: Callable[[str], Any],
+        size_estimator: Callable[[Any], int] = estimate_session_bytes,
+        settings_key: Callable[[], Hashable] = lambda: None
+    ):
+        """
+        Args:
+            max_bytes: Budget for the estimated resident size of all sessions
+            loader: Creates a session for a model name (e.g. rembg.new_session)
+            size_estimator: Estimates the resident bytes of a loaded session
+            settings_key: Returns a key for the settings the loader would build
+                a session with right now; a session built under other settings
+                is not reused
+        """
+        self.max_bytes = max_bytes
+        self._loader = loader
+        self._size_estimator = size_estimator
+        self._settings_key = settings_key
+        # (model, settings key) -> (session, bytes)
+        self._sessions: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def get(self, model: str, status_callback: Optional[Callable[[str], None]] = None) -> Any:
+        """Get the session for a model, loading it (and evicting others) if needed."""
+        key = (model, self._settings_key())
+        with self._lock:
+            if key in self._sessions:
+                self._sessions.move_to_end(key)
+                self.hits += 1
+                return self._sessions[key][0]
+
+            self.misses += 1
+            if status_callback:
+                status_callback(f"Loading model: {model}...")
+
+            start = time.perf_counter()
+            # Only real loads are spans; hits cost nothing worth timing
+            with span("model_load", model=model):
+                session = self._loader(model)
+            self.load_seconds += time.perf_counter() - start
+
+            self._sessions[key] = (session, self._size_estimator(session))
+            self._evict_over_budget()
+            return session
+
+    def _evict_over_budget(self) -> None:
+        while len(self._sessions) > 1 and self.resident_bytes > self.max_bytes:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def resident_bytes(self) -> int:
+        return sum(size for _, size in self._sessions.values())
+
+    def set_budget(self, max_bytes: int) -> None:
+        """Change the budget, evicting sessions if the pool is now over it."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict_over_budget()
+
+    def evict(self, model: str) -> None:
+        """Drop one model's sessions."""
+        with self._lock:
+            for key in [key for key in self._sessions if key[0] == model]:
+                del self._sessions[key]
+
+    def clear(self) -> None:
+        """Drop all sessions."""
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        """Get hit/miss counters, total load time and resident size."""
+        with self._lock:
+            return {
+                "models": [model for model, _ in self._sessions],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_seconds": round(self.load_seconds, 3),
+                "resident_bytes": self.resident_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Background Removal Server - long-running HTTP service with dynamic micro-batching.
+
+Concurrent uploads for the same model are grouped into one ONNX run within a
+short window. Model sessions stay warm in a shared pool (see --pool-mb), and
+a bounded queue answers 429 when it is full.
+
+Usage:
+    python server.py --port 8100 --preload birefnet-general
+    curl --data-binary @photo.jpg "http://localhost:8100/remove?model=birefnet-general" -o photo.png
+"""
+
+import argparse
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+import numpy as np
+from PIL import Image
+
+from processors.rembg_processor import (
+    RembgProcessor, configure_session_pool, get_session_pool, rembg_available
+)
+from processors.registry import create_processor, missing_requirements, warm
+from core.constants import REMBG_MODELS, BACKGROUND_OPTIONS, MATTING_METHODS
+from core.microbatch import MicroBatcher, QueueFullError
+from utils.image import load_rgb_array, post_process_cutout
+
+
+settings = {
+    "max_batch_size": 8,
+    "max_wait_ms": 10.0,
+    "max_queue": 64,
+    "preload": [],
+}
+
+# model -> warm processor / batcher (created on the event loop)
+processors: Dict[str, RembgProcessor] = {}
+batchers: Dict[str, MicroBatcher] = {}
+
+# Decode, cutout (matting) and encode off the event loop, separate from the inference threads
+codec_pool = ThreadPoolExecutor(thread_name_prefix="codec")
+
+
+def _make_batch_runner(processor: RembgProcessor, model: str):
+    """Build the blocking batch function for one model's batcher.
+
+    It only predicts masks: matting can take seconds per image, and the next
+    batch's model run would wait behind it, so cutouts are made in codec_pool.
+    """
+    def run(images: List[np.ndarray]) -> List[np.ndarray]:
+        return processor.predict_masks(images, model)
+    return run
+
+
+def get_batcher(model: str) -> MicroBatcher:
+    """Get the batcher for a model; its session comes from the shared pool."""
+    if model not in batchers:
+        processor = create_processor("rembg")
+        processors[model] = processor
+        batcher = MicroBatcher(
+            _make_batch_runner(processor, model),
+            max_batch_size=settings["max_batch_size"],
+            max_wait_ms=settings["max_wait_ms"],
+            max_queue=settings["max_queue"],
+            name=model,
+        )
+        batcher.start()
+        batchers[model] = batcher
+    return batchers[model]
+
+
+def _decode(data: bytes) -> np.ndarray:
+    return load_rgb_array(io.BytesIO(data))
+
+
+def _encode(processor: RembgProcessor, image: np.ndarray, mask: np.ndarray, options: dict, background: str) -> bytes:
+    cutout = processor.make_cutout(image, mask, options)
+    image = Image.fromarray(post_process_cutout(cutout, bg_color=BACKGROUND_OPTIONS[background][1]))
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    missing = missing_requirements("rembg")
+    if missing:
+        # Every /remove would fail; don't come up looking healthy
+        raise RuntimeError(f"The server needs {', '.join(missing)}. Run: pip install {' '.join(missing)}")
+    # Models run on the batchers' threads, so rembg must be imported here first
+    # (see processors/registry.py)
+    warm("rembg")
+    for model in settings["preload"]:
+        get_batcher(model)
+        # Load the session now so the first request doesn't pay for it. This
+        # stays on the main thread too; nothing is served before startup ends.
+        processors[model].load_model(model)
+        print(f"[OK] Model ready: {model}")
+    yield
+    for batcher in batchers.values():
+        await batcher.stop()
+    codec_pool.shutdown(wait=False)
+
+
+app = FastAPI(title="AI Toolkit Background Removal Server", lifespan=lifespan)
+
+
+@app.post("/remove")
+async def remove(
+    request: Request,
+    model: str = "birefnet-general",
+    background: str = "transparent",
+    alpha_matting: bool = False,
+    alpha_matting_foreground_threshold: int = 240,
+    alpha_matting_background_threshold: int = 10,
+    alpha_matting_erode_size: int = 10,
+    alpha_matting_method: str = "closed-form",
+):
+    """Remove the background from the raw image bytes in the request body."""
+    if model not in REMBG_MODELS:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {model}")
+    if background not in BACKGROUND_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown background: {background}")
+    if alpha_matting_method not in MATTING_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown matting method: {alpha_matting_method}")
+
+    data = await request.body()
+    if not data:
+        raise HTTPException(status_code=400, detail="Request body must contain image bytes")
+
+    loop = asyncio.get_running_loop()
+    try:
+        image = await loop.run_in_executor(codec_pool, _decode, data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Could not decode image: {e}")
+
+    options = {
+        "alpha_matting": alpha_matting,
+        "alpha_matting_foreground_threshold": alpha_matting_foreground_threshold,
+        "alpha_matting_background_threshold": alpha_matting_background_threshold,
+        "alpha_matting_erode_size": alpha_matting_erode_size,
+        "alpha_matting_method": alpha_matting_method,
+    }
+
+    try:
+        mask = await get_batcher(model).submit(image)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+    png = await loop.run_in_executor(codec_pool, _encode, processors[model], image, mask, options, background)
+    return Response(content=png, media_type="image/png")
+
+
+@app.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "models": {model: batcher.stats() for model, batcher in batchers.items()},
+        "sessions": get_session_pool().stats() if rembg_available else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run Background Removal Server")
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address")
+    parser.add_argument("--port", type=int, default=8100, help="Port to run on")
+    parser.add_argument("--preload", nargs="*", default=["birefnet-general"],
+                        choices=REMBG_MODELS.keys(), help="Models to load at startup")
+    parser.add_argument("--max-batch", type=int, default=8, help="Largest batch per model run")
+    parser.add_argument("--max-wait-ms", type=float, default=10.0,
+                        help="How long a request waits for others to batch with")
+    parser.add_argument("--max-queue", type=int, default=64,
+                        help="Waiting requests per model before answering 429")
+    parser.add_argument("--pool-mb", type=int, default=None,
+                        help="RAM budget for resident model sessions")
+    args = parser.parse_args()
+
+    if args.pool_mb:
+        configure_session_pool(args.pool_mb)
+
+    settings.update({
+        "max_batch_size": args.max_batch,
+        "max_wait_ms": args.max_wait_ms,
+        "max_queue": args.max_queue,
+        "preload": args.preload,
+    })
+
+    print(f"🚀 Background removal server running at http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port)
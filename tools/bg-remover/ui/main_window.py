@@ -6,37 +6,45 @@ import os
 import sys
 import re
 import threading
+import time
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Union
 
 import tkinter as tk
 from tkinter import ttk, filedialog
 from tkinterdnd2 import DND_FILES, TkinterDnD
+import numpy as np
 from PIL import Image, ImageTk
 
 try:
     from core.constants import (
-        REMBG_MODELS, SUFFIX_OPTIONS, BACKGROUND_OPTIONS,
+        REMBG_MODELS, SUFFIX_OPTIONS, BACKGROUND_OPTIONS, MATTING_METHODS,
         VALID_EXTENSIONS, WINDOW_WIDTH, WINDOW_HEIGHT,
         MIN_WINDOW_WIDTH, MIN_WINDOW_HEIGHT, PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT
     )
     from core.config import load_config, save_config, set_hf_token, get_hf_token
-    from processors.rembg_processor import RembgProcessor
-    from processors.sam3_processor import Sam3Processor, is_sam3_available, get_sam3_import_error
+    from core.pipeline import BulkPipeline, format_utilisation
+    from core.manifest import BATCH_MANIFEST_NAME, JobManifest, input_signature
+    from core.telemetry import configure_telemetry, format_summary, load_spans, span, summarize, write_chrome_trace
+    from processors.registry import create_processor, is_backend_available, missing_requirements, warm
     from utils.gpu import check_nvidia_gpu
-    from utils.image import auto_crop_image, add_sticker_outline, create_checkerboard_preview, apply_background_color
+    from utils.hashing import file_digest, settings_digest
+    from utils.image import create_checkerboard_preview, load_rgb_array, post_process_cutout
     from ui.dialogs import show_sam3_install_dialog, show_hf_token_dialog, run_sam3_installation
 except ImportError:
     from ..core.constants import (
-        REMBG_MODELS, SUFFIX_OPTIONS, BACKGROUND_OPTIONS,
+        REMBG_MODELS, SUFFIX_OPTIONS, BACKGROUND_OPTIONS, MATTING_METHODS,
         VALID_EXTENSIONS, WINDOW_WIDTH, WINDOW_HEIGHT,
         MIN_WINDOW_WIDTH, MIN_WINDOW_HEIGHT, PREVIEW_MAX_WIDTH, PREVIEW_MAX_HEIGHT
     )
     from ..core.config import load_config, save_config, set_hf_token, get_hf_token
-    from ..processors.rembg_processor import RembgProcessor
-    from ..processors.sam3_processor import Sam3Processor, is_sam3_available, get_sam3_import_error
+    from ..core.pipeline import BulkPipeline, format_utilisation
+    from ..core.manifest import BATCH_MANIFEST_NAME, JobManifest, input_signature
+    from ..core.telemetry import configure_telemetry, format_summary, load_spans, span, summarize, write_chrome_trace
+    from ..processors.registry import create_processor, is_backend_available, missing_requirements, warm
     from ..utils.gpu import check_nvidia_gpu
-    from ..utils.image import auto_crop_image, add_sticker_outline, create_checkerboard_preview, apply_background_color
+    from ..utils.hashing import file_digest, settings_digest
+    from ..utils.image import create_checkerboard_preview, load_rgb_array, post_process_cutout
     from .dialogs import show_sam3_install_dialog, show_hf_token_dialog, run_sam3_installation
 
 
@@ -52,21 +60,41 @@ class BackgroundRemoverApp:
         # Load config
         self.config = load_config()
 
+        # Per-stage timing spans (telemetry_file / trace_file settings)
+        self.telemetry_run_id = None
+        if self.config.get("telemetry_file"):
+            self.telemetry_run_id = configure_telemetry(
+                self.config["telemetry_file"], memory=self.config.get("telemetry_memory", False)
+            )
+
         # Initialize processors
-        self.rembg_processor = RembgProcessor()
-        self.sam3_processor = Sam3Processor()
+        # (SAM3's module is only imported once SAM3 mode is used)
+        self.rembg_processor = create_processor("rembg")
+        self._sam3_processor = None
 
         # Processing state
         self.processing = False
         self.current_image_path: Optional[str] = None
-        self.image_queue: List[str] = []
         self.bulk_processing = False
         self.last_result_image: Optional[Image.Image] = None
 
+        # Raw processor output of the current image, kept so post-processing
+        # changes (crop, sticker, background) re-run without inference
+        self.last_cutout: Optional[Image.Image] = None
+        self.last_cutout_options: Optional[dict] = None
+        self.last_output_path: Optional[Path] = None
+        self._post_processing_job = None
+        # A settings change arrived while a result was being processed
+        self._post_processing_pending = False
+
         # Bulk processing stats
         self.bulk_total = 0
         self.bulk_completed = 0
         self.bulk_errors = 0
+        self.bulk_pipeline: Optional[BulkPipeline] = None
+        self.bulk_manifest: Optional[JobManifest] = None
+        self.bulk_settings_hash = ""
+        self.bulk_suffix = "_nobg"
 
         # Setup UI
         self._setup_ui()
@@ -74,6 +102,13 @@ class BackgroundRemoverApp:
         # Bind close event
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
 
+    @property
+    def sam3_processor(self):
+        """The SAM3 processor, created on first use."""
+        if self._sam3_processor is None:
+            self._sam3_processor = create_processor("sam3")
+        return self._sam3_processor
+
     def _setup_ui(self):
         """Setup the user interface."""
         # Main container
@@ -196,7 +231,7 @@ class BackgroundRemoverApp:
         sam3_row = ttk.Frame(mode_frame)
         sam3_row.pack(fill=tk.X, anchor=tk.W)
 
-        sam3_available = is_sam3_available()
+        sam3_available = is_backend_available("sam3")
         self.sam3_radio = ttk.Radiobutton(
             sam3_row,
             text="SAM3 Text Prompt - Segment by description",
@@ -265,7 +300,7 @@ class BackgroundRemoverApp:
         ).pack(anchor=tk.W)
 
         # Show if SAM3 mode is active
-        if self.config.get("use_sam3") and is_sam3_available():
+        if self.config.get("use_sam3") and is_backend_available("sam3"):
             self.sam3_frame.pack(fill=tk.X, pady=5)
 
     def _setup_settings(self, parent):
@@ -334,7 +369,7 @@ class BackgroundRemoverApp:
             width=15
         )
         self.bg_combo.pack(side=tk.LEFT, padx=(10, 0))
-        self.bg_combo.bind("<<ComboboxSelected>>", self._on_setting_change)
+        self.bg_combo.bind("<<ComboboxSelected>>", self._on_background_change)
 
         # Background preview
         bg_color = BACKGROUND_OPTIONS.get(self.config.get("background", "transparent"), (None, None))[1]
@@ -385,7 +420,8 @@ class BackgroundRemoverApp:
         self.margin_var = tk.IntVar(value=self.config.get("auto_crop_margin", 10))
         ttk.Scale(
             margin_frame, from_=0, to=100,
-            variable=self.margin_var, orient=tk.HORIZONTAL, length=150
+            variable=self.margin_var, orient=tk.HORIZONTAL, length=150,
+            command=self._on_post_processing_change
         ).pack(side=tk.LEFT, padx=10)
         ttk.Label(margin_frame, textvariable=self.margin_var, width=4).pack(side=tk.LEFT)
 
@@ -407,7 +443,20 @@ class BackgroundRemoverApp:
         self._setup_sticker_settings()
 
     def _setup_alpha_sliders(self):
-        """Setup alpha matting sliders."""
+        """Setup alpha matting method and sliders."""
+        # Method
+        method_frame = ttk.Frame(self.alpha_settings_frame)
+        method_frame.pack(fill=tk.X, pady=2)
+        ttk.Label(method_frame, text="Method:").pack(side=tk.LEFT)
+        self.alpha_method_var = tk.StringVar(value=self.config.get("alpha_matting_method", "closed-form"))
+        ttk.Combobox(
+            method_frame,
+            textvariable=self.alpha_method_var,
+            values=list(MATTING_METHODS),
+            state="readonly",
+            width=12
+        ).pack(side=tk.LEFT, padx=(10, 0))
+
         # FG threshold
         fg_frame = ttk.Frame(self.alpha_settings_frame)
         fg_frame.pack(fill=tk.X, pady=2)
@@ -450,7 +499,8 @@ class BackgroundRemoverApp:
         self.sticker_width_var = tk.IntVar(value=self.config.get("sticker_width", 5))
         ttk.Scale(
             width_frame, from_=1, to=20,
-            variable=self.sticker_width_var, orient=tk.HORIZONTAL, length=150
+            variable=self.sticker_width_var, orient=tk.HORIZONTAL, length=150,
+            command=self._on_post_processing_change
         ).pack(side=tk.LEFT, padx=10)
         ttk.Label(width_frame, textvariable=self.sticker_width_var, width=4).pack(side=tk.LEFT)
 
@@ -532,8 +582,9 @@ class BackgroundRemoverApp:
         ).pack(side=tk.LEFT)
 
         # SAM3 status
-        sam3_available = is_sam3_available()
-        sam3_error = get_sam3_import_error()
+        sam3_missing = missing_requirements("sam3")
+        sam3_available = not sam3_missing
+        sam3_error = f"No module named '{sam3_missing[0]}'" if sam3_missing else None
 
         if sam3_available:
             sam3_status = "SAM3: Ready"
@@ -640,6 +691,11 @@ class BackgroundRemoverApp:
     def _load_image(self, file_path: str):
         path = Path(file_path)
 
+        if self.bulk_processing:
+            # The bulk run owns the processor and current_image_path until it finishes
+            self.status_var.set("Bulk processing is running - drop the image again when it finishes")
+            return
+
         if not path.exists():
             self.status_var.set("Error: File not found")
             return
@@ -650,6 +706,7 @@ class BackgroundRemoverApp:
 
         self.current_image_path = file_path
         self.last_result_image = None
+        self.last_cutout = None
 
         try:
             img = Image.open(file_path)
@@ -712,9 +769,13 @@ class BackgroundRemoverApp:
     def _on_model_change(self, event=None):
         model = self.model_var.get()
         self.model_desc_var.set(REMBG_MODELS.get(model, ""))
-        self.rembg_processor.clear_session()
+        # Sessions stay resident in the shared pool, so switching back is free
         self._save_current_config()
 
+    def _on_background_change(self, event=None):
+        self._on_setting_change(event)
+        self._on_post_processing_change()
+
     def _on_setting_change(self, event=None):
         # Update background preview
         bg_choice = self.bg_color_var.get()
@@ -741,6 +802,7 @@ class BackgroundRemoverApp:
         else:
             self.autocrop_settings_frame.pack_forget()
         self._save_current_config()
+        self._on_post_processing_change()
 
     def _on_sticker_toggle(self):
         if self.sticker_var.get():
@@ -748,11 +810,13 @@ class BackgroundRemoverApp:
         else:
             self.sticker_settings_frame.pack_forget()
         self._save_current_config()
+        self._on_post_processing_change()
 
     def _set_sticker_color(self, color: str):
         self.sticker_color_var.set(color)
         self.sticker_color_preview.config(bg=color)
         self._save_current_config()
+        self._on_post_processing_change()
 
     def _choose_sticker_color(self):
         from tkinter import colorchooser
@@ -776,7 +840,8 @@ class BackgroundRemoverApp:
             save_config(self.config)
             if token:
                 set_hf_token(token)
-                self.sam3_processor.clear_model()
+                if self._sam3_processor is not None:
+                    self._sam3_processor.clear_model()
             self.status_var.set("Token saved. Restart may be required.")
 
         show_hf_token_dialog(self.root, self.config, on_save)
@@ -796,22 +861,36 @@ class BackgroundRemoverApp:
         self.process_btn.config(state=tk.DISABLED)
         self.progress.start(10)
         self.status_var.set("Processing... (first run downloads model)")
-
-        thread = threading.Thread(target=self._process_image_thread)
+        self._warm_backend()
+
+        input_path = Path(self.current_image_path)
+        suffix = self.suffix_var.get() or "_nobg"
+        thread = threading.Thread(target=self._process_image_thread, args=(
+            input_path,
+            input_path.parent / f"{input_path.stem}{suffix}.png",
+            self.mode_var.get() == "sam3",
+            self._build_processing_options(),
+            self._post_processing_settings(),
+        ))
         thread.daemon = True
         thread.start()
 
-    def _process_image_thread(self):
+    def _warm_backend(self):
+        """Import the selected backend's packages here on the Tk thread, before a worker uses them."""
+        self.root.update_idletasks()
+        warm("sam3" if self.mode_var.get() == "sam3" else "rembg")
+
+    def _process_image_thread(
+        self,
+        input_path: Path,
+        output_path: Path,
+        use_sam3: bool,
+        options: dict,
+        settings: dict
+    ):
         try:
-            input_path = Path(self.current_image_path)
-            suffix = self.suffix_var.get() or "_nobg"
-            output_path = input_path.parent / f"{input_path.stem}{suffix}.png"
-
-            # Build options
-            options = self._build_processing_options()
-
             # Process
-            if self.mode_var.get() == "sam3":
+            if use_sam3:
                 result = self.sam3_processor.process(
                     input_path, output_path, options,
                     lambda msg: self.root.after(0, lambda: self.status_var.set(msg))
@@ -822,16 +901,9 @@ class BackgroundRemoverApp:
                     lambda msg: self.root.after(0, lambda: self.status_var.set(msg))
                 )
 
-            # Post-process
-            result = self._apply_post_processing(result)
+            self._save_post_processed(result, output_path, settings)
 
-            # Apply background and save
-            bg_choice = self.bg_color_var.get()
-            bg_color = BACKGROUND_OPTIONS.get(bg_choice, (None, None))[1]
-            final = apply_background_color(result, bg_color)
-            final.save(output_path, "PNG")
-
-            self.root.after(0, lambda: self._on_process_complete(output_path))
+            self.root.after(0, lambda: self._on_image_processed(output_path, result, options))
 
         except Exception as e:
             import traceback
@@ -840,6 +912,63 @@ class BackgroundRemoverApp:
             traceback.print_exc()
             self.root.after(0, lambda err=error_msg: self._on_process_error(err))
 
+    def _save_post_processed(
+        self,
+        cutout: Union[Image.Image, np.ndarray],
+        output_path: Path,
+        settings: dict
+    ) -> None:
+        """Apply crop/sticker/background (see _post_processing_settings()) to a processor result and save it."""
+        with span("post_process"):
+            final = Image.fromarray(self._apply_post_processing(cutout, settings))
+        with span("encode"):
+            final.save(output_path, "PNG")
+
+    def _on_post_processing_change(self, event=None):
+        """Re-run post-processing on the last result shortly after settings settle."""
+        if self._post_processing_job is not None:
+            self.root.after_cancel(self._post_processing_job)
+        self._post_processing_job = self.root.after(150, self._reapply_post_processing)
+
+    def _reapply_post_processing(self):
+        self._post_processing_job = None
+        self._save_current_config()
+
+        if self.processing:
+            # Picked up again by _on_process_complete()
+            self._post_processing_pending = True
+            return
+
+        # Only valid while the model inputs are unchanged; otherwise the user
+        # re-processes (which then hits the mask cache)
+        if (self.last_cutout is None or self.bulk_processing
+                or self.last_cutout_options != self._build_processing_options()):
+            return
+
+        self.processing = True
+        self.process_btn.config(state=tk.DISABLED)
+        self.status_var.set("Updating result...")
+
+        thread = threading.Thread(
+            target=self._reapply_post_processing_thread,
+            args=(self.last_cutout, self.last_output_path, self._post_processing_settings())
+        )
+        thread.daemon = True
+        thread.start()
+
+    def _reapply_post_processing_thread(
+        self,
+        cutout: Union[Image.Image, np.ndarray],
+        output_path: Path,
+        settings: dict
+    ):
+        try:
+            self._save_post_processed(cutout, output_path, settings)
+            self.root.after(0, lambda: self._on_process_complete(output_path))
+        except Exception as e:
+            error_msg = str(e) if str(e) else type(e).__name__
+            self.root.after(0, lambda err=error_msg: self._on_process_error(err))
+
     def _build_processing_options(self) -> dict:
         """Build options dict for processors."""
         return {
@@ -848,32 +977,47 @@ class BackgroundRemoverApp:
             "alpha_matting_foreground_threshold": self.fg_threshold_var.get(),
             "alpha_matting_background_threshold": self.bg_threshold_var.get(),
             "alpha_matting_erode_size": self.erode_var.get(),
+            "alpha_matting_method": self.alpha_method_var.get(),
             "prompt": self.prompt_var.get().strip(),
             "keep_subject": self.keep_subject_var.get(),
             "hf_token": self.config.get("hf_token", ""),
         }
 
-    def _apply_post_processing(self, image: Image.Image) -> Image.Image:
-        """Apply post-processing effects (crop, sticker)."""
-        result = image
-
-        # Auto-crop
-        if self.autocrop_var.get():
-            margin = self.margin_var.get()
-            result = auto_crop_image(result, margin)
-
-        # Sticker mode
-        if self.sticker_var.get():
-            width = self.sticker_width_var.get()
-            color_hex = self.sticker_color_var.get()
+    def _post_processing_settings(self) -> dict:
+        """Snapshot the post-processing settings on the Tk thread, to hand to a worker thread."""
+        color_hex = self.sticker_color_var.get()
+        return {
+            "auto_crop": self.autocrop_var.get(),
+            "margin": self.margin_var.get(),
+            "sticker": self.sticker_var.get(),
+            "sticker_width": self.sticker_width_var.get(),
             # Convert hex to RGB
-            color = tuple(int(color_hex.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
-            result = add_sticker_outline(result, width, color)
+            "sticker_color": tuple(int(color_hex.lstrip('#')[i:i+2], 16) for i in (0, 2, 4)),
+            "background": BACKGROUND_OPTIONS.get(self.bg_color_var.get(), (None, None))[1],
+        }
+
+    def _apply_post_processing(self, image: Union[Image.Image, np.ndarray], settings: dict) -> np.ndarray:
+        """Apply post-processing effects (crop, sticker, background) in one fused pass."""
+        return post_process_cutout(
+            image,
+            crop_margin=settings["margin"] if settings["auto_crop"] else None,
+            outline_width=settings["sticker_width"] if settings["sticker"] else 0,
+            outline_color=settings["sticker_color"],
+            bg_color=settings["background"]
+        )
 
-        return result
+    def _on_image_processed(self, output_path: Path, cutout: Union[Image.Image, np.ndarray], options: dict):
+        """Keep a new processor result for re-applying post-processing, then finish as usual."""
+        self.last_cutout = cutout
+        self.last_cutout_options = options
+        self.last_output_path = output_path
+        self._on_process_complete(output_path)
 
     def _on_process_complete(self, output_path: Path):
         self.processing = False
+        if self._post_processing_pending:
+            self._post_processing_pending = False
+            self._on_post_processing_change()
         self.progress.stop()
         self.process_btn.config(state=tk.NORMAL)
         self.status_var.set(f"Saved: {output_path.name}")
@@ -909,20 +1053,57 @@ class BackgroundRemoverApp:
     # Bulk processing
 
     def _start_bulk_processing(self, file_paths: List[str]):
+        if self.bulk_processing:
+            self.status_var.set("Bulk processing already running - drop more images when it finishes")
+            return
+        if self.processing:
+            self.status_var.set("Still processing the current image - drop the images again when it finishes")
+            return
+
         if self.mode_var.get() == "sam3":
             if not self.prompt_var.get().strip():
                 self.status_var.set(f"Enter a SAM3 prompt first, then drop {len(file_paths)} images")
-                self.image_queue = file_paths
                 return
 
-        self.image_queue = file_paths.copy()
+        processor = self.sam3_processor if self.mode_var.get() == "sam3" else self.rembg_processor
+        options = self._build_processing_options()
+        settings = self._post_processing_settings()
+        suffix = self.suffix_var.get() or "_nobg"
+
+        def output_for(input_path: Path) -> Path:
+            return input_path.parent / f"{input_path.stem}{suffix}.png"
+
+        # Images an earlier run already finished with these settings, and that
+        # haven't changed since, are skipped; the log sits next to the images
+        manifest = JobManifest(Path(file_paths[0]).parent / BATCH_MANIFEST_NAME)
+        settings_hash = settings_digest({
+            "processor": processor.get_name(),
+            "suffix": suffix,
+            **{k: v for k, v in options.items() if k != "hf_token"},
+            **settings,
+        })
+        pending = [fp for fp in file_paths if not manifest.is_done(fp, output_for(Path(fp)), settings_hash)]
+        skipped = len(file_paths) - len(pending)
+        if not pending:
+            self.status_var.set(f"All {skipped} images were already processed with these settings")
+            return
+        file_paths = pending
+        manifest.compact()
+        self.bulk_manifest = manifest
+        self.bulk_settings_hash = settings_hash
+        self.bulk_suffix = suffix
+
         self.bulk_processing = True
+        self.processing = True
         self.bulk_total = len(file_paths)
         self.bulk_completed = 0
         self.bulk_errors = 0
 
         self.process_btn.config(state=tk.DISABLED)
-        self.status_var.set(f"Bulk processing: 0/{self.bulk_total} images...")
+        self.status_var.set(
+            f"Bulk processing: 0/{self.bulk_total} images..."
+            + (f" ({skipped} already done)" if skipped else "")
+        )
 
         # Hide preview container, show drop label for bulk progress
         self.preview_container.pack_forget()
@@ -930,68 +1111,68 @@ class BackgroundRemoverApp:
         self.drop_label.pack(expand=True, fill=tk.BOTH)
 
         self.progress.start(10)
-        self._process_next_in_queue()
+        self._warm_backend()
 
-    def _process_next_in_queue(self):
-        if not self.image_queue:
-            self._on_bulk_complete()
-            return
-
-        if self.processing:
-            self.root.after(100, self._process_next_in_queue)
-            return
-
-        file_path = self.image_queue.pop(0)
-        self.current_image_path = file_path
-
-        self.status_var.set(f"Processing: {Path(file_path).name} ({self.bulk_completed + 1}/{self.bulk_total})")
-        self.drop_label.config(text=f"Processing {self.bulk_total} images...\n\n{self.bulk_completed}/{self.bulk_total} completed")
-
-        self.processing = True
-        thread = threading.Thread(target=self._process_bulk_image_thread, args=(file_path,))
-        thread.daemon = True
-        thread.start()
-
-    def _process_bulk_image_thread(self, file_path: str):
-        try:
+        # Stages run on separate threads, so each tags its spans with the image
+        def decode(file_path: str):
             input_path = Path(file_path)
-            suffix = self.suffix_var.get() or "_nobg"
-            output_path = input_path.parent / f"{input_path.stem}{suffix}.png"
-
-            options = self._build_processing_options()
-
-            if self.mode_var.get() == "sam3":
-                result = self.sam3_processor.process(input_path, output_path, options)
-            else:
-                result = self.rembg_processor.process(input_path, output_path, options)
-
-            result = self._apply_post_processing(result)
-
-            bg_choice = self.bg_color_var.get()
-            bg_color = BACKGROUND_OPTIONS.get(bg_choice, (None, None))[1]
-            final = apply_background_color(result, bg_color)
-            final.save(output_path, "PNG")
-
-            self.bulk_completed += 1
-            self.root.after(0, self._on_bulk_item_complete)
+            start = time.perf_counter()
+            # Before decoding, so a file replaced mid-run is not recorded as done
+            signature = input_signature(input_path)
+            with span("decode", image=file_path):
+                image = load_rgb_array(input_path)
+            return input_path, start, signature, image
+
+        def infer(item):
+            input_path, start, signature, image = item
+            with span("mask", image=str(input_path)):
+                mask = processor.get_mask(input_path, image, options)
+            return input_path, start, signature, image, mask
+
+        def encode(item):
+            input_path, start, signature, image, mask = item
+            output_path = output_for(input_path)
+            with span("finish", image=str(input_path)):
+                with span("matting" if options.get("alpha_matting") else "cutout"):
+                    cutout = processor.make_cutout(image, mask, options)
+                self._save_post_processed(cutout, output_path, settings)
+            # Seconds include time queued between stages
+            return output_path, time.perf_counter() - start, file_digest(output_path), signature
+
+        self.current_image_path = file_paths[0]
+        self.bulk_pipeline = BulkPipeline(decode, infer, encode)
+        self.bulk_pipeline.start(
+            file_paths,
+            lambda file_path, result, error: self.root.after(
+                0, lambda: self._on_bulk_item_done(file_path, result, error)
+            ),
+            lambda stats: self.root.after(0, lambda: self._on_bulk_complete(stats))
+        )
 
-        except Exception as e:
+    def _on_bulk_item_done(self, file_path: str, result: Optional[tuple], error: Optional[Exception]):
+        self.bulk_completed += 1
+        if error is not None:
             self.bulk_errors += 1
-            self.bulk_completed += 1
-            self.root.after(0, lambda: self._on_bulk_item_error(file_path, str(e)))
+            print(f"Error processing {file_path}: {error}")
+            input_path = Path(file_path)
+            self.bulk_manifest.record(
+                input_path, input_path.parent / f"{input_path.stem}{self.bulk_suffix}.png",
+                self.bulk_settings_hash, error=error
+            )
+        else:
+            output_path, seconds, output_hash, (input_stat, input_hash) = result
+            self.bulk_manifest.record(
+                file_path, output_path, self.bulk_settings_hash,
+                seconds=seconds, output_hash=output_hash, input_hash=input_hash, input_stat=input_stat
+            )
 
-    def _on_bulk_item_complete(self):
-        self.processing = False
+        self.status_var.set(f"Bulk processing: {self.bulk_completed}/{self.bulk_total} images...")
         self.drop_label.config(text=f"Processing {self.bulk_total} images...\n\n{self.bulk_completed}/{self.bulk_total} completed")
-        self._process_next_in_queue()
-
-    def _on_bulk_item_error(self, file_path: str, error: str):
-        self.processing = False
-        print(f"Error processing {file_path}: {error}")
-        self._process_next_in_queue()
 
-    def _on_bulk_complete(self):
+    def _on_bulk_complete(self, stats: dict):
         self.bulk_processing = False
+        self.bulk_pipeline = None
+        self.bulk_manifest.close()
         self.processing = False
         self.progress.stop()
         self.process_btn.config(state=tk.NORMAL)
@@ -1001,10 +1182,30 @@ class BackgroundRemoverApp:
         else:
             msg = f"Completed: {self.bulk_total} images processed successfully!"
 
+        # Shows which stage limits throughput (the busiest one)
+        utilisation = format_utilisation(stats)
+        print(f"Bulk processing took {stats['elapsed']:.1f}s - stage utilisation: {utilisation}")
+        self._report_telemetry()
+
         self.status_var.set(msg)
-        self.drop_label.config(text=f"Done!\n\n{msg}\n\nDrop more images to continue")
+        self.drop_label.config(text=f"Done!\n\n{msg}\n\nStage utilisation: {utilisation}\n\nDrop more images to continue")
         self.current_image_path = None
 
+    def _report_telemetry(self):
+        """Print the per-stage summary of the spans recorded so far and write the trace file."""
+        if not self.telemetry_run_id:
+            return
+        spans = load_spans(self.config["telemetry_file"], self.telemetry_run_id)
+        if not spans:
+            return
+        print(format_summary(summarize(spans)))
+        trace_file = self.config.get("trace_file")
+        if trace_file:
+            try:
+                write_chrome_trace(spans, trace_file)
+            except OSError as e:
+                print(f"Could not write trace file: {e}")
+
     def _open_output_folder(self):
         if self.current_image_path:
             folder = Path(self.current_image_path).parent
@@ -1027,6 +1228,7 @@ class BackgroundRemoverApp:
             "alpha_matting_fg_threshold": self.fg_threshold_var.get(),
             "alpha_matting_bg_threshold": self.bg_threshold_var.get(),
             "alpha_matting_erode_size": self.erode_var.get(),
+            "alpha_matting_method": self.alpha_method_var.get(),
             "use_sam3": self.mode_var.get() == "sam3",
             "sam3_prompt": self.prompt_var.get(),
             "sam3_keep_subject": self.keep_subject_var.get(),
@@ -1039,7 +1241,10 @@ class BackgroundRemoverApp:
         save_config(self.config)
 
     def _on_close(self):
+        if self.bulk_pipeline is not None:
+            self.bulk_pipeline.cancel()
         self._save_current_config()
+        configure_telemetry(None)
         self.root.destroy()
 
     def run(self):
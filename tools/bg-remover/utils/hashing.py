@@ -0,0 +1,72 @@
+"""
+Content hashing utilities - stable digests for files and settings, and a
+perceptual hash for finding near-identical images.
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+
+def bytes_digest(data: bytes) -> str:
+    """Get a hex digest of a byte string."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """Get a hex digest of a file's contents, reading it in chunks."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_digest(settings: dict) -> str:
+    """Get a hex digest of a JSON-serialisable settings dict (key order independent)."""
+    encoded = json.dumps(settings, sort_keys=True, default=str).encode("utf-8")
+    return bytes_digest(encoded)
+
+
+def array_digest(array: np.ndarray) -> str:
+    """Get a hex digest of an array's shape, dtype and contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{array.shape}{array.dtype}".encode("utf-8"))
+    digest.update(memoryview(np.ascontiguousarray(array)).cast("B"))
+    return digest.hexdigest()
+
+
+def _dct_matrix(size: int) -> np.ndarray:
+    """Rows of the (unnormalised) DCT-II basis."""
+    k = np.arange(size)[:, np.newaxis]
+    i = np.arange(size)[np.newaxis, :]
+    return np.cos(np.pi * (2 * i + 1) * k / (2 * size))
+
+
+PERCEPTUAL_HASH_SIDE = 32
+_DCT = _dct_matrix(PERCEPTUAL_HASH_SIDE)
+
+
+def perceptual_hash(gray: np.ndarray) -> int:
+    """
+    Get a 64-bit perceptual hash (pHash) of a greyscale image.
+
+    The image's lowest 8x8 DCT frequencies are compared with their median, so
+    recompression, small offsets and resizing flip few bits; the Hamming
+    distance between two hashes measures how different the images look.
+
+    Args:
+        gray: PERCEPTUAL_HASH_SIDE x PERCEPTUAL_HASH_SIDE greyscale pixels
+    """
+    coeffs = (_DCT @ gray.astype(np.float64) @ _DCT.T)[:8, :8].ravel()
+    # The DC term is the overall brightness, not structure
+    bits = coeffs > np.median(coeffs[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count("1")
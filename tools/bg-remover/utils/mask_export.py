@@ -0,0 +1,143 @@
+"""
+Mask export - compact encodings of alpha masks for dataset building, and a
+tar stream that collects many outputs into one file.
+
+Formats (see OUTPUT_FORMATS in core/constants.py):
+
+- ``mask``: 8-bit greyscale PNG, a quarter of an RGBA PNG's pixels
+- ``mask-1bit``: 1-bit PNG of the mask thresholded at 50%
+- ``rle``: COCO-style compressed RLE JSON, ``{"size": [h, w], "counts": "..."}``,
+  readable with pycocotools' ``mask.decode``
+"""
+
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from typing import BinaryIO, Optional
+
+import numpy as np
+from PIL import Image
+
+
+# Mask values at or above this count as foreground in 1-bit and RLE output
+MASK_THRESHOLD = 128
+
+
+def _rle_string(runs: np.ndarray) -> str:
+    """pycocotools' compressed counts string: run-length deltas in 5-bit groups, as printable characters."""
+    counts = runs.tolist()
+    chars = []
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1f
+            x >>= 5
+            more = x != -1 if c & 0x10 else x != 0
+            if more:
+                c |= 0x20
+            chars.append(chr(c + 48))
+    return "".join(chars)
+
+
+def coco_rle(mask: np.ndarray, threshold: int = MASK_THRESHOLD) -> dict:
+    """
+    Run-length encode a mask the way COCO does.
+
+    Runs go down the columns (column-major) and alternate background and
+    foreground, starting with background.
+
+    Args:
+        mask: HxW uint8 mask
+        threshold: Lowest foreground value
+
+    Returns:
+        ``{"size": [height, width], "counts": compressed counts string}``
+    """
+    height, width = mask.shape
+    # The transpose's rows are the mask's columns
+    flat = (mask.T >= threshold).ravel()
+    if flat.size == 0:
+        return {"size": [height, width], "counts": ""}
+    edges = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    runs = np.diff(np.concatenate(([0], edges, [flat.size])))
+    if flat[0]:
+        runs = np.concatenate(([0], runs))
+    return {"size": [height, width], "counts": _rle_string(runs)}
+
+
+def encode_mask(mask: np.ndarray, output_format: str, threshold: int = MASK_THRESHOLD) -> bytes:
+    """
+    Encode a mask in one of the mask-only output formats.
+
+    Args:
+        mask: HxW uint8 mask
+        output_format: "mask", "mask-1bit" or "rle"
+        threshold: Lowest foreground value for "mask-1bit" and "rle"
+
+    Returns:
+        The encoded file contents
+    """
+    if output_format == "rle":
+        return json.dumps(coco_rle(mask, threshold), separators=(",", ":")).encode("utf-8")
+    if output_format == "mask-1bit":
+        image = Image.fromarray(mask >= threshold)
+    elif output_format == "mask":
+        image = Image.fromarray(mask)
+    else:
+        raise ValueError(f"Unknown mask format: {output_format}")
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+class OutputArchive:
+    """
+    Writes outputs into one tar stream (gzip-compressed for .tar.gz/.tgz) as
+    they arrive, so a run of many small masks makes one file instead of
+    thousands. ``-`` writes to stdout.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        mode = "w|gz" if path.endswith((".gz", ".tgz")) else "w|"
+        self._tmp_path: Optional[str] = None
+        if path == "-":
+            # The process's real stdout, even while status lines are redirected away from it
+            fileobj: BinaryIO = sys.__stdout__.buffer
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            # Written beside the target and renamed on close, so a failed run
+            # leaves no truncated archive behind
+            self._tmp_path = f"{path}.{os.getpid()}.tmp"
+            fileobj = open(self._tmp_path, "wb")
+        self._fileobj = fileobj
+        self._tar = tarfile.open(fileobj=fileobj, mode=mode)
+        self.members = 0
+
+    def add(self, name: str, data: bytes) -> None:
+        """Append one file."""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self._tar.addfile(info, io.BytesIO(data))
+        self.members += 1
+
+    def close(self, keep: bool = True) -> None:
+        """Finish the stream; with keep False (a failed run) a file archive is discarded."""
+        if self._tar is None:
+            return
+        self._tar.close()
+        self._tar = None
+        if self._tmp_path is None:
+            self._fileobj.flush()
+            return
+        self._fileobj.close()
+        if keep:
+            os.replace(self._tmp_path, self.path)
+        else:
+            os.unlink(self._tmp_path)
@@ -0,0 +1,205 @@
+"""
+Guided-filter alpha matting - a fast alternative to rembg's closed-form matting.
+
+The trimap is built exactly as rembg's alpha_matting_cutout builds it (eroded
+foreground/background thresholds of the model mask). Instead of solving
+closed-form matting's sparse linear system, alpha in the unknown band comes
+from each pixel's position between the local foreground and background
+colours, cleaned up with a colour guided filter. All of it is box filters and
+per-pixel array maths over the band's bounding box only, so it takes a
+fraction of a second where closed-form takes seconds to minutes.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from .tiling import box_mean
+
+
+def _erode(region: np.ndarray, size: int, border_value: int) -> np.ndarray:
+    """Binary erosion with a size x size square; pixels outside the image count as border_value."""
+    if size <= 0:
+        return region
+    try:
+        import cv2
+        kernel = np.ones((size, size), np.uint8)
+        if border_value:
+            eroded = cv2.erode(region.astype(np.uint8), kernel)
+        else:
+            eroded = cv2.erode(region.astype(np.uint8), kernel,
+                               borderType=cv2.BORDER_CONSTANT, borderValue=0)
+        return eroded.astype(bool)
+    except ImportError:
+        from scipy.ndimage import binary_erosion
+        return binary_erosion(region, structure=np.ones((size, size)), border_value=border_value)
+
+
+def make_trimap(
+    mask: np.ndarray,
+    fg_threshold: int = 240,
+    bg_threshold: int = 10,
+    erode_size: int = 10
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Split a model mask into sure foreground and sure background, as rembg does.
+
+    Returns:
+        (foreground, background) boolean arrays; everything else is unknown
+    """
+    foreground = _erode(mask > fg_threshold, erode_size, border_value=0)
+    background = _erode(mask < bg_threshold, erode_size, border_value=1)
+    return foreground, background
+
+
+def _guided_filter_rgb(guide: np.ndarray, source: np.ndarray, radius: int, eps: float) -> np.ndarray:
+    """Colour guided filter (He et al.) of ``source`` by HxWx3 float32 ``guide``."""
+    r, g, b = guide[..., 0], guide[..., 1], guide[..., 2]
+    mean_r, mean_g, mean_b = box_mean(r, radius), box_mean(g, radius), box_mean(b, radius)
+    mean_p = box_mean(source, radius)
+
+    cov_rp = box_mean(r * source, radius) - mean_r * mean_p
+    cov_gp = box_mean(g * source, radius) - mean_g * mean_p
+    cov_bp = box_mean(b * source, radius) - mean_b * mean_p
+
+    # Per-pixel 3x3 colour covariance (+ eps on the diagonal)
+    var_rr = box_mean(r * r, radius) - mean_r * mean_r + eps
+    var_rg = box_mean(r * g, radius) - mean_r * mean_g
+    var_rb = box_mean(r * b, radius) - mean_r * mean_b
+    var_gg = box_mean(g * g, radius) - mean_g * mean_g + eps
+    var_gb = box_mean(g * b, radius) - mean_g * mean_b
+    var_bb = box_mean(b * b, radius) - mean_b * mean_b + eps
+
+    # Solve Sigma a = cov with the symmetric 3x3 adjugate, vectorised over pixels
+    inv_rr = var_gg * var_bb - var_gb * var_gb
+    inv_rg = var_gb * var_rb - var_rg * var_bb
+    inv_rb = var_rg * var_gb - var_gg * var_rb
+    inv_gg = var_rr * var_bb - var_rb * var_rb
+    inv_gb = var_rb * var_rg - var_rr * var_gb
+    inv_bb = var_rr * var_gg - var_rg * var_rg
+    det = var_rr * inv_rr + var_rg * inv_rg + var_rb * inv_rb
+
+    a_r = (inv_rr * cov_rp + inv_rg * cov_gp + inv_rb * cov_bp) / det
+    a_g = (inv_rg * cov_rp + inv_gg * cov_gp + inv_gb * cov_bp) / det
+    a_b = (inv_rb * cov_rp + inv_gb * cov_gp + inv_bb * cov_bp) / det
+    b_0 = mean_p - a_r * mean_r - a_g * mean_g - a_b * mean_b
+
+    return (
+        box_mean(a_r, radius) * r
+        + box_mean(a_g, radius) * g
+        + box_mean(a_b, radius) * b
+        + box_mean(b_0, radius)
+    )
+
+
+def _local_colours(
+    rgb: np.ndarray,
+    foreground: np.ndarray,
+    background: np.ndarray,
+    base_radius: int,
+    min_weight: float = 0.02
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Mean sure-foreground and sure-background colour around each pixel.
+
+    Each pixel uses the smallest window (base_radius, x2, x4, x8) that contains
+    both sure regions, so narrow and wide bands are both sampled locally.
+
+    Returns:
+        (foreground colour, background colour, found) - found is False where
+        no window reached both regions
+    """
+    weight_fg = foreground.astype(np.float32)
+    weight_bg = background.astype(np.float32)
+    fg_colour = np.zeros_like(rgb)
+    bg_colour = np.zeros_like(rgb)
+    found = np.zeros(foreground.shape, dtype=bool)
+
+    for radius in (base_radius, 2 * base_radius, 4 * base_radius, 8 * base_radius):
+        total_fg = box_mean(weight_fg, radius)
+        total_bg = box_mean(weight_bg, radius)
+        use = (total_fg >= min_weight) & (total_bg >= min_weight) & ~found
+        if use.any():
+            for c in range(3):
+                fg_colour[..., c][use] = (box_mean(rgb[..., c] * weight_fg, radius)[use] / total_fg[use])
+                bg_colour[..., c][use] = (box_mean(rgb[..., c] * weight_bg, radius)[use] / total_bg[use])
+            found |= use
+        if found.all():
+            break
+    return fg_colour, bg_colour, found
+
+
+def guided_matting_cutout(
+    image: np.ndarray,
+    mask: np.ndarray,
+    fg_threshold: int = 240,
+    bg_threshold: int = 10,
+    erode_size: int = 10,
+    smooth_radius: int = 2,
+    eps: float = 1e-4
+) -> np.ndarray:
+    """
+    Cut out the subject, re-estimating alpha in the trimap's unknown band.
+
+    Each unknown pixel's colour is projected onto the line between the local
+    sure-foreground and sure-background colours; where those two are too alike
+    to tell apart, the model mask is kept. A small colour guided filter then
+    snaps the result to image edges.
+
+    Args:
+        image: HxWx3 uint8 RGB pixels
+        mask: HxW uint8 model mask
+        fg_threshold: Mask values above this (after erosion) are sure foreground
+        bg_threshold: Mask values below this (after erosion) are sure background
+        erode_size: Erosion size for both sure regions; widens the unknown band
+        smooth_radius: Guided filter radius for the final clean-up
+        eps: Guided filter regularisation; smaller follows colour edges more closely
+
+    Returns:
+        HxWx4 uint8 RGBA cutout (straight, not premultiplied, alpha)
+    """
+    foreground, background = make_trimap(mask, fg_threshold, bg_threshold, erode_size)
+    alpha = np.where(foreground, 255, 0).astype(np.uint8)
+    rgb_out = image.copy()
+
+    unknown = ~(foreground | background)
+    rows = np.flatnonzero(unknown.any(axis=1))
+    cols = np.flatnonzero(unknown.any(axis=0))
+    if len(rows):
+        base_radius = max(4, erode_size)
+        # Colour samples come from up to 8x the base radius away
+        halo = 8 * base_radius
+        top, bottom = max(0, rows[0] - halo), min(mask.shape[0], rows[-1] + halo + 1)
+        left, right = max(0, cols[0] - halo), min(mask.shape[1], cols[-1] + halo + 1)
+        window = (slice(top, bottom), slice(left, right))
+
+        rgb = image[window].astype(np.float32) / 255.0
+        fg, bg, band = foreground[window], background[window], unknown[window]
+        fg_colour, bg_colour, found = _local_colours(rgb, fg, bg, base_radius)
+
+        # alpha = (I - B).(F - B) / |F - B|^2, trusted in proportion to |F - B|
+        spread = fg_colour - bg_colour
+        spread_sq = (spread * spread).sum(axis=-1)
+        projected = ((rgb - bg_colour) * spread).sum(axis=-1) / np.maximum(spread_sq, 1e-6)
+        confidence = np.clip(spread_sq / 0.01, 0.0, 1.0) * found
+        solved = (
+            confidence * np.clip(projected, 0.0, 1.0)
+            + (1.0 - confidence) * (mask[window].astype(np.float32) / 255.0)
+        )
+        solved[fg] = 1.0
+        solved[bg] = 0.0
+        solved = np.clip(_guided_filter_rgb(rgb, solved, smooth_radius, eps), 0.0, 1.0)
+
+        # Foreground colour: unmix the background, fading to the local sample
+        # where alpha is too small for the unmixing to be stable
+        a = solved[..., np.newaxis]
+        unmixed = np.clip((rgb - (1.0 - a) * bg_colour) / np.maximum(a, 1e-3), 0.0, 1.0)
+        colour = np.where(found[..., np.newaxis], a * unmixed + (1.0 - a) * fg_colour, rgb)
+
+        band_alpha = alpha[window]
+        band_alpha[band] = (solved[band] * 255 + 0.5).astype(np.uint8)
+        band_rgb = rgb_out[window]
+        band_rgb[band] = (np.clip(colour[band], 0.0, 1.0) * 255 + 0.5).astype(np.uint8)
+
+    rgb_out[alpha == 0] = 0
+    return np.dstack((rgb_out, alpha))
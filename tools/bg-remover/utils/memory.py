@@ -0,0 +1,69 @@
+"""
+Process memory utilities - how much of a process's RAM is its own and how
+much it shares with other processes (Linux /proc only).
+"""
+
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+
+_MB = 1024 * 1024
+
+
+def _read_smaps(pid: int, mapped_under: Optional[Path]) -> Optional[dict]:
+    """Sum /proc/<pid>/smaps fields, plus the Rss of mappings of files under ``mapped_under``."""
+    totals = {"mapped_rss": 0}
+    in_store = False
+    prefix = f"{mapped_under}{os.sep}" if mapped_under is not None else None
+    # smaps_rollup is much cheaper, but has no per-file breakdown
+    name = "smaps" if prefix else "smaps_rollup"
+    try:
+        with open(f"/proc/{pid}/{name}", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 3 and fields[2] == "kB":
+                    key = fields[0].rstrip(":")
+                    size = int(fields[1]) * 1024
+                    totals[key] = totals.get(key, 0) + size
+                    if in_store and key == "Rss":
+                        totals["mapped_rss"] += size
+                elif prefix and len(fields) >= 5 and "-" in fields[0]:
+                    # Mapping header: address perms offset dev inode [path]
+                    in_store = len(fields) >= 6 and fields[5].startswith(prefix)
+    except (OSError, ValueError):
+        return None
+    return totals
+
+
+def process_memory(pid: Optional[int] = None, mapped_under: Optional[Union[str, Path]] = None) -> dict:
+    """
+    Get a process's unique and shared memory.
+
+    Args:
+        pid: Process id (default: this process)
+        mapped_under: Also report how much of the process's memory maps
+            files in this directory (e.g. the model store)
+
+    Returns:
+        Dict with rss_mb, pss_mb (RSS with shared pages split between their
+        users), unique_mb (pages no other process maps), shared_mb and, with
+        ``mapped_under``, mapped_mb. Empty where /proc is unavailable.
+    """
+    store = Path(mapped_under).resolve() if mapped_under is not None else None
+    totals = _read_smaps(pid or os.getpid(), store)
+    if totals is None:
+        return {}
+
+    def mb(*keys: str) -> float:
+        return round(sum(totals.get(key, 0) for key in keys) / _MB, 1)
+
+    report = {
+        "rss_mb": mb("Rss"),
+        "pss_mb": mb("Pss"),
+        "unique_mb": mb("Private_Clean", "Private_Dirty"),
+        "shared_mb": mb("Shared_Clean", "Shared_Dirty"),
+    }
+    if store is not None:
+        report["mapped_mb"] = mb("mapped_rss")
+    return report
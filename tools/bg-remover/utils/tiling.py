@@ -0,0 +1,209 @@
+"""
+Tiling utilities - strip-wise mask upsampling, boundary refinement and a
+streaming PNG writer for images too large to hold several full-size copies of.
+"""
+
+import os
+import struct
+import zlib
+from pathlib import Path
+from typing import Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+
+def reduce_to_fit(image: Image.Image, max_side: int) -> Image.Image:
+    """
+    Downscale so the longer side is at most max_side.
+
+    An integer box reduce does most of the work; Lanczos only covers the last
+    factor of two.
+    """
+    scale = max_side / max(image.width, image.height)
+    if scale >= 1:
+        return image
+
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    factor = int(1 / (scale * 2))
+    if factor >= 2:
+        image = image.reduce(factor)
+    return image.resize(size, Image.Resampling.LANCZOS)
+
+
+def _axis_weights(full: int, coarse: int, start: int, stop: int):
+    """Bilinear source indices/weights for output samples start..stop (pixel centres aligned)."""
+    coords = (np.arange(start, stop, dtype=np.float32) + 0.5) * (coarse / full) - 0.5
+    coords = np.clip(coords, 0, coarse - 1)
+    lo = np.floor(coords).astype(np.intp)
+    hi = np.minimum(lo + 1, coarse - 1)
+    return lo, hi, (coords - lo).astype(np.float32)
+
+
+def upsample_mask_strip(
+    coarse: np.ndarray,
+    full_size: Tuple[int, int],
+    rows: Tuple[int, int],
+    cols: Tuple[int, int]
+) -> np.ndarray:
+    """
+    Bilinearly upsample one window of a low-res mask to full resolution.
+
+    Args:
+        coarse: HxW uint8 mask from the low-res inference
+        full_size: (width, height) of the full-resolution image
+        rows: (start, stop) full-resolution rows to produce
+        cols: (start, stop) full-resolution columns to produce
+
+    Returns:
+        float32 mask in [0, 1] for the window
+    """
+    width, height = full_size
+    y_lo, y_hi, y_w = _axis_weights(height, coarse.shape[0], *rows)
+    x_lo, x_hi, x_w = _axis_weights(width, coarse.shape[1], *cols)
+
+    top = coarse[y_lo].astype(np.float32) / 255.0
+    bottom = coarse[y_hi].astype(np.float32) / 255.0
+    vertical = top + (bottom - top) * y_w[:, np.newaxis]
+    left = vertical[:, x_lo]
+    return left + (vertical[:, x_hi] - left) * x_w
+
+
+def box_mean(array: np.ndarray, radius: int) -> np.ndarray:
+    """Mean over a (2r+1)^2 window, edges replicated."""
+    try:
+        import cv2
+        return cv2.blur(array, (2 * radius + 1, 2 * radius + 1), borderType=cv2.BORDER_REPLICATE)
+    except ImportError:
+        from scipy import ndimage
+        return ndimage.uniform_filter(array, size=2 * radius + 1, mode="nearest")
+
+
+def refine_boundary(
+    rgb: np.ndarray,
+    mask: np.ndarray,
+    radius: int = 8,
+    eps: float = 1e-3
+) -> np.ndarray:
+    """
+    Snap an upsampled mask to full-resolution edges, only near its boundary.
+
+    A guided filter (guide: the image's luma) is evaluated on the strip, and
+    its output replaces the mask only within ``radius`` of partially
+    transparent pixels. Solid foreground/background is passed through.
+
+    Args:
+        rgb: HxWx3 uint8 pixels
+        mask: HxW float32 mask in [0, 1]
+        radius: Guided filter window radius (and band half-width)
+        eps: Guided filter regularisation; larger keeps the mask smoother
+
+    Returns:
+        HxW float32 refined mask in [0, 1]
+    """
+    uncertain = ((mask > 0.01) & (mask < 0.99)).astype(np.float32)
+    if not uncertain.any():
+        return mask
+    band = box_mean(uncertain, radius) > 0
+
+    guide = rgb.astype(np.float32) @ np.array([0.299, 0.587, 0.114], dtype=np.float32) / 255.0
+    mean_i = box_mean(guide, radius)
+    mean_p = box_mean(mask, radius)
+    var_i = box_mean(guide * guide, radius) - mean_i * mean_i
+    cov_ip = box_mean(guide * mask, radius) - mean_i * mean_p
+
+    a = cov_ip / (var_i + eps)
+    b = mean_p - a * mean_i
+    refined = box_mean(a, radius) * guide + box_mean(b, radius)
+
+    return np.where(band, np.clip(refined, 0.0, 1.0), mask)
+
+
+class PngStreamWriter:
+    """
+    Writes a PNG row strip by row strip, so the full image never exists in memory.
+
+    Rows go to a temporary file beside ``path`` that replaces it once the PNG
+    is complete; if writing fails, the partial file is removed.
+
+    Usage:
+        with PngStreamWriter(path, width, height, "RGBA") as writer:
+            writer.write_rows(strip)  # HxWx4 uint8, top to bottom
+    """
+
+    _COLOR_TYPES = {"L": (0, 1), "RGB": (2, 3), "RGBA": (6, 4)}
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        width: int,
+        height: int,
+        mode: str = "RGBA",
+        compress_level: int = 6
+    ):
+        color_type, self._channels = self._COLOR_TYPES[mode]
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compress_level)
+        self.path = str(path)
+        self._tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(kind)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """Append rows (HxWxC uint8, or HxW for "L")."""
+        rows = rows.reshape(rows.shape[0], self.width * self._channels)
+        if self.rows_written + rows.shape[0] > self.height:
+            raise ValueError("More rows written than the PNG header declares")
+
+        # "Sub" filter: each byte minus the same channel of the previous pixel
+        filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 1
+        filtered[:, 1:self._channels + 1] = rows[:, :self._channels]
+        np.subtract(rows[:, self._channels:], rows[:, :-self._channels],
+                    out=filtered[:, self._channels + 1:], dtype=np.uint8, casting="unsafe")
+
+        data = self._compressor.compress(filtered.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+        self.rows_written += rows.shape[0]
+
+    def close(self) -> None:
+        """Flush the compressor and finish the file."""
+        if self._file.closed:
+            return
+        try:
+            if self.rows_written != self.height:
+                raise ValueError(f"PNG has {self.rows_written} of {self.height} rows")
+            self._chunk(b"IDAT", self._compressor.flush())
+            self._chunk(b"IEND", b"")
+            self._file.close()
+            os.replace(self._tmp_path, self.path)
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self) -> None:
+        """Discard the partial file."""
+        self._file.close()
+        try:
+            os.unlink(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self) -> "PngStreamWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()